@@ -0,0 +1,269 @@
+import os
+import re
+import sys
+import time
+import argparse
+from datetime import datetime
+
+import numpy as np
+
+from registros import ARCHIVO_REGISTROS, escribir_markdown, escribir_registro, leer_registros
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Analizadores cuyos registros (resultados.jsonl) se agregan por cohorte
+ANALIZADORES_COHORTE = ('pruebas', 'indentacion', 'librerias', 'metricas')
+PERCENTILES = (50, 75, 90, 95, 99)
+# Tramos de 10 puntos para la distribución de la tasa de éxito (el último incluye el 100%)
+TRAMOS_TASA = np.linspace(0, 100, 11)
+TOP_CATEGORIAS = 15
+TOP_LIBRERIAS = 20
+# Cada línea de cpplint termina con su categoría y confianza: "...  [whitespace/indent] [3]"
+PATRON_CATEGORIA = re.compile(r'\[([^\]\s]+)\] \[\d\]$')
+
+def buscar_registros(directorio):
+    """Todos los resultados.jsonl bajo 'directorio' (una carpeta de salida por entrega, lotes, etc.)."""
+    rutas = []
+    for raiz, carpetas, archivos in os.walk(directorio):
+        carpetas.sort()
+        if ARCHIVO_REGISTROS in archivos:
+            rutas.append(os.path.join(raiz, ARCHIVO_REGISTROS))
+    return rutas
+
+def cargar_registros(rutas, analizadores=ANALIZADORES_COHORTE):
+    # Una entrega analizada varias veces cuenta una sola vez: se queda el registro más reciente
+    ultimos = {}
+    for ruta in rutas:
+        for registro in leer_registros(ruta, analizadores):
+            clave = (registro['analizador'], registro['entrega'])
+            if clave not in ultimos or registro['fecha'] >= ultimos[clave]['fecha']:
+                ultimos[clave] = registro
+    por_analizador = {analizador: [] for analizador in analizadores}
+    for clave in sorted(ultimos):
+        por_analizador[clave[0]].append(ultimos[clave])
+    return por_analizador
+
+def frecuencias(claves, entregas):
+    """
+    Agrupa por clave (como un groupby de pandas): total de apariciones y cantidad de entregas
+    distintas en que aparece cada una, de la más frecuente a la menos frecuente.
+    """
+    if not claves:
+        return np.array([], dtype=str), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    unicas, inverso = np.unique(np.asarray(claves, dtype=str), return_inverse=True)
+    entregas = np.asarray(entregas, dtype=np.int64)
+    totales = np.bincount(inverso, minlength=unicas.size)
+    # Pares (clave, entrega) sin repetir, codificados en un solo entero
+    base = int(entregas.max()) + 1
+    pares = np.unique(inverso.astype(np.int64) * base + entregas)
+    distintas = np.bincount(pares // base, minlength=unicas.size)
+    orden = np.argsort(-totales, kind='stable')  # empates en orden alfabético
+    return unicas[orden], totales[orden], distintas[orden]
+
+def percentiles(valores):
+    valores = np.asarray(valores, dtype=float)
+    if valores.size == 0:
+        return None
+    return dict(zip((f"p{p}" for p in PERCENTILES), np.percentile(valores, PERCENTILES).round(2).tolist()))
+
+def estadisticas_pruebas(registros):
+    tasas = np.array([registro['datos']['tasa_exito'] for registro in registros], dtype=float)
+    estados, conteo_estados = np.unique(np.array([registro['datos']['estado'] for registro in registros], dtype=str),
+                                        return_counts=True)
+
+    # Una fila por paso ejecutado: (caso, número de paso, pasó)
+    casos, pasos, exitos = [], [], []
+    for registro in registros:
+        for caso in registro['datos'].get('casos', []):
+            casos.extend([caso['nombre']] * len(caso['pasos']))
+            pasos.extend(range(1, len(caso['pasos']) + 1))
+            exitos.extend(caso['pasos'])
+    por_paso = []
+    if casos:
+        nombres_casos, caso_de_fila = np.unique(np.asarray(casos, dtype=str), return_inverse=True)
+        pasos = np.asarray(pasos, dtype=np.int64)
+        base = int(pasos.max()) + 1
+        grupos, grupo_de_fila = np.unique(caso_de_fila.astype(np.int64) * base + pasos, return_inverse=True)
+        ejecutadas = np.bincount(grupo_de_fila, minlength=grupos.size)
+        exitosas = np.bincount(grupo_de_fila, weights=np.asarray(exitos, dtype=float), minlength=grupos.size)
+        for grupo, total, ok in zip(grupos, ejecutadas, exitosas):
+            por_paso.append({
+                'caso': str(nombres_casos[grupo // base]),
+                'paso': int(grupo % base),
+                'entregas': int(total),
+                'exitosas': int(ok),
+                'tasa_exito': float(ok / total * 100)
+            })
+
+    conteos, _ = np.histogram(tasas, bins=TRAMOS_TASA)
+    return {
+        'entregas': int(tasas.size),
+        'aprobadas': int(np.count_nonzero(tasas == 100)),
+        'tasa_promedio': float(tasas.mean()) if tasas.size else 0.0,
+        'percentiles_tasa': percentiles(tasas),
+        'distribucion_tasa': [{'desde': int(desde), 'hasta': int(hasta), 'entregas': int(total)}
+                              for desde, hasta, total in zip(TRAMOS_TASA[:-1], TRAMOS_TASA[1:], conteos)],
+        'estados': dict(zip(estados.tolist(), conteo_estados.tolist())),
+        'por_paso': por_paso
+    }
+
+def estadisticas_cpplint(registros):
+    categorias, entregas = [], []
+    for indice, registro in enumerate(registros):
+        for datos in registro['datos']['archivos'].values():
+            for error in (datos or {}).get('errores', []):
+                coincidencia = PATRON_CATEGORIA.search(error)
+                if coincidencia:
+                    categorias.append(coincidencia.group(1))
+                    entregas.append(indice)
+    nombres, totales, distintas = frecuencias(categorias, entregas)
+    return {
+        'entregas': len(registros),
+        'total_errores': len(categorias),
+        'categorias': [{'categoria': str(nombre), 'errores': int(total), 'entregas': int(n)}
+                       for nombre, total, n in zip(nombres, totales, distintas)]
+    }
+
+def estadisticas_librerias(registros):
+    librerias, entregas = [], []
+    for indice, registro in enumerate(registros):
+        for usadas in registro['datos']['librerias_por_archivo'].values():
+            librerias.extend(usadas)
+            entregas.extend([indice] * len(usadas))
+    nombres, totales, distintas = frecuencias(librerias, entregas)
+    return {
+        'entregas': len(registros),
+        'librerias': [{'libreria': str(nombre), 'usos': int(total), 'entregas': int(n),
+                       'porcentaje_entregas': float(n / len(registros) * 100)}
+                      for nombre, total, n in zip(nombres, totales, distintas)]
+    }
+
+def estadisticas_complejidad(registros):
+    funciones = [funcion for registro in registros for funcion in registro['datos']['complexity']['functions']]
+    return {
+        'entregas': len(registros),
+        'funciones': len(funciones),
+        # Por función
+        'ciclomatica': percentiles([funcion['ciclomatica'] for funcion in funciones]),
+        'cognitiva': percentiles([funcion['cognitiva'] for funcion in funciones]),
+        'anidamiento': percentiles([funcion['anidamiento'] for funcion in funciones]),
+        # Por entrega
+        'lineas_codigo': percentiles([registro['datos']['loc']['code'] for registro in registros]),
+        'funciones_por_entrega': percentiles([registro['datos']['function_count'] for registro in registros]),
+        'ciclomatica_por_entrega': percentiles([registro['datos']['complexity']['cyclomatic'] for registro in registros])
+    }
+
+def agregar_cohorte(directorio):
+    """Estadísticas de toda la cohorte a partir de los resultados.jsonl que hay bajo 'directorio'."""
+    rutas = buscar_registros(directorio)
+    por_analizador = cargar_registros(rutas)
+    estadisticas = {'archivos_registros': len(rutas)}
+    calculos = {
+        'pruebas': estadisticas_pruebas,
+        'indentacion': estadisticas_cpplint,
+        'librerias': estadisticas_librerias,
+        'metricas': estadisticas_complejidad
+    }
+    for analizador, calcular in calculos.items():
+        registros = por_analizador[analizador]
+        estadisticas[analizador] = calcular(registros) if registros else None
+    return estadisticas
+
+def tabla_percentiles(filas):
+    yield "| Métrica | " + " | ".join(f"p{p}" for p in PERCENTILES) + " |\n"
+    yield "|:--------|" + "|".join("----:" for _ in PERCENTILES) + "|\n"
+    for nombre, valores in filas:
+        if valores:
+            yield f"| {nombre} | " + " | ".join(f"{valor:g}" for valor in valores.values()) + " |\n"
+    yield "\n"
+
+def generar_reporte(estadisticas, directorio):
+    yield "# 🏫 Reporte de la Cohorte\n\n"
+    yield f"📅 Fecha de análisis: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n"
+    yield f"📂 Resultados: {directorio} ({estadisticas['archivos_registros']} archivos {ARCHIVO_REGISTROS})\n\n"
+
+    pruebas = estadisticas['pruebas']
+    yield "## 🧪 Pruebas\n\n"
+    if pruebas is None:
+        yield "Sin registros de pruebas.\n\n"
+    else:
+        yield f"- 👥 Entregas: **{pruebas['entregas']}**\n"
+        yield f"- 🎉 Con todas las pruebas aprobadas: **{pruebas['aprobadas']}**\n"
+        yield f"- 📊 Tasa de éxito promedio: **{pruebas['tasa_promedio']:.2f}%**\n"
+        yield "- 🚦 Estados: " + ", ".join(f"{estado} **{total}**" for estado, total in pruebas['estados'].items()) + "\n\n"
+        yield "### 📈 Distribución de la tasa de éxito\n\n"
+        yield "| Tasa de éxito | Entregas |\n"
+        yield "|:--------------|---------:|\n"
+        for tramo in pruebas['distribucion_tasa']:
+            cierre = "]" if tramo['hasta'] == 100 else ")"
+            yield f"| [{tramo['desde']}, {tramo['hasta']}{cierre} | {tramo['entregas']} |\n"
+        yield "\n"
+        if pruebas['por_paso']:
+            yield "### 🔢 Tasa de éxito por paso\n\n"
+            yield "| Caso | Paso | Entregas | Exitosas | Tasa de éxito |\n"
+            yield "|:-----|-----:|---------:|---------:|--------------:|\n"
+            for fila in pruebas['por_paso']:
+                yield f"| {fila['caso']} | {fila['paso']} | {fila['entregas']} | {fila['exitosas']} | {fila['tasa_exito']:.2f}% |\n"
+            yield "\n"
+
+    cpplint = estadisticas['indentacion']
+    yield "## 🧹 Categorías de cpplint más comunes\n\n"
+    if cpplint is None:
+        yield "Sin registros de cpplint.\n\n"
+    else:
+        yield f"- 🔴 Errores en total: **{cpplint['total_errores']}** en {cpplint['entregas']} entregas\n\n"
+        yield "| Categoría | Errores | Entregas |\n"
+        yield "|:----------|--------:|---------:|\n"
+        for fila in cpplint['categorias'][:TOP_CATEGORIAS]:
+            yield f"| {fila['categoria']} | {fila['errores']} | {fila['entregas']} |\n"
+        yield "\n"
+
+    librerias = estadisticas['librerias']
+    yield "## 📚 Uso de librerías\n\n"
+    if librerias is None:
+        yield "Sin registros de librerías.\n\n"
+    else:
+        yield "| Librería | Usos | Entregas | % de entregas |\n"
+        yield "|:---------|-----:|---------:|--------------:|\n"
+        for fila in librerias['librerias'][:TOP_LIBRERIAS]:
+            yield f"| `{fila['libreria']}` | {fila['usos']} | {fila['entregas']} | {fila['porcentaje_entregas']:.1f}% |\n"
+        yield "\n"
+
+    complejidad = estadisticas['metricas']
+    yield "## 🧮 Percentiles de complejidad\n\n"
+    if complejidad is None:
+        yield "Sin registros de métricas.\n"
+    else:
+        yield f"### Por función ({complejidad['funciones']} funciones)\n\n"
+        yield from tabla_percentiles([('Ciclomática', complejidad['ciclomatica']),
+                                      ('Cognitiva', complejidad['cognitiva']),
+                                      ('Anidamiento', complejidad['anidamiento'])])
+        yield f"### Por entrega ({complejidad['entregas']} entregas)\n\n"
+        yield from tabla_percentiles([('Líneas de código', complejidad['lineas_codigo']),
+                                      ('Funciones', complejidad['funciones_por_entrega']),
+                                      ('Ciclomática total', complejidad['ciclomatica_por_entrega'])])
+
+def main():
+    parser = argparse.ArgumentParser(description="Estadísticas de toda una cohorte a partir de los registros (resultados.jsonl) de sus entregas.")
+    parser.add_argument('resultados', help="Directorio con los resultados de las entregas; se busca resultados.jsonl en todas sus subcarpetas.")
+    parser.add_argument('--salida', default=os.path.join(PROJECT_ROOT, 'output'))
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.resultados):
+        print(f"❌ No existe el directorio {args.resultados}")
+        sys.exit(1)
+
+    inicio = time.perf_counter()
+    estadisticas = agregar_cohorte(args.resultados)
+    if not estadisticas['archivos_registros']:
+        print(f"No se encontraron archivos {ARCHIVO_REGISTROS} en {args.resultados}")
+        sys.exit(1)
+
+    nombre = os.path.basename(os.path.normpath(os.path.abspath(args.resultados)))
+    estadisticas = escribir_registro(args.salida, 'cohorte', nombre, estadisticas)
+    ruta_reporte = os.path.join(args.salida, f"REPORTE_COHORTE_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md")
+    escribir_markdown(ruta_reporte, generar_reporte(estadisticas, args.resultados))
+    print(f"Reporte generado: {ruta_reporte} ({time.perf_counter() - inicio:.2f} s)")
+
+if __name__ == "__main__":
+    main()
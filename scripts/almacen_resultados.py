@@ -0,0 +1,167 @@
+import os
+import json
+import sqlite3
+import hashlib
+import threading
+
+from cargador_fuentes import leer_archivo
+from cambios_git import filtrar_cambiados, resolver_revision, revision_actual
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Archivo oculto dentro de output/: sobrevive a "rm -rf output/*" entre ejecuciones
+RUTA_ALMACEN = os.environ.get('ALMACEN_RESULTADOS', os.path.join(PROJECT_ROOT, 'output', '.cache_resultados.sqlite3'))
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS resultados (
+    analizador TEXT NOT NULL,
+    version TEXT NOT NULL,
+    hash TEXT NOT NULL,
+    datos TEXT NOT NULL,
+    PRIMARY KEY (analizador, version, hash)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS revisiones (
+    analizador TEXT PRIMARY KEY,
+    revision TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS archivos (
+    analizador TEXT NOT NULL,
+    ruta TEXT NOT NULL,
+    hash TEXT NOT NULL,
+    PRIMARY KEY (analizador, ruta)
+) WITHOUT ROWID;
+"""
+
+# SQLite admite un solo escritor: los analizadores que corren en hilos escriben de a uno
+_candado = threading.Lock()
+
+def hash_contenido(contenido, ruta=None):
+    # Con ruta, para analizadores cuyo resultado también depende de dónde está el archivo (cpplint)
+    digest = hashlib.sha256()
+    if ruta is not None:
+        digest.update(os.path.abspath(ruta).encode('utf-8') + b'\0')
+    digest.update(contenido.encode('utf-8'))
+    return digest.hexdigest()
+
+def version_de_codigo(*rutas_fuente):
+    """Versión de un analizador: hash de su código fuente (y de los módulos de los que depende)."""
+    digest = hashlib.sha256()
+    for ruta in rutas_fuente:
+        with open(ruta, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+def abrir_almacen(ruta_almacen=RUTA_ALMACEN):
+    directorio = os.path.dirname(ruta_almacen)
+    if directorio:
+        os.makedirs(directorio, exist_ok=True)
+    conexion = sqlite3.connect(ruta_almacen, timeout=30)
+    conexion.executescript(ESQUEMA)
+    return conexion
+
+def consultar_resultados(conexion, analizador, version, hashes):
+    guardados = {}
+    hashes = list(hashes)
+    # De a 500 para no pasar el límite de parámetros de SQLite
+    for inicio in range(0, len(hashes), 500):
+        grupo = hashes[inicio:inicio + 500]
+        filas = conexion.execute(
+            f"SELECT hash, datos FROM resultados WHERE analizador = ? AND version = ? "
+            f"AND hash IN ({', '.join('?' * len(grupo))})", [analizador, version] + grupo)
+        for h, datos in filas:
+            guardados[h] = json.loads(datos)
+    return guardados
+
+def hashes_previos(conexion, analizador, rutas):
+    # Hash con el que se analizó cada ruta la última vez
+    previos = {}
+    rutas = [os.path.abspath(ruta) for ruta in rutas]
+    for inicio in range(0, len(rutas), 500):
+        grupo = rutas[inicio:inicio + 500]
+        filas = conexion.execute(
+            f"SELECT ruta, hash FROM archivos WHERE analizador = ? AND ruta IN ({', '.join('?' * len(grupo))})",
+            [analizador] + grupo)
+        previos.update(filas)
+    return previos
+
+def revision_registrada(conexion, analizador):
+    fila = conexion.execute("SELECT revision FROM revisiones WHERE analizador = ?", (analizador,)).fetchone()
+    return fila[0] if fila else None
+
+def registrar_revision(conexion, analizador, revision):
+    # Commit con el que coincidía el árbol en la última ejecución del analizador (o ninguno)
+    with _candado, conexion:
+        if revision is None:
+            conexion.execute("DELETE FROM revisiones WHERE analizador = ?", (analizador,))
+        else:
+            conexion.execute("INSERT OR REPLACE INTO revisiones (analizador, revision) VALUES (?, ?)",
+                             (analizador, revision))
+
+def guardar_resultados(conexion, analizador, version, resultados, hashes_por_ruta):
+    with _candado, conexion:
+        # Los resultados de versiones anteriores del analizador ya no se van a usar
+        conexion.execute("DELETE FROM resultados WHERE analizador = ? AND version != ?", (analizador, version))
+        conexion.executemany(
+            "INSERT OR REPLACE INTO resultados (analizador, version, hash, datos) VALUES (?, ?, ?, ?)",
+            [(analizador, version, h, json.dumps(datos, ensure_ascii=False)) for h, datos in resultados.items()])
+        conexion.executemany(
+            "INSERT OR REPLACE INTO archivos (analizador, ruta, hash) VALUES (?, ?, ?)",
+            [(analizador, os.path.abspath(ruta), h) for ruta, h in hashes_por_ruta.items()])
+
+def resultados_por_archivo(analizador, version, rutas, calcular, ruta_almacen=RUTA_ALMACEN, por_ruta=False):
+    """
+    Devuelve {ruta: resultado} para cada ruta. calcular(rutas_pendientes) -> {ruta: resultado}
+    se llama una sola vez, solo con los archivos cuyo contenido no tiene ya un resultado guardado
+    con esta versión del analizador; los nuevos resultados (que deben poder guardarse como JSON)
+    se agregan al almacén. En modo incremental (cambios_git) los archivos que no cambiaron ni
+    siquiera se leen: se usa el hash con el que se analizaron la vez anterior.
+    """
+    try:
+        conexion = abrir_almacen(ruta_almacen)
+    except sqlite3.Error as e:
+        print(f"⚠️ No se pudo abrir el almacén de resultados {ruta_almacen}: {e}")
+        return calcular(rutas)
+
+    try:
+        directorio = os.path.dirname(rutas[0]) if rutas else PROJECT_ROOT
+        # Solo se confía en los hashes anteriores si el almacén quedó exactamente en la revisión base
+        base = resolver_revision(directorio)
+        if base is not None and base == revision_registrada(conexion, analizador):
+            cambiados = set(filtrar_cambiados(rutas))
+        else:
+            cambiados = set(rutas)
+        previos = hashes_previos(conexion, analizador, rutas)
+        hashes = {}
+        for ruta in rutas:
+            if ruta not in cambiados and os.path.abspath(ruta) in previos:
+                hashes[ruta] = previos[os.path.abspath(ruta)]
+                continue
+            contenido = leer_archivo(ruta)
+            if contenido is not None:
+                hashes[ruta] = hash_contenido(contenido, ruta if por_ruta else None)
+
+        guardados = consultar_resultados(conexion, analizador, version, set(hashes.values()))
+        pendientes = [ruta for ruta in rutas if hashes.get(ruta) not in guardados]
+        calculados = calcular(pendientes) if pendientes else {}
+        resultados, nuevos = {}, {}
+        for ruta in rutas:
+            h = hashes.get(ruta)
+            if h in guardados:
+                resultados[ruta] = guardados[h]
+                continue
+            resultado = calculados.get(ruta)
+            if h is not None and resultado is not None:
+                # Se guarda y se devuelve la misma forma JSON, venga o no del almacén
+                resultado = json.loads(json.dumps(resultado, ensure_ascii=False))
+                nuevos[h] = resultado
+            resultados[ruta] = resultado
+        movidos = {ruta: h for ruta, h in hashes.items() if previos.get(os.path.abspath(ruta)) != h}
+        if nuevos or movidos:
+            guardar_resultados(conexion, analizador, version, nuevos, movidos)
+        revision = revision_actual(directorio)
+        if revision != revision_registrada(conexion, analizador):
+            registrar_revision(conexion, analizador, revision)
+    finally:
+        conexion.close()
+
+    print(f"🗄️ {analizador}: {len(rutas) - len(pendientes)} archivos reutilizados del almacén, {len(pendientes)} analizados")
+    return resultados
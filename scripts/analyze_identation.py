@@ -1,28 +1,13 @@
 import os
-import subprocess
 from datetime import datetime
 
-def buscar_carpeta_proyecto(ruta_src):
-    for item in os.listdir(ruta_src):
-        ruta_item = os.path.join(ruta_src, item)
-        if os.path.isdir(ruta_item):
-            if any(archivo.endswith(('.cpp', '.h')) for archivo in os.listdir(ruta_item)):
-                return ruta_item
-    return ruta_src
-
-def ejecutar_cpplint(ruta_archivo):
-    try:
-        # Ejecutar cpplint y capturar la salida
-        resultado = subprocess.run(
-            ['cpplint', '--filter=-whitespace/comments', ruta_archivo],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
-        )
-        salida = resultado.stderr  # cpplint escribe los resultados en stderr
-        return salida
-    except Exception as e:
-        return f"Error ejecutando cpplint en {ruta_archivo}: {str(e)}"
+from cargador_fuentes import buscar_carpeta_proyecto, leer_lineas, listar_archivos
+import cpplint_lote
+from cpplint_lote import ejecutar_cpplint_lote, obtener_version_cpplint
+from almacen_resultados import resultados_por_archivo, version_de_codigo
+from registros import escribir_markdown, escribir_registro, nombre_entrega
+
+VERSION_ANALISIS = version_de_codigo(__file__, cpplint_lote.__file__)
 
 def analizar_resultados_cpplint(salida_cpplint):
     errores = []
@@ -40,30 +25,39 @@ def analizar_proyecto(ruta_src):
 
     ruta_carpeta_proyecto = buscar_carpeta_proyecto(ruta_src)
 
-    for raiz, dirs, archivos in os.walk(ruta_carpeta_proyecto):
-        for archivo in archivos:
-            if archivo.endswith(('.cpp', '.h', '.hpp')):
-                ruta_completa = os.path.join(raiz, archivo)
-                ruta_relativa = os.path.relpath(ruta_completa, ruta_src)
-                salida_cpplint = ejecutar_cpplint(ruta_completa)
-                errores = analizar_resultados_cpplint(salida_cpplint)
-                total_lineas = sum(1 for _ in open(ruta_completa, 'r', encoding='utf-8', errors='ignore'))
-                reporte[ruta_relativa] = {
-                    'errores': errores,
-                    'total_lineas': total_lineas,
-                    'lineas_correctas': total_lineas - len(errores)
-                }
-                archivos_analizados.append(ruta_relativa)
+    archivos = listar_archivos(ruta_carpeta_proyecto, ('.cpp', '.h', '.hpp'))
+    # cpplint también depende de la ruta del archivo, así que entra en la clave del almacén
+    version = f"{VERSION_ANALISIS}-{obtener_version_cpplint()}"
+    resultados = resultados_por_archivo('indentacion', version, archivos, analizar_archivos, por_ruta=True)
+
+    for ruta_completa in archivos:
+        ruta_relativa = os.path.relpath(ruta_completa, ruta_src)
+        reporte[ruta_relativa] = resultados[ruta_completa]
+        archivos_analizados.append(ruta_relativa)
 
     return reporte, archivos_analizados
 
+def analizar_archivos(rutas):
+    # Un solo proceso de cpplint para todos los archivos; la salida se reparte por archivo
+    salidas_cpplint = ejecutar_cpplint_lote(rutas)
+    resultados = {}
+    for ruta_completa in rutas:
+        errores = analizar_resultados_cpplint(salidas_cpplint[ruta_completa])
+        total_lineas = len(leer_lineas(ruta_completa) or [])
+        resultados[ruta_completa] = {
+            'errores': errores,
+            'total_lineas': total_lineas,
+            'lineas_correctas': total_lineas - len(errores)
+        }
+    return resultados
+
 def generar_reporte_md(reporte, archivos_analizados):
-    md = f"# 📊 Reporte de Análisis de Indentación con cpplint\n\n"
-    md += f"📅 Fecha de generación: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n"
+    yield f"# 📊 Reporte de Análisis de Indentación con cpplint\n\n"
+    yield f"📅 Fecha de generación: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n"
 
-    md += "## 📈 Estadísticas Generales\n\n"
-    md += "| Archivo | Líneas Totales | Errores de Indentación |\n"
-    md += "|:--------|---------------:|-----------------------:|\n"
+    yield "## 📈 Estadísticas Generales\n\n"
+    yield "| Archivo | Líneas Totales | Errores de Indentación |\n"
+    yield "|:--------|---------------:|-----------------------:|\n"
 
     total_lineas_proyecto = 0
     total_errores_proyecto = 0
@@ -71,50 +65,44 @@ def generar_reporte_md(reporte, archivos_analizados):
     for archivo, datos in reporte.items():
         total_lineas = datos['total_lineas']
         errores_indentacion = sum(1 for error in datos['errores'] if 'whitespace/indent' in error)
-        md += f"| {archivo} | {total_lineas} | {errores_indentacion} |\n"
+        yield f"| {archivo} | {total_lineas} | {errores_indentacion} |\n"
 
         total_lineas_proyecto += total_lineas
         total_errores_proyecto += errores_indentacion
 
-    md += f"\n**Total del Proyecto:** {total_lineas_proyecto} líneas, {total_errores_proyecto} errores de indentación\n\n"
+    yield f"\n**Total del Proyecto:** {total_lineas_proyecto} líneas, {total_errores_proyecto} errores de indentación\n\n"
 
-    md += "## 🔍 Detalles por Archivo\n\n"
+    yield "## 🔍 Detalles por Archivo\n\n"
     for archivo, datos in reporte.items():
-        md += f"### 📄 Archivo: {archivo}\n\n"
+        yield f"### 📄 Archivo: {archivo}\n\n"
 
         errores_indentacion = [error for error in datos['errores'] if 'whitespace/indent' in error]
         if errores_indentacion:
-            md += "#### ❌ Errores de indentación encontrados:\n\n"
+            yield "#### ❌ Errores de indentación encontrados:\n\n"
             for error in errores_indentacion:
-                md += f"- 🔴 {error}\n"
-            md += "\n"
+                yield f"- 🔴 {error}\n"
+            yield "\n"
         else:
-            md += "✅ No se encontraron errores de indentación.\n\n"
+            yield "✅ No se encontraron errores de indentación.\n\n"
 
-    md += "\n## 📁 Archivos Analizados\n\n"
+    yield "\n## 📁 Archivos Analizados\n\n"
     for archivo in archivos_analizados:
-        md += f"- {archivo}\n"
+        yield f"- {archivo}\n"
 
-    return md
-
-def main():
+def ejecutar_analisis(ruta_proyecto, ruta_salida):
     print("🔍 Iniciando análisis de indentación con cpplint...")
-    ruta_proyecto = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     ruta_src = os.path.join(ruta_proyecto, 'src')
-    ruta_salida = os.path.join(ruta_proyecto, 'output')
 
     if not os.path.exists(ruta_src):
         print(f"❌ Error: No se encontró la carpeta src en {ruta_src}")
         return
 
     reporte, archivos_analizados = analizar_proyecto(ruta_src)
-    contenido_reporte = generar_reporte_md(reporte, archivos_analizados)
+    registro = escribir_registro(ruta_salida, 'indentacion', nombre_entrega(ruta_proyecto),
+                                 {'archivos': reporte, 'archivos_analizados': archivos_analizados})
 
-    os.makedirs(ruta_salida, exist_ok=True)
     archivo_reporte = os.path.join(ruta_salida, f"REPORTE_ANALISIS_INDENTACION_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md")
-
-    with open(archivo_reporte, 'w', encoding='utf-8') as f:
-        f.write(contenido_reporte)
+    escribir_markdown(archivo_reporte, generar_reporte_md(registro['archivos'], registro['archivos_analizados']))
 
     print(f"✅ Análisis de indentación completado.")
     print(f"📄 Reporte guardado en: {archivo_reporte}")
@@ -138,5 +126,11 @@ def main():
     else:
         print("\n🍎 No se detectó una estructura de Visual Studio. Asumiendo proyecto de Mac.")
 
+    return archivo_reporte
+
+def main():
+    ruta_proyecto = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    ejecutar_analisis(ruta_proyecto, os.path.join(ruta_proyecto, 'output'))
+
 if __name__ == "__main__":
     main()
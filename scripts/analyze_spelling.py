@@ -2,25 +2,12 @@ import os
 import re
 from datetime import datetime
 
-def leer_archivo(ruta_archivo):
-    encodings = ['utf-8', 'latin-1', 'ISO-8859-1']
-    for encoding in encodings:
-        try:
-            with open(ruta_archivo, 'r', encoding=encoding) as file:
-                return file.read()
-        except UnicodeDecodeError:
-            continue
-    print(f"Error: No se pudo leer el archivo {ruta_archivo} con ninguna codificación conocida.")
-    return None
-
-def buscar_carpeta_proyecto(ruta_src):
-    for carpeta in os.listdir(ruta_src):
-        ruta_carpeta = os.path.join(ruta_src, carpeta)
-        if os.path.isdir(ruta_carpeta):
-            for archivo in os.listdir(ruta_carpeta):
-                if archivo.endswith('.cpp'):
-                    return ruta_carpeta
-    return ruta_src
+from cargador_fuentes import buscar_carpeta_proyecto, leer_archivo, listar_archivos
+from almacen_resultados import resultados_por_archivo, version_de_codigo
+from registros import escribir_markdown, escribir_registro, nombre_entrega
+from instrumentacion import etapa
+
+VERSION_ANALISIS = version_de_codigo(__file__)
 
 def extraer_couts(contenido):
     patron_cout = r'cout\s*<<\s*"([^"]*)"(?:\s*<<\s*endl\s*)?;'
@@ -35,16 +22,21 @@ def analizar_archivo(ruta_archivo):
     if contenido is None:
         return [], []
 
-    salidas = extraer_couts(contenido)
-    errores = []
+    # Una etapa por archivo, no por cada cout: las dos expresiones regulares juntas
+    with etapa('regex: salidas cout', archivos=1, caracteres=len(contenido)):
+        salidas = extraer_couts(contenido)
+        errores = []
 
-    for salida in salidas:
-        errores_acentos = verificar_acentos(salida)
-        if errores_acentos:
-            errores.append({"texto": salida, "errores": errores_acentos})
+        for salida in salidas:
+            errores_acentos = verificar_acentos(salida)
+            if errores_acentos:
+                errores.append({"texto": salida, "errores": errores_acentos})
 
     return salidas, errores
 
+def analizar_archivos(rutas):
+    return {ruta: analizar_archivo(ruta) for ruta in rutas}
+
 def analizar_proyecto(ruta_src):
     reporte = {
         "archivos_analizados": 0,
@@ -54,73 +46,69 @@ def analizar_proyecto(ruta_src):
         "detalles": {}
     }
 
-    ruta_carpeta_proyecto = buscar_carpeta_proyecto(ruta_src)
-
-    for raiz, dirs, archivos in os.walk(ruta_carpeta_proyecto):
-        for archivo in archivos:
-            if archivo.endswith('.cpp'):
-                reporte["archivos_analizados"] += 1
-                ruta_completa = os.path.join(raiz, archivo)
-                ruta_relativa = os.path.relpath(ruta_completa, ruta_src)
-                salidas, errores = analizar_archivo(ruta_completa)
-                reporte["total_salidas"] += len(salidas)
-                reporte["salidas_con_errores"] += len(errores)
-                reporte["total_errores"] += sum(len(e["errores"]) for e in errores)
-                if salidas or errores:
-                    reporte["detalles"][ruta_relativa] = {'salidas': salidas, 'errores': errores}
+    ruta_carpeta_proyecto = buscar_carpeta_proyecto(ruta_src, ('.cpp',))
+
+    archivos = listar_archivos(ruta_carpeta_proyecto, ('.cpp',))
+    resultados = resultados_por_archivo('acentos', VERSION_ANALISIS, archivos, analizar_archivos)
+    for ruta_completa in archivos:
+        reporte["archivos_analizados"] += 1
+        ruta_relativa = os.path.relpath(ruta_completa, ruta_src)
+        salidas, errores = resultados[ruta_completa]
+        reporte["total_salidas"] += len(salidas)
+        reporte["salidas_con_errores"] += len(errores)
+        reporte["total_errores"] += sum(len(e["errores"]) for e in errores)
+        if salidas or errores:
+            reporte["detalles"][ruta_relativa] = {'salidas': salidas, 'errores': errores}
     return reporte
 
 def generar_reporte_md(reporte):
-    md = f"# Reporte de Análisis de Acentos en Salidas cout\n\n"
-    md += f"Fecha de generación: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n"
-
-    md += "## Estadísticas Generales\n\n"
-    md += f"- Archivos analizados: {reporte['archivos_analizados']}\n"
-    md += f"- Total de salidas encontradas: {reporte['total_salidas']}\n"
-    md += f"- Salidas con posibles errores: {reporte['salidas_con_errores']}\n"
-    md += f"- Total de posibles errores detectados: {reporte['total_errores']}\n"
+    yield f"# Reporte de Análisis de Acentos en Salidas cout\n\n"
+    yield f"Fecha de generación: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n"
+
+    yield "## Estadísticas Generales\n\n"
+    yield f"- Archivos analizados: {reporte['archivos_analizados']}\n"
+    yield f"- Total de salidas encontradas: {reporte['total_salidas']}\n"
+    yield f"- Salidas con posibles errores: {reporte['salidas_con_errores']}\n"
+    yield f"- Total de posibles errores detectados: {reporte['total_errores']}\n"
     if reporte['total_salidas'] > 0:
-        md += f"- Porcentaje de salidas con posibles errores: {(reporte['salidas_con_errores'] / reporte['total_salidas']) * 100:.2f}%\n\n"
+        yield f"- Porcentaje de salidas con posibles errores: {(reporte['salidas_con_errores'] / reporte['total_salidas']) * 100:.2f}%\n\n"
 
-    md += "## Detalles por Archivo\n\n"
+    yield "## Detalles por Archivo\n\n"
     for archivo, datos in reporte["detalles"].items():
-        md += f"### Archivo: `{archivo}`\n\n"
+        yield f"### Archivo: `{archivo}`\n\n"
         
         if datos['salidas']:
-            md += "#### Salidas encontradas:\n\n"
+            yield "#### Salidas encontradas:\n\n"
             for salida in datos['salidas']:
-                md += f"- ```{salida}```\n"
-            md += "\n"
+                yield f"- ```{salida}```\n"
+            yield "\n"
         
         if datos['errores']:
-            md += "#### Posibles errores de acentuación:\n\n"
+            yield "#### Posibles errores de acentuación:\n\n"
             for error in datos['errores']:
-                md += f"- Texto: ```{error['texto']}```\n"
+                yield f"- Texto: ```{error['texto']}```\n"
                 for e in error['errores']:
-                    md += f"  - {e}\n"
-                md += "\n"
-
-    return md
+                    yield f"  - {e}\n"
+                yield "\n"
 
-def main():
-    ruta_proyecto = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+def ejecutar_analisis(ruta_proyecto, ruta_salida):
     ruta_src = os.path.join(ruta_proyecto, 'src')
-    ruta_salida = os.path.join(ruta_proyecto, 'output')
 
     if not os.path.exists(ruta_src):
         print(f"Error: No se encontró la carpeta src en {ruta_src}")
         return
 
-    reporte = analizar_proyecto(ruta_src)
-    contenido_reporte = generar_reporte_md(reporte)
+    reporte = escribir_registro(ruta_salida, 'acentos', nombre_entrega(ruta_proyecto), analizar_proyecto(ruta_src))
 
-    os.makedirs(ruta_salida, exist_ok=True)
     archivo_reporte = os.path.join(ruta_salida, f"REPORTE_ANALISIS_ACENTOS_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md")
-
-    with open(archivo_reporte, 'w', encoding='utf-8') as f:
-        f.write(contenido_reporte)
+    escribir_markdown(archivo_reporte, generar_reporte_md(reporte))
 
     print(f"Análisis completado. Reporte guardado en {archivo_reporte}")
+    return archivo_reporte
+
+def main():
+    ruta_proyecto = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    ejecutar_analisis(ruta_proyecto, os.path.join(ruta_proyecto, 'output'))
 
 if __name__ == "__main__":
     main()
@@ -1,6 +1,8 @@
 import os
 from datetime import datetime
 
+from registros import escribir_markdown, escribir_registro, nombre_entrega
+
 def identificar_archivo_cpp_principal(ruta_src):
     """
     Identifica la carpeta dentro de 'src/' que contiene el archivo .cpp principal
@@ -69,43 +71,34 @@ def analizar_estructura(ruta_proyecto):
     return reporte
 
 def generar_markdown(reporte):
-    md = f"# 📊 Reporte de Análisis de Estructura del Proyecto\n\n"
-    md += f"📅 Fecha y hora del análisis: {reporte['fecha_hora']}\n\n"
+    yield f"# 📊 Reporte de Análisis de Estructura del Proyecto\n\n"
+    yield f"📅 Fecha y hora del análisis: {reporte['fecha_hora']}\n\n"
 
-    md += "## 📈 Estadísticas Generales\n\n"
+    yield "## 📈 Estadísticas Generales\n\n"
     stats = reporte['estadisticas']
-    md += f"- 🔢 Total de elementos esperados: **{stats['total_elementos']}**\n"
-    md += f"- ✅ Elementos presentes: **{stats['elementos_presentes']}**\n"
-    md += f"- ❌ Elementos faltantes: **{stats['elementos_faltantes']}**\n"
-    md += f"- 📊 Porcentaje de cumplimiento: **{stats['porcentaje_cumplimiento']:.2f}%**\n\n"
+    yield f"- 🔢 Total de elementos esperados: **{stats['total_elementos']}**\n"
+    yield f"- ✅ Elementos presentes: **{stats['elementos_presentes']}**\n"
+    yield f"- ❌ Elementos faltantes: **{stats['elementos_faltantes']}**\n"
+    yield f"- 📊 Porcentaje de cumplimiento: **{stats['porcentaje_cumplimiento']:.2f}%**\n\n"
 
-    md += "## 🔍 Detalle de Cumplimiento\n\n"
+    yield "## 🔍 Detalle de Cumplimiento\n\n"
     for ruta, cumple in reporte['cumplimiento_estructura'].items():
         emoji = "✅" if cumple else "❌"
-        md += f"- {emoji} {ruta}: **{'Presente' if cumple else 'Faltante'}**\n"
-
-    return md
-
-def guardar_reporte(contenido, ruta_salida):
-    os.makedirs(os.path.dirname(ruta_salida), exist_ok=True)
-    with open(ruta_salida, 'w', encoding='utf-8') as f:
-        f.write(contenido)
+        yield f"- {emoji} {ruta}: **{'Presente' if cumple else 'Faltante'}**\n"
 
 def obtener_nombre_archivo_reporte():
     ahora = datetime.now()
     return f"REPORTE_ANALISIS_ESTRUCTURA_{ahora.strftime('%Y%m%d_%H%M%S')}.md"
 
-def main():
+def ejecutar_analisis(ruta_proyecto, directorio_salida):
     print("🔍 Iniciando análisis de estructura del proyecto...")
-    ruta_proyecto = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    directorio_salida = os.path.join(ruta_proyecto, "output")
     nombre_archivo = obtener_nombre_archivo_reporte()
     ruta_salida = os.path.join(directorio_salida, nombre_archivo)
 
     try:
-        reporte = analizar_estructura(ruta_proyecto)
-        contenido_markdown = generar_markdown(reporte)
-        guardar_reporte(contenido_markdown, ruta_salida)
+        reporte = escribir_registro(directorio_salida, 'estructura', nombre_entrega(ruta_proyecto),
+                                    analizar_estructura(ruta_proyecto))
+        escribir_markdown(ruta_salida, generar_markdown(reporte))
         print("✅ Análisis completado con éxito.")
         print(f"📄 Reporte generado y guardado en:")
         print(f"   {ruta_salida}")
@@ -118,6 +111,12 @@ def main():
         print(f"   Porcentaje de cumplimiento: {reporte['estadisticas']['porcentaje_cumplimiento']:.2f}%")
     except Exception as e:
         print(f"❌ Error al generar el reporte: {str(e)}")
+        return None
+    return ruta_salida
+
+def main():
+    ruta_proyecto = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    ejecutar_analisis(ruta_proyecto, os.path.join(ruta_proyecto, "output"))
 
 if __name__ == "__main__":
     main()
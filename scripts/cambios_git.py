@@ -0,0 +1,83 @@
+import os
+import subprocess
+import threading
+from functools import lru_cache
+
+EXTENSIONES_CAMBIOS = ('.cpp', '.h', '.hpp')
+# Revisión desde la que se analizan los cambios (--since de run_analyzers, o la variable de entorno)
+REVISION_BASE = os.environ.get('ANALISIS_DESDE') or None
+
+_cambiados = {}
+_candado = threading.Lock()
+
+def establecer_revision_base(revision):
+    global REVISION_BASE
+    REVISION_BASE = revision or None
+    resolver_revision.cache_clear()
+
+def ejecutar_git(argumentos, directorio):
+    resultado = subprocess.run(['git', *argumentos], cwd=directorio, capture_output=True, text=True, check=True)
+    return resultado.stdout
+
+def archivos_cambiados(directorio, revision=None):
+    """
+    Rutas absolutas de los fuentes C++ del repositorio que contiene a 'directorio' que cambiaron
+    desde 'revision' (modificados, agregados o sin rastrear). Devuelve None si no hay revisión
+    base o git no la puede resolver: en ese caso se analiza todo.
+    """
+    revision = revision or REVISION_BASE
+    if not revision or not os.path.isdir(directorio):
+        return None
+    try:
+        raiz = ejecutar_git(['rev-parse', '--show-toplevel'], directorio).strip()
+    except (OSError, subprocess.CalledProcessError):
+        print(f"⚠️ {directorio} no está en un repositorio git; se analizan todos los archivos.")
+        return None
+
+    with _candado:
+        if (raiz, revision) in _cambiados:
+            return _cambiados[(raiz, revision)]
+        try:
+            # Diferencias del árbol de trabajo contra la revisión y archivos nuevos sin rastrear
+            rutas = ejecutar_git(['diff', '--name-only', '-z', '--no-renames', revision, '--'], raiz).split('\0')
+            rutas += ejecutar_git(['ls-files', '--others', '--exclude-standard', '-z'], raiz).split('\0')
+        except (OSError, subprocess.CalledProcessError) as e:
+            print(f"⚠️ No se pudieron obtener los cambios desde {revision}: {e}; se analizan todos los archivos.")
+            cambiados = None
+        else:
+            cambiados = {os.path.realpath(os.path.join(raiz, ruta)) for ruta in rutas
+                         if ruta.lower().endswith(EXTENSIONES_CAMBIOS)}
+        _cambiados[(raiz, revision)] = cambiados
+        return cambiados
+
+def filtrar_cambiados(rutas, revision=None):
+    """Las rutas dadas que cambiaron desde la revisión base (todas, si no hay modo incremental)."""
+    if not rutas:
+        return rutas
+    cambiados = archivos_cambiados(os.path.dirname(rutas[0]), revision)
+    if cambiados is None:
+        return rutas
+    return [ruta for ruta in rutas if os.path.realpath(ruta) in cambiados]
+
+@lru_cache(maxsize=None)
+def resolver_revision(directorio, revision=None):
+    # Commit al que apunta la revisión base (una rama, HEAD~3, un sha abreviado...), o None
+    revision = revision or REVISION_BASE
+    if not revision:
+        return None
+    try:
+        return ejecutar_git(['rev-parse', '--verify', '--quiet', f'{revision}^{{commit}}'], directorio).strip() or None
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+@lru_cache(maxsize=None)
+def revision_actual(directorio):
+    """Commit HEAD si ningún fuente C++ tiene cambios sin confirmar (el árbol coincide con ese commit), o None."""
+    try:
+        head = ejecutar_git(['rev-parse', 'HEAD'], directorio).strip()
+        estado = ejecutar_git(['status', '--porcelain', '-z', '--untracked-files=all'], directorio)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    if any(entrada.lower().endswith(EXTENSIONES_CAMBIOS) for entrada in estado.split('\0')):
+        return None
+    return head
@@ -0,0 +1,163 @@
+import os
+import threading
+from collections import OrderedDict
+
+from instrumentacion import etapa
+
+# Codificaciones comunes en América Latina, en orden de preferencia
+CODIFICACIONES = ['utf-8', 'latin-1', 'ISO-8859-1']
+EXTENSIONES_CPP = ('.cpp', '.h', '.hpp')
+
+# Tamaño máximo (en bytes de archivo) de la caché de contenidos y recorridos guardados: en un
+# proceso largo (pool de --lote) se descartan los menos usados en vez de acumular todas las entregas
+MAX_BYTES_CACHE = int(os.environ.get('CARGADOR_CACHE_MB', '256')) * 1024 * 1024
+MAX_RECORRIDOS = 64
+
+# Caché LRU en memoria compartida por todos los analizadores del mismo proceso:
+# ruta -> (mtime_ns, tamaño, codificación, contenido, líneas)
+_archivos = OrderedDict()
+_bytes_en_cache = 0
+# ruta base -> (archivos encontrados en un único recorrido, {carpeta: mtime_ns} para validarlo)
+_recorridos = OrderedDict()
+_candado = threading.Lock()
+
+def _clave_archivo(ruta_archivo):
+    estado = os.stat(ruta_archivo)
+    return estado.st_mtime_ns, estado.st_size
+
+def _decodificar(datos):
+    for codificacion in CODIFICACIONES:
+        try:
+            texto = datos.decode(codificacion)
+        except UnicodeDecodeError:
+            continue
+        # Mismo resultado que open(..., 'r'): saltos de línea universales
+        return codificacion, texto.replace('\r\n', '\n').replace('\r', '\n')
+    return None, None
+
+def _cargar(ruta_archivo):
+    ruta_archivo = os.path.abspath(ruta_archivo)
+    try:
+        clave = _clave_archivo(ruta_archivo)
+    except OSError:
+        return None
+
+    with _candado:
+        entrada = _archivos.get(ruta_archivo)
+        if entrada is not None and entrada[:2] == clave:
+            _archivos.move_to_end(ruta_archivo)
+            return entrada
+
+    try:
+        with etapa('lectura de archivos', archivos=1, bytes=clave[1]), open(ruta_archivo, 'rb') as f:
+            datos = f.read()
+    except OSError:
+        return None
+
+    codificacion, contenido = _decodificar(datos)
+    if contenido is None:
+        print(f"Error: No se pudo leer el archivo {ruta_archivo} con ninguna codificación conocida.")
+    entrada = (clave[0], clave[1], codificacion, contenido, None)
+    _guardar(ruta_archivo, entrada)
+    return entrada
+
+def _guardar(ruta_archivo, entrada):
+    global _bytes_en_cache
+    with _candado:
+        anterior = _archivos.pop(ruta_archivo, None)
+        if anterior is not None:
+            _bytes_en_cache -= anterior[1]
+        _archivos[ruta_archivo] = entrada
+        _bytes_en_cache += entrada[1]
+        while _bytes_en_cache > MAX_BYTES_CACHE and len(_archivos) > 1:
+            _, descartada = _archivos.popitem(last=False)
+            _bytes_en_cache -= descartada[1]
+
+def leer_archivo(ruta_archivo):
+    """Devuelve el contenido decodificado del archivo (o None), leyéndolo del disco una sola vez."""
+    entrada = _cargar(ruta_archivo)
+    return entrada[3] if entrada else None
+
+def leer_lineas(ruta_archivo):
+    """Devuelve contenido.splitlines() memoizado junto con el contenido del archivo."""
+    entrada = _cargar(ruta_archivo)
+    if not entrada or entrada[3] is None:
+        return None
+    if entrada[4] is None:
+        entrada = entrada[:4] + (entrada[3].splitlines(),)
+        _guardar(os.path.abspath(ruta_archivo), entrada)
+    return entrada[4]
+
+def detectar_codificacion(ruta_archivo):
+    entrada = _cargar(ruta_archivo)
+    return entrada[2] if entrada else None
+
+def _mtime(carpeta):
+    try:
+        return os.stat(carpeta).st_mtime_ns
+    except OSError:
+        return None
+
+def _recorrido_vigente(carpetas):
+    # Agregar, borrar o renombrar un archivo cambia el mtime de la carpeta que lo contiene
+    return all(_mtime(carpeta) == mtime for carpeta, mtime in carpetas.items())
+
+def listar_archivos(ruta_base, extensiones=EXTENSIONES_CPP):
+    """
+    Devuelve las rutas de los archivos de ruta_base con alguna de las extensiones indicadas,
+    en el orden de os.walk. El recorrido se reutiliza mientras ninguna carpeta haya cambiado.
+    """
+    ruta_base = os.path.abspath(ruta_base)
+    archivos = None
+    with _candado:
+        recorridos = list(_recorridos.items())
+    for base, (encontrados, carpetas) in recorridos:
+        # También sirve el recorrido de una carpeta que contiene a ruta_base, filtrado
+        if base == ruta_base or ruta_base.startswith(base.rstrip(os.sep) + os.sep):
+            if not _recorrido_vigente(carpetas):
+                with _candado:
+                    _recorridos.pop(base, None)
+                continue
+            prefijo = ruta_base + os.sep
+            archivos = encontrados if base == ruta_base else [ruta for ruta in encontrados if ruta.startswith(prefijo)]
+            with _candado:
+                if base in _recorridos:
+                    _recorridos.move_to_end(base)
+            break
+    if archivos is None:
+        # El mtime de cada carpeta se toma antes de listarla: un cambio durante el recorrido invalida el resultado
+        archivos, carpetas = [], {ruta_base: _mtime(ruta_base)}
+        for raiz, subcarpetas, nombres in os.walk(ruta_base):
+            for subcarpeta in subcarpetas:
+                carpetas[os.path.join(raiz, subcarpeta)] = _mtime(os.path.join(raiz, subcarpeta))
+            for nombre in nombres:
+                archivos.append(os.path.join(raiz, nombre))
+        with _candado:
+            _recorridos[ruta_base] = (archivos, carpetas)
+            _recorridos.move_to_end(ruta_base)
+            while len(_recorridos) > MAX_RECORRIDOS:
+                _recorridos.popitem(last=False)
+    return [ruta for ruta in archivos if ruta.endswith(extensiones)]
+
+def limpiar_cache():
+    global _bytes_en_cache
+    with _candado:
+        _archivos.clear()
+        _bytes_en_cache = 0
+        _recorridos.clear()
+
+def buscar_carpeta_proyecto(ruta_src, extensiones=('.cpp', '.h')):
+    """
+    Devuelve la primera subcarpeta de src/ con fuentes C++ (proyecto de Visual Studio)
+    o la propia src/ si no hay ninguna (proyecto de Mac).
+    """
+    if not os.path.exists(ruta_src):
+        print(f"Advertencia: El directorio {ruta_src} no existe.")
+        return ruta_src
+    for carpeta in os.listdir(ruta_src):
+        ruta_carpeta = os.path.join(ruta_src, carpeta)
+        if os.path.isdir(ruta_carpeta):
+            for archivo in os.listdir(ruta_carpeta):
+                if archivo.endswith(extensiones):
+                    return ruta_carpeta
+    return ruta_src
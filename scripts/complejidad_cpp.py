@@ -0,0 +1,134 @@
+from hechos_cpp import hechos_de_archivo
+
+# Estructuras que abren un nivel de anidamiento (para la complejidad cognitiva y la profundidad)
+ESTRUCTURAS_ANIDADAS = {'if', 'for', 'while', 'switch', 'catch', 'do'}
+
+def fin_de_sentencia(codigo, k, parejas, fin):
+    """Índice del último token de la sentencia que empieza en codigo[k] (un bloque, un if/for/... o una sentencia simple)."""
+    if k >= fin:
+        return fin
+    texto = codigo[k][1]
+    if texto == '{':
+        return parejas.get(k, fin)
+    if texto in ('if', 'for', 'while', 'switch', 'catch') and k + 1 < fin and codigo[k + 1][1] == '(':
+        ultimo = fin_de_sentencia(codigo, parejas.get(k + 1, fin) + 1, parejas, fin)
+        if texto == 'if' and ultimo + 1 < fin and codigo[ultimo + 1][1] == 'else':
+            ultimo = fin_de_sentencia(codigo, ultimo + 2, parejas, fin)
+        return ultimo
+    if texto in ('else', 'do', 'try'):
+        return fin_de_sentencia(codigo, k + 1, parejas, fin)
+    while k < fin and codigo[k][1] != ';':
+        k = parejas.get(k, k) + 1 if codigo[k][1] in ('(', '[', '{') else k + 1
+    return k
+
+def cuerpo_de(codigo, k, parejas, fin):
+    # Rango de tokens del cuerpo de la estructura de control que empieza en codigo[k]
+    if codigo[k][1] in ('else', 'do'):
+        inicio = k + 1
+    else:
+        inicio = parejas.get(k + 1, k) + 1
+    return fin_de_sentencia(codigo, inicio, parejas, fin)
+
+def es_while_de_do(codigo, k, parejas):
+    # El "while" de un do { ... } while (...); no es un ciclo nuevo
+    if k == 0 or codigo[k - 1][1] != '}':
+        return False
+    apertura = parejas.get(k - 1)
+    return apertura is not None and apertura > 0 and codigo[apertura - 1][1] == 'do'
+
+def complejidad_de_funcion(hechos, indice_funcion):
+    """
+    Recorre una vez los tokens del cuerpo de la función y devuelve su complejidad ciclomática
+    (McCabe: 1 + decisiones), su complejidad cognitiva (cada estructura suma 1 más su nivel de
+    anidamiento; else/else if y cada secuencia de && o || suman 1) y su profundidad máxima de anidamiento.
+    """
+    codigo = hechos['codigo']
+    parejas = hechos['parejas']
+    funcion = hechos['funciones'][indice_funcion]
+    inicio, fin = funcion['cuerpo']
+
+    ciclomatica = 1
+    cognitiva = 0
+    anidamiento = 0
+    regiones = []  # fin de cada región de anidamiento abierta
+    ultimo_logico = None
+    for k in range(inicio + 1, fin):
+        while regiones and k > regiones[-1]:
+            regiones.pop()
+        nivel = len(regiones)
+        tipo, texto, _ = codigo[k]
+
+        if texto in (';', '{', '}'):
+            ultimo_logico = None
+        if tipo == 'operador':
+            if texto in ('&&', '||'):
+                ciclomatica += 1
+                if texto != ultimo_logico:
+                    cognitiva += 1
+                ultimo_logico = texto
+            elif texto == '?':
+                ciclomatica += 1
+                cognitiva += 1 + nivel
+            elif texto == '{' and (codigo[k - 1][1] == ']' or
+                                   codigo[k - 1][1] == ')' and codigo[parejas.get(k - 1, k) - 1][1] == ']'):
+                # Las lambdas anidan lo que contienen
+                regiones.append(parejas.get(k, fin))
+            continue
+        if tipo != 'identificador':
+            continue
+
+        if texto == 'if':
+            ciclomatica += 1
+            cognitiva += 1 if codigo[k - 1][1] == 'else' else 1 + nivel
+        elif texto == 'else':
+            if k + 1 < fin and codigo[k + 1][1] == 'if':
+                continue  # el "else if" lo cuenta el if
+            cognitiva += 1
+        elif texto in ('for', 'while', 'catch', 'do'):
+            if texto == 'while' and es_while_de_do(codigo, k, parejas):
+                continue
+            ciclomatica += 1
+            cognitiva += 1 + nivel
+        elif texto == 'switch':
+            cognitiva += 1 + nivel
+        elif texto == 'case':
+            ciclomatica += 1
+            continue
+        elif texto == 'goto':
+            cognitiva += 1
+            continue
+        elif (texto == funcion['nombre'] and k + 1 < fin and codigo[k + 1][1] == '('
+              and codigo[k - 1][1] not in ('.', '->', '::')):
+            cognitiva += 1  # Llamada recursiva
+            continue
+        else:
+            continue
+
+        # Una estructura que abre un nivel de anidamiento hasta el final de su cuerpo
+        if texto in ESTRUCTURAS_ANIDADAS or texto == 'else':
+            regiones.append(cuerpo_de(codigo, k, parejas, fin))
+            if texto != 'else':
+                anidamiento = max(anidamiento, len(regiones))
+            ultimo_logico = None
+
+    return {
+        'nombre': funcion['nombre'],
+        'nombre_completo': funcion['nombre_completo'],
+        'clase': funcion['clase'],
+        'linea_inicio': funcion['linea_inicio'],
+        'linea_fin': funcion['linea_fin'],
+        'ciclomatica': ciclomatica,
+        'cognitiva': cognitiva,
+        'anidamiento': anidamiento
+    }
+
+def complejidad_de_hechos(hechos):
+    # Los cuerpos de las funciones no se solapan: el costo total es lineal en los tokens del archivo
+    return [complejidad_de_funcion(hechos, indice) for indice in range(len(hechos['funciones']))]
+
+def complejidad_de_archivo(ruta_archivo):
+    """Lista con la complejidad de cada función del archivo, o None si no se puede leer."""
+    hechos = hechos_de_archivo(ruta_archivo)
+    if hechos is None:
+        return None
+    return complejidad_de_hechos(hechos)
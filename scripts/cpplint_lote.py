@@ -0,0 +1,170 @@
+import os
+import json
+import hashlib
+import subprocess
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+from cargador_fuentes import leer_archivo
+from instrumentacion import contar, medido
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DIR = os.environ.get('CPPLINT_CACHE_DIR', os.path.join(PROJECT_ROOT, '.cache', 'cpplint'))
+CACHE_MAX_BYTES = int(os.environ.get('CPPLINT_CACHE_MAX_MB', '64')) * 1024 * 1024
+FILTRO_POR_DEFECTO = '-whitespace/comments'
+# Archivos por invocación de cpplint, para no exceder el límite de argumentos del sistema
+ARCHIVOS_POR_LLAMADA = 200
+
+# Caché LRU en memoria compartida por los analizadores del mismo proceso: clave -> mensajes sin la ruta
+_resultados = OrderedDict()
+MAX_RESULTADOS = 4096
+# Un solo lote a la vez: si dos analizadores piden los mismos archivos en paralelo,
+# el segundo espera y los encuentra ya en la caché
+_candado = threading.Lock()
+
+@lru_cache(maxsize=None)
+def obtener_version_cpplint():
+    try:
+        resultado = subprocess.run(['cpplint', '--version'], capture_output=True, text=True)
+        return (resultado.stdout or resultado.stderr).strip()
+    except OSError:
+        return None
+
+def calcular_clave(ruta_archivo, contenido, filtro, version):
+    # cpplint también depende de la ruta (guardas de encabezado, orden de includes),
+    # así que entra en la clave junto con el contenido, el filtro y la versión
+    digest = hashlib.sha256()
+    for parte in (version, filtro, os.path.abspath(ruta_archivo), contenido):
+        digest.update(parte.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+def leer_cache_disco(clave):
+    ruta = os.path.join(CACHE_DIR, f"{clave}.json")
+    try:
+        with open(ruta, 'r', encoding='utf-8') as f:
+            mensajes = json.load(f)
+        os.utime(ruta)  # Política LRU: un acierto renueva la entrada
+        return mensajes
+    except (OSError, ValueError):
+        return None
+
+def guardar_cache_disco(clave, mensajes):
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        destino = os.path.join(CACHE_DIR, f"{clave}.json")
+        temporal = f"{destino}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(mensajes, f, ensure_ascii=False)
+        os.replace(temporal, destino)
+    except OSError as e:
+        print(f"Advertencia: No se pudo guardar el resultado de cpplint en la caché: {e}")
+
+def recortar_cache_disco(max_bytes=CACHE_MAX_BYTES):
+    # Borra las entradas usadas hace más tiempo hasta que la caché quepa en max_bytes
+    entradas = []
+    try:
+        nombres = os.listdir(CACHE_DIR)
+    except OSError:
+        return
+    for nombre in nombres:
+        if not nombre.endswith('.json'):
+            continue  # Escritura en curso de otro proceso
+        ruta = os.path.join(CACHE_DIR, nombre)
+        try:
+            stat = os.stat(ruta)
+        except FileNotFoundError:
+            continue
+        entradas.append((stat.st_mtime, stat.st_size, ruta))
+
+    total = sum(tamano for _, tamano, _ in entradas)
+    for _, tamano, ruta in sorted(entradas):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(ruta)
+            total -= tamano
+        except FileNotFoundError:
+            continue
+
+def recordar(clave, mensajes):
+    _resultados[clave] = mensajes
+    _resultados.move_to_end(clave)
+    while len(_resultados) > MAX_RESULTADOS:
+        _resultados.popitem(last=False)
+
+def separar_por_archivo(salida, rutas):
+    """
+    Reparte la salida combinada de cpplint (stderr) entre los archivos del lote.
+    Cada mensaje empieza con la ruta tal como se pasó en la línea de comandos;
+    se guarda sin ella para que el resultado en caché no dependa de cómo se nombró el archivo.
+    """
+    mensajes = {ruta: [] for ruta in rutas}
+    # Las rutas más largas primero para que 'a/b.h' no capture los mensajes de 'a/b.h.cpp'
+    prefijos = sorted(((ruta + ':', ruta) for ruta in rutas), key=lambda p: len(p[0]), reverse=True)
+    for linea in salida.splitlines():
+        for prefijo, ruta in prefijos:
+            if linea.startswith(prefijo):
+                mensajes[ruta].append(linea[len(ruta):])
+                break
+    return mensajes
+
+@medido('cpplint')
+def ejecutar_cpplint_lote(rutas, filtro=FILTRO_POR_DEFECTO, usar_cache=True):
+    """
+    Devuelve {ruta: salida de cpplint} para todos los archivos, con el mismo formato que
+    tendría 'cpplint --filter=<filtro> <ruta>' en stderr, lanzando un único proceso de cpplint
+    por cada ARCHIVOS_POR_LLAMADA archivos que no estén ya en la caché.
+    """
+    version = obtener_version_cpplint()
+    if version is None:
+        return {ruta: f"Error ejecutando cpplint en {ruta}: no se encontró el ejecutable 'cpplint'" for ruta in rutas}
+
+    with _candado:
+        claves = {}
+        mensajes_por_ruta = {}
+        pendientes = []
+        for ruta in dict.fromkeys(rutas):
+            contenido = leer_archivo(ruta)
+            clave = calcular_clave(ruta, contenido or '', filtro, version)
+            claves[ruta] = clave
+            if not usar_cache:
+                pendientes.append(ruta)
+                continue
+            mensajes = _resultados.get(clave)
+            if mensajes is None:
+                mensajes = leer_cache_disco(clave)
+            if mensajes is None:
+                pendientes.append(ruta)
+            else:
+                mensajes_por_ruta[ruta] = mensajes
+                recordar(clave, mensajes)
+        contar(archivos=len(claves), aciertos_cache=len(claves) - len(pendientes),
+               bytes=sum(len(leer_archivo(ruta) or '') for ruta in pendientes))
+
+        for inicio in range(0, len(pendientes), ARCHIVOS_POR_LLAMADA):
+            lote = pendientes[inicio:inicio + ARCHIVOS_POR_LLAMADA]
+            try:
+                resultado = subprocess.run(
+                    ['cpplint', f'--filter={filtro}', *lote],
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    text=True
+                )
+            except Exception as e:
+                for ruta in lote:
+                    mensajes_por_ruta[ruta] = [f": Error ejecutando cpplint: {str(e)}"]
+                continue
+            for ruta, mensajes in separar_por_archivo(resultado.stderr, lote).items():
+                mensajes_por_ruta[ruta] = mensajes
+                recordar(claves[ruta], mensajes)
+                if usar_cache:
+                    guardar_cache_disco(claves[ruta], mensajes)
+        if usar_cache and pendientes:
+            recortar_cache_disco()
+
+        return {ruta: ''.join(f"{ruta}{mensaje}\n" for mensaje in mensajes_por_ruta[ruta]) for ruta in claves}
+
+def ejecutar_cpplint(ruta_archivo, filtro=FILTRO_POR_DEFECTO):
+    return ejecutar_cpplint_lote([ruta_archivo], filtro)[ruta_archivo]
@@ -0,0 +1,185 @@
+import os
+import sys
+from datetime import datetime
+from collections import defaultdict
+
+from cargador_fuentes import leer_archivo, listar_archivos
+from hechos_cpp import PALABRAS_CLAVE, tokenizar as tokenizar_cpp
+from registros import escribir_markdown, escribir_registro, nombre_entrega
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+OUTPUT_DIR = os.path.join(os.path.dirname(SCRIPT_DIR), "output")
+
+# Tamaño mínimo (en tokens normalizados) de un fragmento para considerarlo duplicado
+TOKENS_MINIMOS = 30
+BASE_HASH = 1_000_003
+MODULO_HASH = (1 << 61) - 1
+# Aumentar al cambiar cómo tokenizar normaliza el código: las huellas ya indexadas dejan de servir
+VERSION_NORMALIZACION = 1
+
+def tokenizar(contenido):
+    """
+    Devuelve la lista de (token normalizado, línea) del código. Los identificadores pasan a 'ID',
+    los literales a 'NUM'/'STR', y se descartan comentarios y directivas del preprocesador,
+    de modo que un fragmento copiado con variables renombradas produce los mismos tokens.
+    """
+    tokens = []
+    for tipo, texto, linea in tokenizar_cpp(contenido):
+        if tipo in ('comentario', 'preprocesador'):
+            continue
+        if tipo == 'identificador':
+            token = texto if texto in PALABRAS_CLAVE else 'ID'
+        elif tipo in ('cadena', 'caracter'):
+            token = 'STR'
+        elif tipo == 'numero':
+            token = 'NUM'
+        else:
+            token = texto
+        tokens.append((token, linea))
+    return tokens
+
+def hashes_de_ventanas(valores, ventana):
+    # Rabin-Karp: hash de cada ventana de 'ventana' tokens consecutivos en tiempo lineal
+    if len(valores) < ventana:
+        return []
+    potencia = pow(BASE_HASH, ventana - 1, MODULO_HASH)
+    h = 0
+    for valor in valores[:ventana]:
+        h = (h * BASE_HASH + valor) % MODULO_HASH
+    hashes = [h]
+    for i in range(ventana, len(valores)):
+        h = ((h - valores[i - ventana] * potencia) * BASE_HASH + valores[i]) % MODULO_HASH
+        hashes.append(h)
+    return hashes
+
+def detectar_clones(archivos, ventana=TOKENS_MINIMOS):
+    """
+    Busca fragmentos duplicados entre todos los archivos dados ({clave: contenido}; la clave
+    puede ser una ruta o una tupla (entrega, ruta)). Cada ventana de tokens se indexa por su
+    hash, y solo se comparan las ventanas que colisionan, así que el costo es lineal en el
+    total de tokens más el número de coincidencias. Devuelve una lista de clones con la
+    ubicación del original y de la copia y su tamaño, del más grande al más pequeño.
+    """
+    ids_token = {}
+    tokens_por_archivo = {}
+    valores_por_archivo = {}
+    indice = defaultdict(list)
+
+    for clave, contenido in archivos.items():
+        tokens = tokenizar(contenido or '')
+        valores = [ids_token.setdefault(token, len(ids_token) + 1) for token, _ in tokens]
+        tokens_por_archivo[clave] = tokens
+        valores_por_archivo[clave] = valores
+        for posicion, h in enumerate(hashes_de_ventanas(valores, ventana)):
+            indice[h].append((clave, posicion))
+
+    clones = []
+    for ocurrencias in indice.values():
+        if len(ocurrencias) < 2:
+            continue
+        # Cada ocurrencia se compara solo con la anterior de idéntico contenido (las colisiones
+        # del hash se separan por el fragmento exacto), no todas contra todas: n copias dan n-1 clones
+        anteriores = {}
+        for clave, posicion in ocurrencias:
+            fragmento = tuple(valores_por_archivo[clave][posicion:posicion + ventana])
+            anterior = anteriores.get(fragmento)
+            if anterior is not None:
+                clon = extender_clon(valores_por_archivo, anterior[0], anterior[1], clave, posicion, ventana)
+                if clon:
+                    clones.append(clon)
+            anteriores[fragmento] = (clave, posicion)
+
+    resultado = []
+    for clave_a, inicio_a, clave_b, inicio_b, longitud in clones:
+        tokens_a = tokens_por_archivo[clave_a]
+        tokens_b = tokens_por_archivo[clave_b]
+        original = describir_fragmento(clave_a, tokens_a, inicio_a, longitud)
+        copia = describir_fragmento(clave_b, tokens_b, inicio_b, longitud)
+        resultado.append({
+            'original': original,
+            'copia': copia,
+            'tokens': longitud,
+            'lineas': copia['linea_fin'] - copia['linea_inicio'] + 1
+        })
+    resultado.sort(key=lambda c: (-c['tokens'], str(c['original']['archivo']), c['original']['linea_inicio']))
+    return resultado
+
+def extender_clon(valores_por_archivo, clave_a, inicio_a, clave_b, inicio_b, ventana):
+    valores_a = valores_por_archivo[clave_a]
+    valores_b = valores_por_archivo[clave_b]
+    # Si el token anterior también coincide, esta ventana está dentro de un clon que
+    # ya se reporta desde una posición anterior
+    if inicio_a > 0 and inicio_b > 0 and valores_a[inicio_a - 1] == valores_b[inicio_b - 1]:
+        return None
+    mismo_archivo = clave_a == clave_b
+    if mismo_archivo and abs(inicio_b - inicio_a) < ventana:
+        return None  # Código periódico que se solapa consigo mismo
+
+    longitud = ventana
+    limite = min(len(valores_a) - inicio_a, len(valores_b) - inicio_b)
+    if mismo_archivo:
+        limite = min(limite, abs(inicio_b - inicio_a))
+    while longitud < limite and valores_a[inicio_a + longitud] == valores_b[inicio_b + longitud]:
+        longitud += 1
+    return clave_a, inicio_a, clave_b, inicio_b, longitud
+
+def describir_fragmento(clave, tokens, inicio, longitud):
+    return {
+        'archivo': clave,
+        'linea_inicio': tokens[inicio][1],
+        'linea_fin': tokens[inicio + longitud - 1][1]
+    }
+
+def cargar_archivos(ruta_base, extensiones=('.cpp', '.h', '.hpp'), entrega=None):
+    archivos = {}
+    for ruta in listar_archivos(ruta_base, extensiones):
+        contenido = leer_archivo(ruta)
+        if contenido is not None:
+            relativa = os.path.relpath(ruta, ruta_base)
+            archivos[(entrega, relativa) if entrega is not None else relativa] = contenido
+    return archivos
+
+def detectar_clones_entre_entregas(ruta_lote, ventana=TOKENS_MINIMOS):
+    """Indexa juntas todas las entregas de ruta_lote (una carpeta por estudiante) y marca los clones entre entregas."""
+    archivos = {}
+    for entrega in sorted(os.listdir(ruta_lote)):
+        ruta_src = os.path.join(ruta_lote, entrega, 'src')
+        if os.path.isdir(ruta_src):
+            archivos.update(cargar_archivos(ruta_src, entrega=entrega))
+    clones = detectar_clones(archivos, ventana)
+    for clon in clones:
+        clon['entre_entregas'] = clon['original']['archivo'][0] != clon['copia']['archivo'][0]
+    return clones
+
+def formatear_ubicacion(fragmento):
+    archivo = fragmento['archivo']
+    # (entrega, ruta relativa) en el modo por lotes; en el registro JSON queda como lista
+    if isinstance(archivo, (tuple, list)):
+        archivo = f"{archivo[0]}/{archivo[1]}"
+    return f"{archivo}:{fragmento['linea_inicio']}-{fragmento['linea_fin']}"
+
+def generar_reporte_lote(registro):
+    clones = registro['clones']
+    yield "# 🔁 Reporte de Código Duplicado entre Entregas\n\n"
+    yield f"📅 Fecha de análisis: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n"
+    yield f"📂 Lote analizado: {registro['lote']}\n\n"
+    entre_entregas = [clon for clon in clones if clon['entre_entregas']]
+    yield f"- 🔁 Fragmentos duplicados: **{len(clones)}**\n"
+    yield f"- 👥 Fragmentos compartidos entre entregas distintas: **{len(entre_entregas)}**\n\n"
+    if clones:
+        yield "| Original | Copia | Tokens | Líneas | Entre entregas |\n"
+        yield "|:---------|:------|-------:|-------:|:--------------:|\n"
+        for clon in clones:
+            yield (f"| {formatear_ubicacion(clon['original'])} | {formatear_ubicacion(clon['copia'])} "
+                   f"| {clon['tokens']} | {clon['lineas']} | {'Sí' if clon['entre_entregas'] else 'No'} |\n")
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2 or not os.path.isdir(sys.argv[1]):
+        print("Uso: python scripts/detector_clones.py <directorio con una carpeta por entrega>")
+        sys.exit(1)
+    ruta_lote = os.path.abspath(sys.argv[1])
+    clones = detectar_clones_entre_entregas(ruta_lote)
+    registro = escribir_registro(OUTPUT_DIR, 'clones', nombre_entrega(ruta_lote), {'lote': ruta_lote, 'clones': clones})
+    ruta_reporte = os.path.join(OUTPUT_DIR, f"REPORTE_CLONES_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md")
+    escribir_markdown(ruta_reporte, generar_reporte_lote(registro))
+    print(f"Reporte generado: {ruta_reporte}")
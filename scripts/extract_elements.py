@@ -1,79 +1,79 @@
 import os
-import re
 import json
-import subprocess
 from collections import Counter
-from datetime import datetime
 import hashlib
 
-def leer_archivo(ruta_archivo):
-    encodings = ['utf-8', 'latin-1', 'ISO-8859-1']
-    for encoding in encodings:
-        try:
-            with open(ruta_archivo, 'r', encoding=encoding) as file:
-                return file.read()
-        except UnicodeDecodeError:
-            continue
-    print(f"Error: No se pudo leer el archivo {ruta_archivo} con ninguna codificación conocida.")
-    return None
+from cargador_fuentes import leer_archivo, listar_archivos
+import hechos_cpp
+import complejidad_cpp
+import cpplint_lote
+from cpplint_lote import ejecutar_cpplint, ejecutar_cpplint_lote, obtener_version_cpplint
+from hechos_cpp import hechos_de_archivo, PALABRAS_CLAVE
+from complejidad_cpp import complejidad_de_funcion
+from almacen_resultados import resultados_por_archivo, version_de_codigo
+from registros import escribir_registro, nombre_entrega
+
+VERSION_ANALISIS = version_de_codigo(__file__, hechos_cpp.__file__, complejidad_cpp.__file__, cpplint_lote.__file__)
 
 def buscar_carpetas_proyecto(ruta_src):
     carpetas_proyecto = []
-    for raiz, dirs, archivos in os.walk(ruta_src):
-        if any(archivo.endswith(('.cpp', '.h')) for archivo in archivos):
-            carpetas_proyecto.append(raiz)
+    for ruta in listar_archivos(ruta_src, ('.cpp', '.h')):
+        carpeta = os.path.dirname(ruta)
+        if carpeta not in carpetas_proyecto:
+            carpetas_proyecto.append(carpeta)
     return carpetas_proyecto
 
-def extraer_elementos(contenido):
-    clases = re.findall(r'\bclass\s+(\w+)', contenido)
-    funciones = re.findall(r'\b(\w+)\s*\([^)]*\)\s*(?:const)?\s*(?:override)?\s*{', contenido)
-    variables = re.findall(r'\b(?:int|float|double|char|bool|string|vector)\s+(\w+)', contenido)
-    variables += re.findall(r'\bconst\s+\w+\s*&?\s*(\w+)', contenido)
-    comentarios = re.findall(r'//.*?$|/\*.*?\*/', contenido, re.DOTALL | re.MULTILINE)
-    librerias = re.findall(r'#include\s*[<"]([^>"]+)[>"]', contenido)
-    
+def extraer_elementos(hechos):
+    tipos_variable = {'int', 'float', 'double', 'char', 'bool', 'string', 'vector'}
+    variables = [d['nombre'] for d in hechos['declaraciones']
+                 if d['tipo'] in tipos_variable and not d['es_funcion']]
+    # Las constantes: "const T x", "const T& x"
+    codigo = hechos['codigo']
+    for i, (tipo, texto, _) in enumerate(codigo):
+        if texto == 'const' and i + 1 < len(codigo) and codigo[i + 1][0] == 'identificador':
+            k = i + 2
+            while k < len(codigo) and codigo[k][1] in ('&', '*'):
+                k += 1
+            if k < len(codigo) and codigo[k][0] == 'identificador':
+                variables.append(codigo[k][1])
+
     return {
-        'clases': clases,
-        'funciones': funciones,
+        'clases': [c['nombre'] for c in hechos['clases'] if c['tipo'] == 'class' and c['nombre']],
+        'funciones': [f['nombre'] for f in hechos['funciones']],
         'variables': variables,
-        'comentarios': [c.strip() for c in comentarios],
-        'librerias': librerias
+        'comentarios': [c['texto'].strip() for c in hechos['comentarios']],
+        'librerias': [i['nombre'] for i in hechos['includes']]
     }
 
-def calcular_complejidad_funcion(contenido_funcion):
-    estructuras_control = re.findall(r'\b(if|else|for|while|switch|case)\b', contenido_funcion)
-    operadores_logicos = re.findall(r'\b(&&|\|\|)\b', contenido_funcion)
-    llamadas_funciones = re.findall(r'\b\w+\s*\(', contenido_funcion)
-    
+def calcular_complejidad_funcion(hechos, indice_funcion):
+    funcion = hechos['funciones'][indice_funcion]
+    inicio, fin = funcion['cuerpo']
+    tokens_control = [c['token'] for c in hechos['control'] if c['funcion'] == indice_funcion]
+    estructuras_control = [t for t in tokens_control if t in ('if', 'else', 'for', 'while', 'switch', 'case')]
+    operadores_logicos = [t for t in tokens_control if t in ('&&', '||')]
+    codigo = hechos['codigo']
+    llamadas_funciones = [i for i in range(inicio, fin) if codigo[i][0] == 'identificador'
+                          and codigo[i][1] not in PALABRAS_CLAVE and codigo[i + 1][1] == '(']
+    metricas = complejidad_de_funcion(hechos, indice_funcion)
+
     complejidad = {
         'estructuras_control': Counter(estructuras_control),
         'operadores_logicos': len(operadores_logicos),
         'llamadas_funciones': len(llamadas_funciones),
-        'complejidad_ciclomatica': len(estructuras_control) + len(operadores_logicos) + 1
+        'complejidad_ciclomatica': metricas['ciclomatica'],
+        'complejidad_cognitiva': metricas['cognitiva'],
+        'anidamiento_maximo': metricas['anidamiento'],
+        'linea_inicio': metricas['linea_inicio'],
+        'linea_fin': metricas['linea_fin']
     }
     return complejidad
 
-def extraer_funciones_con_complejidad(contenido):
-    patron_funcion = r'\b(\w+)\s*\([^)]*\)\s*(?:const)?\s*(?:override)?\s*{([^}]*)}'
-    funciones = re.findall(patron_funcion, contenido, re.DOTALL)
+def extraer_funciones_con_complejidad(hechos):
     funciones_con_complejidad = {}
-    for nombre_funcion, contenido_funcion in funciones:
-        complejidad = calcular_complejidad_funcion(contenido_funcion)
-        funciones_con_complejidad[nombre_funcion] = complejidad
+    for indice, funcion in enumerate(hechos['funciones']):
+        funciones_con_complejidad[funcion['nombre']] = calcular_complejidad_funcion(hechos, indice)
     return funciones_con_complejidad
 
-def ejecutar_cpplint(ruta_archivo):
-    try:
-        resultado = subprocess.run(
-            ['cpplint', '--filter=-whitespace/comments', ruta_archivo],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
-        )
-        return resultado.stderr
-    except Exception as e:
-        return f"Error ejecutando cpplint en {ruta_archivo}: {str(e)}"
-
 def analizar_indentacion(salida_cpplint):
     errores_indentacion = [error for error in salida_cpplint.split('\n') if 'whitespace/indent' in error]
     return len(errores_indentacion) == 0
@@ -83,11 +83,12 @@ def calcular_hash_contenido(contenido):
 
 def analizar_archivo(ruta_completa):
     contenido = leer_archivo(ruta_completa)
-    if contenido is None:
+    hechos = hechos_de_archivo(ruta_completa)
+    if contenido is None or hechos is None:
         return None
     
-    elementos = extraer_elementos(contenido)
-    funciones_con_complejidad = extraer_funciones_con_complejidad(contenido)
+    elementos = extraer_elementos(hechos)
+    funciones_con_complejidad = extraer_funciones_con_complejidad(hechos)
     salida_cpplint = ejecutar_cpplint(ruta_completa)
     indentacion_correcta = analizar_indentacion(salida_cpplint)
     hash_contenido = calcular_hash_contenido(contenido)
@@ -120,15 +121,18 @@ def analizar_archivo(ruta_completa):
         'hash_contenido': hash_contenido
     }
 
+def analizar_archivos(rutas):
+    # cpplint se ejecuta una vez para todos los archivos; analizar_archivo lee el resultado de la caché
+    ejecutar_cpplint_lote(rutas)
+    return {ruta: analizar_archivo(ruta) for ruta in rutas}
+
 def guardar_resultado(resultado, ruta_salida):
     with open(ruta_salida, 'w', encoding='utf-8') as f:
         json.dump(resultado, f, indent=2, ensure_ascii=False)
 
-def main():
+def ejecutar_analisis(ruta_proyecto, ruta_output):
     print("🔍 Iniciando análisis de código...")
-    ruta_proyecto = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     ruta_src = os.path.join(ruta_proyecto, 'src')
-    ruta_output = os.path.join(ruta_proyecto, 'output')
     os.makedirs(ruta_output, exist_ok=True)
 
     print("🔎 Buscando carpetas del proyecto...")
@@ -138,20 +142,27 @@ def main():
     print("📊 Analizando archivos...")
     
     resultados_globales = {}
-    for carpeta in carpetas_proyecto:
-        for raiz, _, archivos in os.walk(carpeta):
-            for archivo in archivos:
-                if archivo.endswith(('.cpp', '.h')):
-                    ruta_completa = os.path.join(raiz, archivo)
-                    resultado = analizar_archivo(ruta_completa)
-                    
-                    if resultado:
-                        nombre_base = os.path.splitext(archivo)[0]
-                        ruta_resultado = os.path.join(ruta_output, f'analisis_{nombre_base}.json')
-                        guardar_resultado({archivo: resultado}, ruta_resultado)
-                        resultados_globales[archivo] = resultado
-                        print(f"✅ Análisis completado para {archivo}")
-                        print(f"📊 Resultados guardados en: {ruta_resultado}")
+    rutas_resultados = []
+    archivos = listar_archivos(ruta_src, ('.cpp', '.h'))
+    # Solo se analizan los archivos cuyo contenido cambió desde la última ejecución. La clave incluye
+    # la ruta porque cpplint depende de ella (guardas de encabezado, include_subdir)
+    version = f"{VERSION_ANALISIS}-{obtener_version_cpplint()}"
+    resultados = resultados_por_archivo('elementos', version, archivos, analizar_archivos, por_ruta=True)
+
+    # Cada archivo se analiza una sola vez aunque sus carpetas estén anidadas
+    for ruta_completa in archivos:
+        archivo = os.path.basename(ruta_completa)
+        resultado = resultados[ruta_completa]
+        
+        if resultado:
+            nombre_base = os.path.splitext(archivo)[0]
+            ruta_resultado = os.path.join(ruta_output, f'analisis_{nombre_base}.json')
+            guardar_resultado({archivo: resultado}, ruta_resultado)
+            resultados_globales[archivo] = resultado
+            if ruta_resultado not in rutas_resultados:
+                rutas_resultados.append(ruta_resultado)
+            print(f"✅ Análisis completado para {archivo}")
+            print(f"📊 Resultados guardados en: {ruta_resultado}")
 
     # Análisis de posible plagio
     hashes_unicos = set()
@@ -162,6 +173,10 @@ def main():
         else:
             hashes_unicos.add(resultado['hash_contenido'])
 
+    # Un solo registro compacto con todos los archivos, además de los JSON por archivo
+    escribir_registro(ruta_output, 'elementos', nombre_entrega(ruta_proyecto),
+                      {'archivos': resultados_globales, 'duplicados': archivos_duplicados})
+
     if archivos_duplicados:
         print("\n⚠️ Posible plagio detectado en los siguientes archivos:")
         for archivo in archivos_duplicados:
@@ -170,6 +185,11 @@ def main():
         print("\n✅ No se detectaron archivos duplicados.")
 
     print("\n🎉 Análisis de todos los archivos completado.")
+    return rutas_resultados
+
+def main():
+    ruta_proyecto = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    ejecutar_analisis(ruta_proyecto, os.path.join(ruta_proyecto, 'output'))
 
 if __name__ == "__main__":
     main()
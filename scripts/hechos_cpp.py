@@ -0,0 +1,325 @@
+import os
+import re
+import threading
+
+from cargador_fuentes import leer_archivo
+from instrumentacion import contar, medido
+
+PALABRAS_CLAVE = {
+    'alignas', 'alignof', 'auto', 'bool', 'break', 'case', 'catch', 'char', 'class', 'const',
+    'constexpr', 'const_cast', 'continue', 'decltype', 'default', 'delete', 'do', 'double',
+    'dynamic_cast', 'else', 'enum', 'explicit', 'extern', 'false', 'float', 'for', 'friend',
+    'goto', 'if', 'inline', 'int', 'long', 'mutable', 'namespace', 'new', 'noexcept', 'nullptr',
+    'operator', 'private', 'protected', 'public', 'register', 'reinterpret_cast', 'return',
+    'short', 'signed', 'sizeof', 'static', 'static_assert', 'static_cast', 'struct', 'switch',
+    'template', 'this', 'throw', 'true', 'try', 'typedef', 'typeid', 'typename', 'union',
+    'unsigned', 'using', 'virtual', 'void', 'volatile', 'while'
+}
+TIPOS_BASICOS = {'auto', 'bool', 'char', 'double', 'float', 'int', 'long', 'short', 'signed', 'unsigned', 'void'}
+# Palabras y operadores que son puntos de decisión o de control de flujo
+PALABRAS_CONTROL = {'if', 'else', 'for', 'while', 'do', 'switch', 'case', 'catch', 'goto', 'break', 'continue'}
+OPERADORES_CONTROL = {'&&', '||', '?'}
+# Lo que puede ir entre el ')' de los parámetros y el '{' del cuerpo de una función
+CALIFICADORES_FUNCION = {'const', 'override', 'final', 'noexcept', 'volatile', 'mutable', '&', '&&', 'throw'}
+PALABRAS_CON_PARENTESIS = {'if', 'for', 'while', 'switch', 'catch', 'sizeof', 'alignof', 'decltype',
+                           'noexcept', 'return', 'throw', 'static_assert'}
+
+# Tokens que pueden ir justo antes del tipo de una declaración, y palabras tras las que nunca va uno
+PRECEDEN_TIPO = {'(', ',', ';', '{', '}', ':', '::', '<', '>', '>>', '&', '*'}
+NO_PRECEDEN_TIPO = {'return', 'throw', 'case', 'delete', 'new', 'sizeof', 'goto'}
+
+PATRON_TOKEN = re.compile(r'''
+      (?P<comentario>//(?:\\\n|[^\n])*|/\*.*?(?:\*/|\Z))
+    | (?P<preprocesador>^[ \t]*\#(?:\\\n|[^\n])*)
+    | (?P<cadena>(?:u8|[uUL])?R"(?P<delimitador>[^()\\\s]{0,16})\(.*?\)(?P=delimitador)"
+                |(?:u8|[uUL])?"(?:\\.|[^"\\\n])*")
+    | (?P<caracter>(?:u8|[uUL])?'(?:\\.|[^'\\\n])*')
+    | (?P<numero>\.?\d(?:[\w.']|[eEpP][+-])*)
+    | (?P<identificador>[^\W\d]\w*)
+    | (?P<operador>->\*|<<=|>>=|\.\.\.|::|->|<<|>>|<=|>=|==|!=|&&|\|\||\+\+|--|[-+*/%&|^!=<>]=|[^\s\w])
+''', re.VERBOSE | re.DOTALL | re.MULTILINE)
+PATRON_INCLUDE = re.compile(r'#\s*include\s*([<"])([^>"]+)[>"]')
+
+def tokenizar(contenido):
+    """
+    Lexer de C++ en una sola pasada. Devuelve [(tipo, texto, línea)] con tipo en 'comentario',
+    'preprocesador', 'cadena', 'caracter', 'numero', 'identificador' (incluye palabras clave)
+    u 'operador'. Los espacios no generan tokens.
+    """
+    tokens = []
+    linea = 1
+    ultimo = 0
+    for m in PATRON_TOKEN.finditer(contenido):
+        linea += contenido.count('\n', ultimo, m.start())
+        ultimo = m.start()
+        tokens.append((m.lastgroup if m.lastgroup != 'delimitador' else 'cadena', m.group(), linea))
+    return tokens
+
+def emparejar(codigo):
+    # Índice del token que cierra/abre cada (), [] y {} balanceados
+    parejas = {}
+    pilas = {'(': [], '[': [], '{': []}
+    cierres = {')': '(', ']': '[', '}': '{'}
+    for i, (tipo, texto, _) in enumerate(codigo):
+        if tipo != 'operador':
+            continue
+        if texto in pilas:
+            pilas[texto].append(i)
+        elif texto in cierres and pilas[cierres[texto]]:
+            apertura = pilas[cierres[texto]].pop()
+            parejas[apertura] = i
+            parejas[i] = apertura
+    return parejas
+
+def nombre_antes_de(codigo, indice):
+    """Nombre calificado (A::B::f, ~A, operator==) que termina en codigo[indice], y dónde empieza."""
+    tipo, texto, _ = codigo[indice]
+    inicio = indice
+    if tipo == 'operador' and indice > 0 and codigo[indice - 1][1] == 'operator':
+        texto = 'operator' + texto
+        inicio = indice - 1
+    elif tipo != 'identificador' or texto in PALABRAS_CLAVE:
+        return None, indice
+    if inicio > 0 and codigo[inicio - 1][1] == '~':
+        texto = '~' + texto
+        inicio -= 1
+    partes = [texto]
+    while inicio >= 2 and codigo[inicio - 1][1] == '::':
+        k = inicio - 2
+        if codigo[k][1] == '>':
+            # Argumentos de plantilla de la clase: "Pila<T>::push"
+            profundidad = 0
+            while k > 0:
+                profundidad += {'>': 1, '>>': 2, '<': -1}.get(codigo[k][1], 0)
+                if profundidad <= 0:
+                    break
+                k -= 1
+            k -= 1
+        if k < 0 or codigo[k][0] != 'identificador':
+            break
+        partes.insert(0, codigo[k][1])
+        inicio = k
+    return '::'.join(partes), inicio
+
+def buscar_cierre_parametros(codigo, indice_llave, parejas):
+    # Retrocede desde '{' sobre calificadores (const, override, -> tipo...) hasta el ')' de los parámetros
+    j = indice_llave - 1
+    paso_identificador = paso_flecha = False
+    while j >= 0:
+        tipo, texto, _ = codigo[j]
+        if texto == ')':
+            if paso_identificador and not paso_flecha:
+                return None
+            return j
+        if texto == '->':
+            paso_flecha = True
+        elif texto in CALIFICADORES_FUNCION:
+            pass
+        elif tipo == 'identificador' and texto not in PALABRAS_CLAVE or texto in TIPOS_BASICOS:
+            paso_identificador = True
+        elif texto in ('::', '<', '>', '*', ',') and paso_identificador:
+            pass
+        else:
+            return None
+        j -= 1
+    return None
+
+def saltar_lista_inicializacion(codigo, i, parejas):
+    # "A::A(int x) : a(x), b{2} {": índice del ':' que abre la lista de inicialización, o None
+    j = i - 1
+    while j > 0 and codigo[j][1] in (')', '}') and parejas.get(j, 0) > 0:
+        nombre, inicio = nombre_antes_de(codigo, parejas[j] - 1)
+        if nombre is None or inicio == 0:
+            return None
+        separador = codigo[inicio - 1][1]
+        if separador == ':':
+            return inicio - 1
+        if separador != ',':
+            return None
+        j = inicio - 2
+    return None
+
+def clasificar_llave(codigo, i, parejas):
+    """Devuelve (tipo, nombre, índice del token del nombre) para el bloque que abre codigo[i] == '{'."""
+    dos_puntos = saltar_lista_inicializacion(codigo, i, parejas)
+    cierre = buscar_cierre_parametros(codigo, dos_puntos, parejas) if dos_puntos is not None else None
+    if cierre is None:
+        cierre = buscar_cierre_parametros(codigo, i, parejas)
+    if cierre is not None and parejas.get(cierre, 0) > 0:
+        apertura = parejas[cierre]
+        anterior = codigo[apertura - 1][1]
+        if anterior == ']':
+            return 'lambda', None, apertura
+        if anterior in PALABRAS_CON_PARENTESIS:
+            return 'bloque', anterior, apertura - 1
+        if anterior == ')' and parejas.get(apertura - 1, 0) > 0 and codigo[parejas[apertura - 1] - 1][1] == 'operator':
+            return 'funcion', 'operator()', parejas[apertura - 1] - 1
+        nombre, inicio_nombre = nombre_antes_de(codigo, apertura - 1)
+        if nombre is None:
+            return 'bloque', None, i
+        # "namespace std MACRO(default) {": una macro entre el nombre del namespace y la llave
+        if inicio_nombre >= 2 and codigo[inicio_nombre - 2][1] == 'namespace':
+            return 'namespace', codigo[inicio_nombre - 1][1], inicio_nombre - 2
+        return 'funcion', nombre, inicio_nombre
+
+    # Clases, estructuras, uniones, enums y namespaces: se busca la palabra clave hacia atrás
+    j = i - 1
+    while j >= 0 and codigo[j][1] not in (';', '{', '}', ')'):
+        texto = codigo[j][1]
+        if texto in ('class', 'struct', 'union'):
+            if j > 0 and codigo[j - 1][1] == 'enum':
+                return 'enum', siguiente_identificador(codigo, j + 1, i), j
+            return 'clase', siguiente_identificador(codigo, j + 1, i), j
+        if texto == 'enum':
+            return 'enum', siguiente_identificador(codigo, j + 1, i), j
+        if texto == 'namespace':
+            return 'namespace', siguiente_identificador(codigo, j + 1, i), j
+        j -= 1
+    return 'bloque', None, i
+
+def siguiente_identificador(codigo, desde, hasta):
+    for tipo, texto, _ in codigo[desde:hasta]:
+        if tipo == 'identificador' and texto not in PALABRAS_CLAVE and texto != 'final':
+            return texto
+    return None
+
+def tipo_de_declaracion(codigo, i):
+    # Tipo base de una declaración "T x", "const T& x", "vector<int> x", "unsigned int x"
+    j = i - 1
+    while j >= 0 and codigo[j][1] in ('&', '*', '&&'):
+        j -= 1
+    if j >= 0 and codigo[j][1] in ('>', '>>'):
+        profundidad = 0
+        while j >= 0:
+            texto = codigo[j][1]
+            if texto in (';', '{', '}', '(', ')', '='):
+                return None
+            profundidad += {'>': 1, '>>': 2, '<': -1}.get(texto, 0)
+            if profundidad == 0:
+                break
+            j -= 1
+        j -= 1
+    if j < 0:
+        return None
+    tipo, texto, _ = codigo[j]
+    if tipo != 'identificador' or (texto in PALABRAS_CLAVE and texto not in TIPOS_BASICOS):
+        return None
+    # "o.tam && datos", "return a * b", "x = a * b" son expresiones, no declaraciones
+    anterior = codigo[j - 1] if j > 0 else None
+    if anterior is not None and (anterior[1] in NO_PRECEDEN_TIPO or
+                                 anterior[0] == 'operador' and anterior[1] not in PRECEDEN_TIPO):
+        return None
+    return texto
+
+@medido('regex: lexer C++')
+def extraer_hechos(contenido):
+    """
+    Tabla de hechos de un archivo C++ a partir de una sola pasada del lexer y un emparejado de
+    llaves: funciones (con sus líneas y el rango de tokens del cuerpo), clases, includes,
+    comentarios, tokens de control de flujo (con la función que los contiene), identificadores,
+    llamadas y declaraciones.
+    """
+    tokens = tokenizar(contenido)
+    comentarios = []
+    includes = []
+    codigo = []
+    for tipo, texto, linea in tokens:
+        if tipo == 'comentario':
+            comentarios.append({'texto': texto, 'linea': linea})
+        elif tipo == 'preprocesador':
+            m = PATRON_INCLUDE.match(texto.strip())
+            if m:
+                includes.append({'nombre': m.group(2), 'sistema': m.group(1) == '<', 'linea': linea})
+        else:
+            codigo.append((tipo, texto, linea))
+    contar(caracteres=len(contenido), tokens=len(codigo) + len(comentarios))
+
+    parejas = emparejar(codigo)
+    funciones, clases, control, identificadores, llamadas, declaraciones = [], [], [], [], [], []
+    ambitos = []  # pila de (tipo, índice en funciones/clases o None)
+    funcion_actual = None
+    for i, (tipo, texto, linea) in enumerate(codigo):
+        if tipo == 'identificador':
+            if texto in PALABRAS_CONTROL:
+                control.append({'token': texto, 'linea': linea, 'indice': i, 'funcion': funcion_actual})
+            elif texto not in PALABRAS_CLAVE:
+                identificadores.append(texto)
+                siguiente = codigo[i + 1][1] if i + 1 < len(codigo) else None
+                if siguiente == '(':
+                    llamadas.append(texto)
+                tipo_base = tipo_de_declaracion(codigo, i) if siguiente != '::' else None
+                if tipo_base is not None:
+                    declaraciones.append({'tipo': tipo_base, 'nombre': texto, 'linea': linea,
+                                          'es_funcion': siguiente == '('})
+            continue
+        if tipo != 'operador':
+            continue
+        if texto in OPERADORES_CONTROL:
+            control.append({'token': texto, 'linea': linea, 'indice': i, 'funcion': funcion_actual})
+        elif texto == '{':
+            clase_bloque, nombre, indice_nombre = clasificar_llave(codigo, i, parejas)
+            if clase_bloque == 'funcion' and funcion_actual is None:
+                partes = nombre.split('::')
+                clase_contenedora = '::'.join(partes[:-1]) or next(
+                    (clases[k]['nombre'] for t, k in reversed(ambitos) if t == 'clase'), None)
+                funciones.append({
+                    'nombre': partes[-1],
+                    'nombre_completo': nombre,
+                    'clase': clase_contenedora,
+                    'linea_inicio': codigo[indice_nombre][2],
+                    'linea_fin': codigo[parejas.get(i, len(codigo) - 1)][2],
+                    'cuerpo': (i, parejas.get(i, len(codigo) - 1))
+                })
+                funcion_actual = len(funciones) - 1
+                ambitos.append(('funcion', funcion_actual))
+            elif clase_bloque == 'clase':
+                clases.append({
+                    'nombre': nombre,
+                    'tipo': codigo[indice_nombre][1],
+                    'linea_inicio': codigo[indice_nombre][2],
+                    'linea_fin': codigo[parejas.get(i, len(codigo) - 1)][2]
+                })
+                ambitos.append(('clase', len(clases) - 1))
+            else:
+                # Una "función" dentro de otra es en realidad un bloque (macro, clase local...)
+                ambitos.append((clase_bloque if clase_bloque != 'funcion' else 'bloque', None))
+        elif texto == '}' and ambitos:
+            tipo_ambito, _ = ambitos.pop()
+            if tipo_ambito == 'funcion':
+                funcion_actual = None
+
+    return {
+        'lineas': contenido.count('\n') + (1 if contenido and not contenido.endswith('\n') else 0),
+        'codigo': codigo,
+        'parejas': parejas,
+        'comentarios': comentarios,
+        'includes': includes,
+        'funciones': funciones,
+        'clases': clases,
+        'control': control,
+        'identificadores': identificadores,
+        'llamadas': llamadas,
+        'declaraciones': declaraciones
+    }
+
+# Hechos ya extraídos por ruta; se invalidan cuando cambia el contenido leído por cargador_fuentes
+_hechos = {}
+_candado = threading.Lock()
+
+def hechos_de_archivo(ruta_archivo):
+    """Devuelve la tabla de hechos del archivo (o None si no se puede leer), calculada una vez por proceso."""
+    contenido = leer_archivo(ruta_archivo)
+    if contenido is None:
+        return None
+    ruta_archivo = os.path.abspath(ruta_archivo)
+    entrada = _hechos.get(ruta_archivo)
+    # El cargador devuelve el mismo objeto mientras el archivo no cambie
+    if entrada is not None and entrada[0] is contenido:
+        return entrada[1]
+    hechos = extraer_hechos(contenido)
+    with _candado:
+        _hechos[ruta_archivo] = (contenido, hechos)
+    return hechos
+
+def texto_de_tokens(codigo, inicio, fin):
+    return ' '.join(texto for _, texto, _ in codigo[inicio:fin + 1])
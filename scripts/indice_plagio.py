@@ -0,0 +1,300 @@
+import os
+import sys
+import sqlite3
+import hashlib
+import argparse
+from collections import deque
+from datetime import datetime
+
+from detector_clones import tokenizar, cargar_archivos, hashes_de_ventanas, VERSION_NORMALIZACION
+from registros import escribir_markdown, escribir_registro, nombre_entrega
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUTA_INDICE = os.environ.get('PLAGIO_INDICE', os.path.join(PROJECT_ROOT, '.cache', 'indice_plagio.sqlite3'))
+# Cohorte de la entrega analizada por run_analyzers: su propia copia en el índice no cuenta como coincidencia
+COHORTE = os.environ.get('PLAGIO_COHORTE', '')
+
+# Parámetros del winnowing: k-gramas de K tokens y ventanas de W k-gramas. Toda coincidencia
+# de al menos K + W - 1 tokens normalizados comparte como mínimo una huella.
+K_GRAMA = 15
+VENTANA = 8
+# Huellas presentes en más entregas que esto se consideran código base común y no cuentan
+FRECUENCIA_MAXIMA = 50
+# Huellas calculadas con otros parámetros no son comparables: el índice guarda con cuáles se armó
+PARAMETROS = {'k_grama': K_GRAMA, 'ventana': VENTANA, 'normalizacion': VERSION_NORMALIZACION}
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS entregas (
+    id INTEGER PRIMARY KEY,
+    nombre TEXT NOT NULL,
+    cohorte TEXT NOT NULL DEFAULT '',
+    total_huellas INTEGER NOT NULL,
+    fecha TEXT NOT NULL,
+    UNIQUE (cohorte, nombre)
+);
+CREATE TABLE IF NOT EXISTS huellas (
+    huella INTEGER NOT NULL,
+    entrega INTEGER NOT NULL REFERENCES entregas(id) ON DELETE CASCADE,
+    archivo TEXT NOT NULL,
+    linea INTEGER NOT NULL,
+    PRIMARY KEY (huella, entrega)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS frecuencias (
+    huella INTEGER PRIMARY KEY,
+    entregas INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS parametros (
+    clave TEXT PRIMARY KEY,
+    valor INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS huellas_por_entrega ON huellas(entrega);
+"""
+
+_hash_token = {}
+
+def hash_estable(token):
+    # Los identificadores de token deben ser iguales entre ejecuciones para que el índice persista
+    valor = _hash_token.get(token)
+    if valor is None:
+        valor = int.from_bytes(hashlib.blake2b(token.encode('utf-8'), digest_size=4).digest(), 'big')
+        _hash_token[token] = valor
+    return valor
+
+def winnowing(hashes, ventana=VENTANA):
+    """
+    Selecciona en cada ventana de 'ventana' hashes consecutivos el mínimo (el de más a la
+    derecha si hay empate), sin repetir una posición ya elegida. Devuelve [(hash, posición)].
+    """
+    if len(hashes) < ventana:
+        return [(min(hashes), hashes.index(min(hashes)))] if hashes else []
+    seleccion = []
+    candidatos = deque()  # posiciones con hashes crecientes: el frente es el mínimo de la ventana
+    for i, h in enumerate(hashes):
+        while candidatos and hashes[candidatos[-1]] >= h:
+            candidatos.pop()
+        candidatos.append(i)
+        if candidatos[0] <= i - ventana:
+            candidatos.popleft()
+        if i >= ventana - 1 and (not seleccion or seleccion[-1][1] != candidatos[0]):
+            seleccion.append((hashes[candidatos[0]], candidatos[0]))
+    return seleccion
+
+def huellas_de_contenido(contenido):
+    tokens = tokenizar(contenido)
+    valores = [hash_estable(token) for token, _ in tokens]
+    # Hash Rabin-Karp de cada k-grama (módulo 2^61 - 1: cabe en un INTEGER de SQLite)
+    k_gramas = hashes_de_ventanas(valores, K_GRAMA)
+    return [(huella, tokens[posicion][1]) for huella, posicion in winnowing(k_gramas)]
+
+def huellas_de_entrega(ruta_src):
+    """Devuelve {huella: (archivo, línea)} con la primera aparición de cada huella en la entrega."""
+    huellas = {}
+    for archivo, contenido in sorted(cargar_archivos(ruta_src).items()):
+        for huella, linea in huellas_de_contenido(contenido):
+            huellas.setdefault(huella, (archivo, linea))
+    return huellas
+
+def abrir_indice(ruta_indice=RUTA_INDICE):
+    directorio = os.path.dirname(ruta_indice)
+    if directorio:
+        os.makedirs(directorio, exist_ok=True)
+    conexion = sqlite3.connect(ruta_indice)
+    conexion.execute("PRAGMA foreign_keys = ON")
+    conexion.execute("PRAGMA journal_mode = WAL")
+    conexion.executescript(ESQUEMA)
+    try:
+        verificar_parametros(conexion, ruta_indice)
+    except ValueError:
+        conexion.close()
+        raise
+    return conexion
+
+def verificar_parametros(conexion, ruta_indice):
+    guardados = dict(conexion.execute("SELECT clave, valor FROM parametros"))
+    if not guardados and conexion.execute("SELECT 1 FROM entregas LIMIT 1").fetchone() is None:
+        # Índice vacío: se crea de nuevo (por si quedó con el esquema de una versión anterior)
+        conexion.executescript("DROP TABLE huellas; DROP TABLE frecuencias; DROP TABLE entregas;" + ESQUEMA)
+        with conexion:
+            conexion.executemany("INSERT INTO parametros (clave, valor) VALUES (?, ?)", PARAMETROS.items())
+        return
+    if guardados != PARAMETROS:
+        raise ValueError(f"El índice {ruta_indice} se armó con otros parámetros ({guardados or 'sin registrar'}) "
+                         f"que los actuales ({PARAMETROS}); sus huellas no son comparables. "
+                         f"Bórrelo y vuelva a indexar las entregas.")
+
+def eliminar_entrega(conexion, nombre, cohorte=''):
+    fila = conexion.execute("SELECT id FROM entregas WHERE cohorte = ? AND nombre = ?", (cohorte, nombre)).fetchone()
+    if fila is None:
+        return
+    conexion.execute("""
+        UPDATE frecuencias SET entregas = entregas - 1
+        WHERE huella IN (SELECT huella FROM huellas WHERE entrega = ?)
+    """, (fila[0],))
+    conexion.execute("DELETE FROM frecuencias WHERE entregas <= 0")
+    conexion.execute("DELETE FROM entregas WHERE id = ?", (fila[0],))
+
+def agregar_entrega(conexion, nombre, ruta_src, cohorte='', huellas=None):
+    """
+    Indexa (o reindexa) la entrega. Una entrega es el par (cohorte, nombre): una entrega de
+    otra cohorte con el mismo nombre de carpeta no se reemplaza.
+    """
+    cohorte = cohorte or ''
+    if huellas is None:
+        huellas = huellas_de_entrega(ruta_src)
+    with conexion:
+        eliminar_entrega(conexion, nombre, cohorte)
+        cursor = conexion.execute(
+            "INSERT INTO entregas (nombre, cohorte, total_huellas, fecha) VALUES (?, ?, ?, ?)",
+            (nombre, cohorte, len(huellas), datetime.now().isoformat(timespec='seconds')))
+        entrega_id = cursor.lastrowid
+        conexion.executemany(
+            "INSERT INTO huellas (huella, entrega, archivo, linea) VALUES (?, ?, ?, ?)",
+            ((huella, entrega_id, archivo, linea) for huella, (archivo, linea) in huellas.items()))
+        conexion.executemany("""
+            INSERT INTO frecuencias (huella, entregas) VALUES (?, 1)
+            ON CONFLICT(huella) DO UPDATE SET entregas = entregas + 1
+        """, ((huella,) for huella in huellas))
+    return entrega_id
+
+def consultar(conexion, huellas, excluir=None, limite=10, frecuencia_maxima=FRECUENCIA_MAXIMA):
+    """
+    Busca las entregas indexadas que comparten huellas con las dadas, salvo 'excluir' (un par
+    (cohorte, nombre): la propia entrega, si ya está indexada). Solo se recorren las listas
+    de las huellas propias (filtrando las demasiado comunes), así que el costo depende del tamaño
+    de la entrega consultada y no del tamaño del índice.
+    """
+    if not huellas:
+        return []
+    # Sin entrega a excluir, (NULL, NULL) no coincide con ninguna (la cohorte nunca es NULL)
+    excluir = ((excluir[0] or ''), excluir[1]) if excluir else (None, None)
+    conexion.execute("CREATE TEMP TABLE IF NOT EXISTS consulta (huella INTEGER PRIMARY KEY)")
+    conexion.execute("DELETE FROM consulta")
+    conexion.executemany("INSERT OR IGNORE INTO consulta (huella) VALUES (?)", ((h,) for h in huellas))
+    filas = conexion.execute("""
+        SELECT e.nombre, e.cohorte, e.total_huellas, COUNT(*)
+        FROM consulta c
+        JOIN frecuencias f ON f.huella = c.huella AND f.entregas <= ?
+        JOIN huellas h ON h.huella = c.huella
+        JOIN entregas e ON e.id = h.entrega
+        WHERE NOT (e.cohorte IS ? AND e.nombre IS ?)
+        GROUP BY e.id
+    """, (frecuencia_maxima, *excluir)).fetchall()
+
+    resultados = []
+    for nombre, cohorte, total_huellas, compartidas in filas:
+        resultados.append({
+            'entrega': nombre,
+            'cohorte': cohorte,
+            'huellas_compartidas': compartidas,
+            # Fracción de la entrega consultada presente en la otra, y viceversa
+            'similitud': compartidas / len(huellas),
+            'similitud_inversa': compartidas / total_huellas if total_huellas else 0.0
+        })
+    resultados.sort(key=lambda r: max(r['similitud'], r['similitud_inversa']), reverse=True)
+    return resultados[:limite]
+
+def generar_reporte(consultas, ruta_indice):
+    yield "# 🕵️ Reporte de Similitud contra el Índice de Entregas\n\n"
+    yield f"📅 Fecha de análisis: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n"
+    yield f"🗂️ Índice: {ruta_indice}\n\n"
+    for nombre, total_huellas, resultados in consultas:
+        yield f"## 📄 Entrega: {nombre}\n\n"
+        yield f"- Huellas de la entrega: **{total_huellas}**\n\n"
+        if not resultados:
+            yield "✅ No se encontraron coincidencias con otras entregas.\n\n"
+            continue
+        yield "| Entrega similar | Cohorte | Huellas compartidas | % de esta entrega | % de la otra |\n"
+        yield "|:----------------|:--------|--------------------:|------------------:|-------------:|\n"
+        for r in resultados:
+            yield (f"| {r['entrega']} | {r['cohorte'] or '-'} | {r['huellas_compartidas']} "
+                   f"| {r['similitud']:.1%} | {r['similitud_inversa']:.1%} |\n")
+        yield "\n"
+
+def guardar_reporte(contenido, ruta_salida):
+    ruta_reporte = os.path.join(ruta_salida, f"REPORTE_SIMILITUD_INDICE_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md")
+    escribir_markdown(ruta_reporte, contenido)
+    print(f"Reporte generado: {ruta_reporte}")
+    return ruta_reporte
+
+def ejecutar_analisis(ruta_proyecto, ruta_salida, ruta_indice=RUTA_INDICE):
+    # Compara la entrega contra el índice histórico; sin índice no hay nada con qué comparar
+    if not os.path.exists(ruta_indice):
+        print(f"No existe el índice de plagio {ruta_indice}; se omite la comparación entre entregas.")
+        return None
+    try:
+        conexion = abrir_indice(ruta_indice)
+    except ValueError as e:
+        print(f"⚠️ {e}")
+        return None
+    try:
+        huellas = huellas_de_entrega(os.path.join(ruta_proyecto, 'src'))
+        nombre = nombre_entrega(ruta_proyecto)
+        resultados = consultar(conexion, huellas, excluir=(COHORTE, nombre))
+    finally:
+        conexion.close()
+    registro = registrar_consulta(ruta_salida, nombre, len(huellas), resultados)
+    return guardar_reporte(generar_reporte([registro], ruta_indice), ruta_salida)
+
+def registrar_consulta(ruta_salida, nombre, total_huellas, resultados):
+    datos = escribir_registro(ruta_salida, 'similitud', nombre,
+                              {'total_huellas': total_huellas, 'coincidencias': resultados})
+    return nombre, datos['total_huellas'], datos['coincidencias']
+
+def buscar_entregas(ruta_lote):
+    entregas = []
+    for nombre in sorted(os.listdir(ruta_lote)):
+        ruta_src = os.path.join(ruta_lote, nombre, 'src')
+        if os.path.isdir(ruta_src):
+            entregas.append((nombre, ruta_src))
+    return entregas
+
+def main():
+    parser = argparse.ArgumentParser(description="Índice persistente de huellas (winnowing) para detectar plagio entre entregas.")
+    parser.add_argument('--indice', default=RUTA_INDICE, help="Archivo SQLite del índice.")
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+
+    agregar = subparsers.add_parser('agregar', help="Indexa todas las entregas de un lote (una carpeta con 'src/' por entrega).")
+    agregar.add_argument('lote')
+    agregar.add_argument('--cohorte', default='', help="Etiqueta de cohorte (por ejemplo, 2024-2).")
+
+    consultar_parser = subparsers.add_parser('consultar', help="Compara las entregas de un lote contra el índice y genera un reporte.")
+    consultar_parser.add_argument('lote')
+    consultar_parser.add_argument('--indexar', action='store_true',
+                                  help="Agrega también las entregas consultadas al índice.")
+    consultar_parser.add_argument('--cohorte', default='', help="Cohorte del lote consultado (y con la que se indexa).")
+    consultar_parser.add_argument('--limite', type=int, default=10)
+    consultar_parser.add_argument('--salida', default=os.path.join(PROJECT_ROOT, 'output'))
+    args = parser.parse_args()
+
+    entregas = buscar_entregas(args.lote)
+    if not entregas:
+        print(f"No se encontraron entregas con carpeta 'src/' en {args.lote}")
+        sys.exit(1)
+
+    try:
+        conexion = abrir_indice(args.indice)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    try:
+        if args.comando == 'agregar':
+            for nombre, ruta_src in entregas:
+                agregar_entrega(conexion, nombre, ruta_src, args.cohorte)
+                print(f"✅ Entrega indexada: {nombre}")
+            return
+
+        huellas_por_entrega = {nombre: huellas_de_entrega(ruta_src) for nombre, ruta_src in entregas}
+        if args.indexar:
+            for nombre, ruta_src in entregas:
+                agregar_entrega(conexion, nombre, ruta_src, args.cohorte, huellas_por_entrega[nombre])
+        consultas = []
+        for nombre, _ in entregas:
+            huellas = huellas_por_entrega[nombre]
+            resultados = consultar(conexion, huellas, excluir=(args.cohorte, nombre), limite=args.limite)
+            consultas.append(registrar_consulta(args.salida, nombre, len(huellas), resultados))
+        guardar_reporte(generar_reporte(consultas, args.indice), args.salida)
+    finally:
+        conexion.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+import os
+import sys
+import json
+import time
+import atexit
+import cProfile
+import inspect
+import platform
+import threading
+import contextvars
+from datetime import datetime
+from functools import wraps
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows: sin getrusage no hay tiempos de subprocesos ni memoria máxima
+    resource = None
+
+# Archivo JSON Lines donde se escribe la traza al terminar (--traza de run_analyzers, o la
+# variable de entorno). Sin él, las etapas no miden nada y su costo es despreciable.
+RUTA_TRAZA = os.environ.get('ANALISIS_TRAZA') or None
+# Contadores que se suman en el resumen por etapa
+CONTADORES = ('archivos', 'bytes', 'caracteres', 'tokens', 'textos', 'hallazgos', 'aciertos_cache')
+
+_etapas = []
+_candado = threading.Lock()
+# contextvars y no threading.local: también distingue las corrutinas de un mismo bucle de eventos
+_etapa_actual = contextvars.ContextVar('etapa_actual', default=None)
+_inicio = time.perf_counter()
+_fecha_inicio = datetime.now()
+_escritura_registrada = False
+
+def activar_traza(ruta):
+    global RUTA_TRAZA, _escritura_registrada
+    RUTA_TRAZA = ruta
+    if ruta and not _escritura_registrada:
+        atexit.register(escribir_traza)
+        _escritura_registrada = True
+
+def traza_activa():
+    return RUTA_TRAZA is not None
+
+def uso_recursos():
+    # (CPU de los subprocesos ya terminados, RSS máximo del proceso en KB, RSS máximo de un subproceso en KB)
+    if resource is None:
+        return 0.0, None, None
+    propio = resource.getrusage(resource.RUSAGE_SELF)
+    hijos = resource.getrusage(resource.RUSAGE_CHILDREN)
+    escala = 1024 if sys.platform == 'darwin' else 1  # macOS informa ru_maxrss en bytes
+    return hijos.ru_utime + hijos.ru_stime, propio.ru_maxrss // escala, hijos.ru_maxrss // escala
+
+@contextmanager
+def etapa(nombre, **contadores):
+    """
+    Mide un tramo del análisis: tiempo de reloj, CPU del hilo, CPU de los subprocesos que
+    terminaron durante el tramo y RSS máximo. Los contadores se pueden pasar al abrir la etapa
+    o sumar dentro del bloque con contar():
+
+        with etapa('cpplint', archivos=len(rutas)):
+            contar(bytes=...)
+
+    La CPU del hilo y la de subprocesos (RUSAGE_CHILDREN) se solapan entre etapas que corren a la
+    vez (analizadores en paralelo, casos de prueba concurrentes); con --secuencial son exactas.
+    """
+    medida = dict(contadores)
+    if RUTA_TRAZA is None:
+        yield medida
+        return
+    padre = _etapa_actual.get()
+    marca = _etapa_actual.set((nombre, medida))
+    subprocesos, _, _ = uso_recursos()
+    inicio = time.perf_counter()
+    cpu = time.thread_time()
+    try:
+        yield medida
+    finally:
+        segundos = time.perf_counter() - inicio
+        cpu = time.thread_time() - cpu
+        subprocesos_fin, rss, rss_subprocesos = uso_recursos()
+        _etapa_actual.reset(marca)
+        registro = {
+            'tipo': 'etapa',
+            'etapa': nombre,
+            'padre': padre[0] if padre else None,
+            'hilo': threading.current_thread().name,
+            'inicio': round(inicio - _inicio, 6),
+            'segundos': round(segundos, 6),
+            'cpu_segundos': round(cpu, 6),
+            'subprocesos_segundos': round(subprocesos_fin - subprocesos, 6),
+            'rss_pico_kb': rss,
+            'rss_pico_subprocesos_kb': rss_subprocesos,
+            **medida
+        }
+        with _candado:
+            _etapas.append(registro)
+
+def contar(**contadores):
+    """Suma contadores a la etapa abierta más interna (no hace nada sin traza o fuera de una etapa)."""
+    actual = _etapa_actual.get()
+    if actual is None:
+        return
+    medida = actual[1]
+    for clave, valor in contadores.items():
+        medida[clave] = medida.get(clave, 0) + valor
+
+def medido(nombre=None):
+    """Decorador: cada llamada a la función es una etapa; dentro de ella se puede usar contar()."""
+    def decorador(funcion):
+        nombre_etapa = nombre or funcion.__name__
+
+        if inspect.iscoroutinefunction(funcion):
+            @wraps(funcion)
+            async def envoltura_asincrona(*args, **kwargs):
+                with etapa(nombre_etapa):
+                    return await funcion(*args, **kwargs)
+            return envoltura_asincrona
+
+        @wraps(funcion)
+        def envoltura(*args, **kwargs):
+            with etapa(nombre_etapa):
+                return funcion(*args, **kwargs)
+        return envoltura
+    return decorador
+
+def resumen_traza():
+    """Totales por etapa: llamadas, tiempos, memoria máxima y la suma de cada contador."""
+    with _candado:
+        etapas = list(_etapas)
+    resumen = {}
+    for registro in etapas:
+        total = resumen.setdefault(registro['etapa'], {
+            'llamadas': 0, 'segundos': 0.0, 'cpu_segundos': 0.0, 'subprocesos_segundos': 0.0, 'rss_pico_kb': None
+        })
+        total['llamadas'] += 1
+        for clave in ('segundos', 'cpu_segundos', 'subprocesos_segundos'):
+            total[clave] += registro[clave]
+        if registro['rss_pico_kb'] is not None:
+            total['rss_pico_kb'] = max(total['rss_pico_kb'] or 0, registro['rss_pico_kb'])
+        for contador in CONTADORES:
+            if contador in registro:
+                total[contador] = total.get(contador, 0) + registro[contador]
+    return resumen
+
+def escribir_traza(ruta=None):
+    """Escribe la traza (JSON Lines): una línea con los datos de la máquina, una por etapa y el resumen."""
+    ruta = ruta or RUTA_TRAZA
+    if not ruta:
+        return None
+    with _candado:
+        etapas = list(_etapas)
+    _, rss, rss_subprocesos = uso_recursos()
+    cabecera = {
+        'tipo': 'ejecucion',
+        'fecha': _fecha_inicio.isoformat(timespec='seconds'),
+        'comando': sys.argv,
+        'pid': os.getpid(),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'cpus': os.cpu_count(),
+        'segundos': round(time.perf_counter() - _inicio, 6),
+        'cpu_segundos': round(time.process_time(), 6),
+        'rss_pico_kb': rss,
+        'rss_pico_subprocesos_kb': rss_subprocesos
+    }
+    directorio = os.path.dirname(ruta)
+    if directorio:
+        os.makedirs(directorio, exist_ok=True)
+    with open(ruta, 'w', encoding='utf-8') as f:
+        for registro in [cabecera, *etapas, {'tipo': 'resumen', 'etapas': resumen_traza()}]:
+            f.write(json.dumps(registro, ensure_ascii=False, separators=(',', ':')) + '\n')
+    return ruta
+
+def imprimir_resumen_traza():
+    resumen = resumen_traza()
+    if not resumen:
+        return
+    print("\n🔬 Tiempo por etapa (reloj / CPU / subprocesos, s):")
+    for nombre, total in sorted(resumen.items(), key=lambda item: item[1]['segundos'], reverse=True):
+        contadores = ", ".join(f"{contador} {total[contador]}" for contador in CONTADORES if contador in total)
+        print(f"   {nombre:<28} {total['llamadas']:>5}× {total['segundos']:8.2f} {total['cpu_segundos']:8.2f} "
+              f"{total['subprocesos_segundos']:8.2f}  {contadores}")
+
+@contextmanager
+def perfil(ruta):
+    """
+    Perfil cProfile del bloque guardado en 'ruta' (se abre con pstats o snakeviz). Perfila
+    solo el hilo actual: para varios analizadores, ejecutarlos uno tras otro.
+    """
+    if not ruta:
+        yield
+        return
+    perfilador = cProfile.Profile()
+    perfilador.enable()
+    try:
+        yield
+    finally:
+        perfilador.disable()
+        directorio = os.path.dirname(ruta)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        perfilador.dump_stats(ruta)
+
+if RUTA_TRAZA:
+    activar_traza(RUTA_TRAZA)
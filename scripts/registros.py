@@ -0,0 +1,68 @@
+import os
+import json
+import threading
+from datetime import datetime
+from collections import Counter
+
+# Un registro JSON compacto por línea: {analizador, entrega, fecha, datos}
+ARCHIVO_REGISTROS = 'resultados.jsonl'
+
+_candado = threading.Lock()
+
+def nombre_entrega(ruta_proyecto):
+    return os.path.basename(os.path.normpath(os.path.abspath(ruta_proyecto)))
+
+def a_json(valor):
+    # Conjuntos, contadores y arreglos de numpy no son serializables tal cual
+    if isinstance(valor, (set, frozenset)):
+        return sorted(valor)
+    if isinstance(valor, Counter):
+        return dict(valor)
+    if hasattr(valor, 'tolist'):
+        return valor.tolist()
+    raise TypeError(f"Tipo no serializable en un registro: {type(valor).__name__}")
+
+def ruta_registros(directorio_salida):
+    return os.path.join(directorio_salida, ARCHIVO_REGISTROS)
+
+def escribir_registro(directorio_salida, analizador, entrega, datos):
+    """
+    Agrega una línea a resultados.jsonl en el directorio de salida y devuelve los datos tal como
+    quedaron en el registro (solo tipos JSON), para generar el Markdown a partir de ellos.
+    """
+    linea = json.dumps({
+        'analizador': analizador,
+        'entrega': entrega,
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'datos': datos
+    }, ensure_ascii=False, separators=(',', ':'), default=a_json)
+    os.makedirs(directorio_salida, exist_ok=True)
+    # Los analizadores corren en hilos: cada registro se escribe entero, sin intercalarse
+    with _candado, open(ruta_registros(directorio_salida), 'a', encoding='utf-8') as f:
+        f.write(linea + '\n')
+    return json.loads(linea)['datos']
+
+def leer_registros(ruta, analizadores=None):
+    """Recorre los registros de un archivo .jsonl sin cargarlo entero, opcionalmente filtrando por analizador."""
+    with open(ruta, encoding='utf-8') as f:
+        for numero, linea in enumerate(f, 1):
+            if not linea.strip():
+                continue
+            try:
+                registro = json.loads(linea)
+            except json.JSONDecodeError:
+                print(f"⚠️ Línea {numero} de {ruta} no es un registro válido; se omite.")
+                continue
+            if analizadores is None or registro.get('analizador') in analizadores:
+                yield registro
+
+def escribir_markdown(ruta, fragmentos):
+    # Escribe el reporte a medida que se generan sus fragmentos, sin armar el texto completo en memoria
+    directorio = os.path.dirname(ruta)
+    if directorio:
+        os.makedirs(directorio, exist_ok=True)
+    if isinstance(fragmentos, str):
+        fragmentos = [fragmentos]
+    with open(ruta, 'w', encoding='utf-8') as f:
+        f.writelines(fragmentos)
+    return ruta
@@ -0,0 +1,144 @@
+import os
+import sys
+import time
+import argparse
+import importlib
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+import cambios_git
+from cambios_git import filtrar_cambiados
+from cargador_fuentes import leer_archivo, listar_archivos, EXTENSIONES_CPP
+from registros import ruta_registros
+import instrumentacion
+from instrumentacion import etapa, perfil
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+
+# Nombre del analizador -> módulo de scripts/ que expone ejecutar_analisis(ruta_proyecto, ruta_salida).
+# Los módulos se importan solo si se seleccionan, así un analizador con dependencias
+# pesadas (torch, spacy) no penaliza a los demás.
+ANALIZADORES = {
+    'estructura': 'analyze_structure',
+    'librerias': 'analyze_libraries',
+    'indentacion': 'analyze_identation',
+    'acentos': 'analyze_spelling',
+    'metricas': 'run_cppcheck',
+    'elementos': 'extract_elements',
+    'plagio': 'run_plagiarism_1',
+    'similitud': 'indice_plagio',
+    'pruebas': 'run_cpp_test',
+}
+
+def precargar_entrega(ruta_proyecto):
+    """Recorre src/ una sola vez y deja los fuentes en la caché compartida de cargador_fuentes."""
+    ruta_src = os.path.join(ruta_proyecto, 'src')
+    with etapa('precarga de la entrega'):
+        archivos = listar_archivos(ruta_src, EXTENSIONES_CPP)
+        # En modo incremental solo se leen los archivos que cambiaron; los demás salen del almacén
+        for ruta in filtrar_cambiados(archivos):
+            leer_archivo(ruta)
+    return archivos
+
+def ejecutar_analizador(nombre, ruta_proyecto, ruta_salida, directorio_perfil=None):
+    # La etapa incluye la importación del módulo: cargar torch o spaCy también cuenta
+    ruta_perfil = os.path.join(directorio_perfil, f"{nombre}.prof") if directorio_perfil else None
+    inicio = time.perf_counter()
+    with etapa(f"analizador: {nombre}"), perfil(ruta_perfil):
+        try:
+            modulo = importlib.import_module(ANALIZADORES[nombre])
+        except ImportError as e:
+            return {'analizador': nombre, 'estado': 'omitido', 'detalle': f"Dependencia no disponible: {e}",
+                    'reportes': None, 'segundos': time.perf_counter() - inicio}
+
+        try:
+            reportes = modulo.ejecutar_analisis(ruta_proyecto, ruta_salida)
+            estado, detalle = ('ok', None) if reportes else ('sin reporte', None)
+        except Exception as e:
+            traceback.print_exc()
+            reportes, estado, detalle = None, 'error', str(e)
+    return {'analizador': nombre, 'estado': estado, 'detalle': detalle,
+            'reportes': reportes, 'segundos': time.perf_counter() - inicio}
+
+def ejecutar_analizadores(nombres, ruta_proyecto, ruta_salida, paralelo=True, hilos=None, directorio_perfil=None):
+    os.makedirs(ruta_salida, exist_ok=True)
+    archivos = precargar_entrega(ruta_proyecto)
+    print(f"📂 Entrega cargada: {len(archivos)} archivos fuente en {os.path.join(ruta_proyecto, 'src')}")
+    if cambios_git.REVISION_BASE:
+        print(f"🔀 Modo incremental: {len(filtrar_cambiados(archivos))} archivos cambiados desde {cambios_git.REVISION_BASE}")
+
+    # cProfile perfila un hilo a la vez: con --perfil los analizadores corren uno tras otro
+    if not paralelo or len(nombres) == 1 or directorio_perfil:
+        return [ejecutar_analizador(nombre, ruta_proyecto, ruta_salida, directorio_perfil) for nombre in nombres]
+
+    # Los analizadores son independientes entre sí: pasan la mayor parte del tiempo
+    # esperando a subprocesos (cpplint, cppcheck, g++) o en código nativo (torch)
+    with ThreadPoolExecutor(max_workers=hilos or len(nombres)) as executor:
+        futuros = [executor.submit(ejecutar_analizador, nombre, ruta_proyecto, ruta_salida) for nombre in nombres]
+        return [futuro.result() for futuro in futuros]
+
+def imprimir_resumen(resultados, segundos_totales):
+    iconos = {'ok': "✅", 'sin reporte': "⚠️", 'omitido': "⏭️", 'error': "❌"}
+    print("\n📊 Resumen de la ejecución:")
+    for resultado in resultados:
+        icono = iconos.get(resultado['estado'], "❔")
+        print(f"   {icono} {resultado['analizador']:<12} {resultado['segundos']:7.2f} s  {resultado['estado']}")
+        if resultado['detalle']:
+            print(f"      {resultado['detalle']}")
+        reportes = resultado['reportes']
+        if isinstance(reportes, str):
+            reportes = [reportes]
+        for reporte in reportes or []:
+            print(f"      📄 {reporte}")
+    print(f"\n⏱️ Tiempo total: {segundos_totales:.2f} s")
+
+def main():
+    parser = argparse.ArgumentParser(description="Ejecuta en un solo proceso los analizadores seleccionados sobre una entrega.")
+    parser.add_argument('--proyecto', default=PROJECT_ROOT,
+                        help="Raíz de la entrega (con su carpeta 'src/'). Por defecto, la raíz del repositorio.")
+    parser.add_argument('--salida', default=None,
+                        help="Directorio donde se escriben los reportes (por defecto, <proyecto>/output).")
+    parser.add_argument('--analizadores', nargs='+', choices=list(ANALIZADORES), default=list(ANALIZADORES),
+                        metavar='NOMBRE',
+                        help=f"Analizadores a ejecutar (por defecto, todos): {', '.join(ANALIZADORES)}.")
+    parser.add_argument('--secuencial', action='store_true',
+                        help="Ejecuta los analizadores uno tras otro en lugar de en paralelo.")
+    parser.add_argument('--hilos', type=int, default=None,
+                        help="Número máximo de analizadores ejecutándose a la vez.")
+    parser.add_argument('--since', metavar='REV', default=None,
+                        help="Solo vuelve a analizar los fuentes C++ que cambiaron desde la revisión REV de git; "
+                             "los resultados del resto se toman del almacén (si quedó en esa revisión).")
+    parser.add_argument('--traza', nargs='?', const='', default=None, metavar='RUTA',
+                        help="Mide cada etapa (tiempo de reloj, CPU, subprocesos, memoria, archivos, bytes, tokens) "
+                             "y escribe la traza JSON Lines en RUTA (por defecto, <salida>/traza.jsonl).")
+    parser.add_argument('--perfil', metavar='DIRECTORIO', default=None,
+                        help="Guarda un perfil cProfile por analizador (<analizador>.prof) en DIRECTORIO; "
+                             "los analizadores se ejecutan uno tras otro.")
+    args = parser.parse_args()
+    if args.since:
+        cambios_git.establecer_revision_base(args.since)
+
+    ruta_proyecto = os.path.abspath(args.proyecto)
+    ruta_salida = os.path.abspath(args.salida or os.path.join(ruta_proyecto, 'output'))
+    if args.traza is not None:
+        instrumentacion.activar_traza(os.path.abspath(args.traza or os.path.join(ruta_salida, 'traza.jsonl')))
+
+    inicio = time.perf_counter()
+    resultados = ejecutar_analizadores(args.analizadores, ruta_proyecto, ruta_salida,
+                                       paralelo=not args.secuencial, hilos=args.hilos,
+                                       directorio_perfil=args.perfil and os.path.abspath(args.perfil))
+    imprimir_resumen(resultados, time.perf_counter() - inicio)
+    if instrumentacion.traza_activa():
+        instrumentacion.imprimir_resumen_traza()
+        print(f"🔬 Traza de la ejecución: {instrumentacion.escribir_traza()}")
+    if args.perfil:
+        print(f"🧪 Perfiles cProfile en: {os.path.abspath(args.perfil)}")
+    if os.path.exists(ruta_registros(ruta_salida)):
+        print(f"🧾 Registros estructurados: {ruta_registros(ruta_salida)}")
+
+    if any(resultado['estado'] == 'error' for resultado in resultados):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -2,28 +2,45 @@ import os
 import json
 import subprocess
 import sys
+import argparse
+import asyncio
+import codecs
+import hashlib
+import shutil
+import signal
 from datetime import datetime
-import glob
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from functools import lru_cache
+import re
 
-def leer_archivo(ruta_archivo):
-    encodings = ['utf-8', 'latin-1', 'ISO-8859-1']
-    for encoding in encodings:
-        try:
-            with open(ruta_archivo, 'r', encoding=encoding) as file:
-                return file.read()
-        except UnicodeDecodeError:
-            continue
-    print(f"Error: No se pudo leer el archivo {ruta_archivo} con ninguna codificación conocida.")
-    return None
+from cargador_fuentes import buscar_carpeta_proyecto, leer_archivo, listar_archivos, EXTENSIONES_CPP
+from registros import escribir_markdown, escribir_registro
+from instrumentacion import activar_traza, contar, etapa, medido
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Caché persistente de ejecutables compilados (se puede mover con variables de entorno)
+COMPILE_CACHE_DIR = os.environ.get('CPP_TEST_CACHE_DIR', os.path.join(PROJECT_ROOT, '.cache', 'compilacion'))
+COMPILE_CACHE_MAX_BYTES = int(os.environ.get('CPP_TEST_CACHE_MAX_MB', '512')) * 1024 * 1024
+OBJECT_CACHE_DIR = os.path.join(COMPILE_CACHE_DIR, 'objetos')
+LOCAL_INCLUDE_PATTERN = re.compile(r'^\s*#\s*include\s*"([^"]+)"', re.MULTILINE)
 
-def buscar_carpeta_proyecto_visual_studio(ruta_src):
-    for carpeta in os.listdir(ruta_src):
-        ruta_carpeta = os.path.join(ruta_src, carpeta)
-        if os.path.isdir(ruta_carpeta):
-            for archivo in os.listdir(ruta_carpeta):
-                if archivo.endswith(('.cpp', '.h')):
-                    return ruta_carpeta
-    return ruta_src
+# Límites por defecto de cada ejecución del programa del estudiante (None desactiva el límite)
+DEFAULT_LIMITS = {
+    'tiempo_real': 10,      # segundos de reloj
+    'tiempo_cpu': 5,        # segundos de CPU (RLIMIT_CPU)
+    'memoria_mb': 512,      # espacio de direcciones (RLIMIT_AS)
+    'salida_kb': 1024       # tamaño máximo de stdout y de stderr (cada uno)
+}
+# Programas del estudiante en ejecución simultánea dentro del motor asíncrono
+DEFAULT_MAX_CONCURRENT_RUNS = 4 * (os.cpu_count() or 1)
+# Segundos sin salida tras los cuales el modo interactivo asume que el programa espera entrada
+INTERACTIVE_IDLE_SECONDS = 0.1
+STATUS_LABELS = {
+    'TLE': ("⏱️", "Tiempo límite excedido (TLE)"),
+    'MLE': ("💾", "Límite de memoria excedido (MLE)"),
+    'OLE': ("📜", "Límite de salida excedido (OLE)"),
+    'RE': ("💥", "Error en tiempo de ejecución (RE)")
+}
 
 def load_json(file_path):
     content = leer_archivo(file_path)
@@ -31,25 +48,71 @@ def load_json(file_path):
         raise ValueError(f"No se pudo leer el archivo JSON: {file_path}")
     return json.loads(content)
 
-def run_cpp_program(program_path, inputs):
-    process = subprocess.Popen(
-        [program_path],
-        stdin=subprocess.PIPE,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True,
-        creationflags=subprocess.CREATE_NO_WINDOW if sys.platform == "win32" else 0
-    )
-    
-    output = ""
-    for input_step in inputs:
-        process.stdin.write(input_step['input'] + '\n')
-        process.stdin.flush()
-        
-    stdout, stderr = process.communicate()
-    return stdout, stderr
+# Proceso intermedio que fija los límites y luego hace exec del programa, cuando no está prlimit
+RLIMIT_SHIM = (
+    "import os, resource, sys\n"
+    "for item in sys.argv[1].split(','):\n"
+    "    name, soft, hard = item.split(':')\n"
+    "    limit = getattr(resource, name)\n"
+    "    current = resource.getrlimit(limit)[1]\n"
+    "    soft, hard = int(soft), int(hard)\n"
+    "    if current != resource.RLIM_INFINITY:\n"
+    "        soft, hard = min(soft, current), min(hard, current)\n"
+    "    resource.setrlimit(limit, (soft, hard))\n"
+    "os.execv(sys.argv[2], sys.argv[2:])\n"
+)
+
+def resource_limits(limits):
+    # (recurso, límite blando, límite duro) para cada límite activo
+    rlimits = []
+    if limits.get('tiempo_cpu'):
+        cpu_seconds = int(limits['tiempo_cpu'])
+        rlimits.append(('CPU', cpu_seconds, cpu_seconds + 1))
+    if limits.get('memoria_mb'):
+        memory_bytes = int(limits['memoria_mb']) * 1024 * 1024
+        rlimits.append(('AS', memory_bytes, memory_bytes))
+    if limits.get('salida_kb'):
+        output_bytes = int(limits['salida_kb']) * 1024
+        rlimits.append(('FSIZE', output_bytes, output_bytes))
+    return rlimits
 
-def compare_output(actual_output, expected_steps):
+@lru_cache(maxsize=None)
+def find_prlimit():
+    return shutil.which('prlimit')
+
+def limited_command(program_path, limits):
+    """
+    Comando que ejecuta el programa con los límites de recursos (solo en sistemas POSIX). Los
+    límites los fija un proceso intermedio antes de hacer exec (prlimit de util-linux o, si no
+    está, un intérprete de Python mínimo) y no un preexec_fn: este proceso tiene otros hilos
+    (el observador de hijos de asyncio, los pools de hilos), y Python no garantiza que
+    preexec_fn funcione entre fork y exec en ese caso.
+    """
+    rlimits = resource_limits(limits)
+    if sys.platform == "win32" or not rlimits:
+        return [program_path]
+    program_path = os.path.abspath(program_path)
+    if find_prlimit():
+        return [find_prlimit()] + [f"--{name.lower()}={soft}:{hard}" for name, soft, hard in rlimits] + ['--', program_path]
+    return [sys.executable, '-I', '-S', '-c', RLIMIT_SHIM,
+            ','.join(f"RLIMIT_{name}:{soft}:{hard}" for name, soft, hard in rlimits), program_path]
+
+def classify_exit(returncode, stderr, limits, elapsed=None):
+    if returncode is None or returncode >= 0:
+        return 'OK'
+    if hasattr(signal, 'SIGXCPU') and returncode == -signal.SIGXCPU:
+        return 'TLE'
+    # Límite duro de CPU: solo si el programa pudo llegar a consumir ese tiempo de CPU (un SIGKILL
+    # temprano viene de otro lado, como el OOM killer). Las salidas excedidas ya se marcan como OLE.
+    if limits.get('tiempo_cpu') and returncode == -signal.SIGKILL and (elapsed is None or elapsed >= limits['tiempo_cpu']):
+        return 'TLE'
+    if hasattr(signal, 'SIGXFSZ') and returncode == -signal.SIGXFSZ:
+        return 'OLE'
+    if limits.get('memoria_mb') and ('bad_alloc' in stderr or 'Cannot allocate memory' in stderr):
+        return 'MLE'
+    return 'RE'
+
+def compare_output(actual_output, expected_steps, status='OK'):
     actual_lines = [line.strip() for line in actual_output.strip().split('\n') if line.strip()]
     expected_lines = [step['output'].strip() for step in expected_steps]
     results = []
@@ -58,7 +121,11 @@ def compare_output(actual_output, expected_steps):
     
     for i, expected in enumerate(expected_lines):
         if i >= len(actual_lines):
-            results.append(f"❌ Paso {i+1}: Falta salida esperada\n   Esperado: {expected}")
+            if status in STATUS_LABELS:
+                emoji, label = STATUS_LABELS[status]
+                results.append(f"{emoji} Paso {i+1}: {label}\n   Esperado: {expected}")
+            else:
+                results.append(f"❌ Paso {i+1}: Falta salida esperada\n   Esperado: {expected}")
         elif expected not in actual_lines[i]:
             results.append(f"❌ Paso {i+1}: Discrepancia detectada\n   Esperado: {expected}\n   Obtenido: {actual_lines[i]}")
         else:
@@ -68,90 +135,803 @@ def compare_output(actual_output, expected_steps):
     success_rate = (passed / total) * 100 if total > 0 else 0
     return results, passed, total, success_rate
 
-def generate_markdown_report(results, passed, total, success_rate, output_dir):
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    report_file = os.path.join(output_dir, f"reporte_pruebas_{timestamp}.md")
+async def drain_stream(stream, chunks, max_bytes, on_exceeded=None):
+    # Lee hasta EOF; conserva como máximo max_bytes y avisa una sola vez si se superan
+    total = 0
+    while True:
+        data = await stream.read(65536)
+        if not data:
+            break
+        if total < max_bytes:
+            chunks.append(data[:max_bytes - total])
+        total += len(data)
+        if on_exceeded is not None and total > max_bytes:
+            on_exceeded()
+            on_exceeded = None
+
+def kill_async_process(process):
+    # Process.kill() llama a Popen.poll(), que puede recolectar al hijo antes que el observador
+    # de asyncio y dejar un código de salida falso (255); se envía la señal directamente.
+    try:
+        if sys.platform == "win32":
+            process.kill()
+        else:
+            os.kill(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+@medido('programa: ejecución interactiva')
+async def drive_interactive(program_path, inputs, expected_steps, limits, idle_seconds):
+    expected_lines = [step['output'].strip() for step in expected_steps]
+    pending_inputs = [step['input'] for step in inputs]
+    max_output = limits['salida_kb'] * 1024 if limits.get('salida_kb') else None
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + limits['tiempo_real'] if limits.get('tiempo_real') else None
     
-    with open(report_file, 'w', encoding='utf-8') as f:
-        f.write("# 📊 Reporte de Pruebas del Programa C++\n\n")
-        f.write(f"📅 Fecha y hora de ejecución: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
-        
-        f.write("## 📈 Estadísticas\n\n")
-        f.write(f"- Total de pruebas: {total}\n")
-        f.write(f"- Pruebas exitosas: {passed}\n")
-        f.write(f"- Tasa de éxito: {success_rate:.2f}%\n\n")
-        
-        f.write("## 🔍 Resultados Detallados\n\n")
-        for result in results:
-            f.write(f"{result}\n\n")
-        
-        if success_rate == 100:
-            f.write("## 🎉 ¡Felicidades!\n\n")
-            f.write("Todas las pruebas han pasado exitosamente.\n")
+    started = loop.time()
+    process = await asyncio.create_subprocess_exec(
+        *limited_command(program_path, limits),
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    stderr_chunks = []
+    stderr_exceeded = []
+    
+    def on_stderr_exceeded():
+        stderr_exceeded.append(True)
+        kill_async_process(process)
+    
+    # Sin límite de salida se conservan los primeros 64 KB de stderr, pero no se corta la ejecución
+    stderr_task = asyncio.ensure_future(drain_stream(process.stderr, stderr_chunks, max_output or 65536,
+                                                     on_stderr_exceeded if max_output is not None else None))
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    
+    results = []
+    passed = 0
+    step = 0
+    sent = 0
+    buffer = ''
+    output_bytes = 0
+    waiting_for_input = False  # El último paso consumió un prompt sin salto de línea
+    lenient_line = False       # La línea actual ya produjo una coincidencia; su resto no es discrepancia
+    stdout_closed = False
+    aborted = False
+    forced_status = None
+    
+    def last_input():
+        return f"\n   Última entrada enviada: {pending_inputs[sent - 1]}" if sent else ""
+    
+    async def send_next_input():
+        nonlocal sent, lenient_line
+        # Lo que llegue después de una entrada es salida nueva, no el resto de la línea anterior
+        lenient_line = False
+        try:
+            if sent < len(pending_inputs):
+                process.stdin.write((pending_inputs[sent] + '\n').encode('utf-8'))
+                sent += 1
+                await process.stdin.drain()
+                if sent == len(pending_inputs):
+                    process.stdin.close()
+            elif not process.stdin.is_closing():
+                process.stdin.close()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+    
+    try:
+        while step < len(expected_lines):
+            expected = expected_lines[step]
+            position = buffer.find(expected)
+            newline = buffer.find('\n')
+            if position != -1 and (newline == -1 or position < newline or not buffer[:newline].strip()):
+                buffer = buffer[position + len(expected):]
+                results.append(f"✅ Paso {step+1}: Prueba exitosa")
+                passed += 1
+                step += 1
+                lenient_line = True
+                waiting_for_input = buffer.strip() == '' and '\n' not in buffer
+                continue
+            
+            if newline != -1:
+                line = buffer[:newline].strip()
+                buffer = buffer[newline + 1:]
+                if line and not lenient_line:
+                    # Discrepancia definitiva: se aborta sin esperar al resto de la ejecución
+                    results.append(f"❌ Paso {step+1}: Discrepancia detectada\n   Esperado: {expected}\n   Obtenido: {line}{last_input()}")
+                    aborted = True
+                    break
+                lenient_line = False
+                continue
+            
+            if stdout_closed:
+                break
+            
+            if waiting_for_input and sent < len(pending_inputs):
+                waiting_for_input = False
+                await send_next_input()
+            
+            timeout = idle_seconds
+            if deadline is not None:
+                timeout = min(timeout, max(deadline - loop.time(), 0))
+            try:
+                data = await asyncio.wait_for(process.stdout.read(65536), timeout)
+            except asyncio.TimeoutError:
+                if deadline is not None and loop.time() >= deadline:
+                    forced_status = 'TLE'
+                    break
+                # Sin salida nueva: el programa probablemente espera la siguiente entrada
+                await send_next_input()
+                continue
+            
+            if not data:
+                stdout_closed = True
+                buffer += decoder.decode(b'', final=True)
+                if buffer and not buffer.endswith('\n'):
+                    buffer += '\n'
+                continue
+            output_bytes += len(data)
+            if max_output is not None and output_bytes > max_output:
+                forced_status = 'OLE'
+                break
+            buffer += decoder.decode(data)
+    finally:
+        if process.returncode is None:
+            if aborted or forced_status or step < len(expected_lines):
+                kill_async_process(process)
+            else:
+                await send_next_input()
+        # Se descarta el resto de stdout para que el proceso (y sus tuberías) pueda terminar
+        stdout_task = asyncio.ensure_future(drain_stream(process.stdout, [], 0))
+        try:
+            remaining = max(deadline - loop.time(), 0.1) if deadline is not None else None
+            await asyncio.wait_for(process.wait(), remaining)
+        except asyncio.TimeoutError:
+            forced_status = forced_status or 'TLE'
+            kill_async_process(process)
+            await process.wait()
+        await stdout_task
+        await stderr_task
+    
+    stderr = b''.join(stderr_chunks).decode('utf-8', errors='replace')
+    if stderr_exceeded:
+        forced_status = 'OLE'
+    status = forced_status or ('OK' if aborted else classify_exit(process.returncode, stderr, limits, loop.time() - started))
+    
+    for i in range(len(results), len(expected_lines)):
+        if aborted:
+            results.append(f"⏭️ Paso {i+1}: No evaluado (se detuvo en la primera discrepancia)\n   Esperado: {expected_lines[i]}")
+        elif status in STATUS_LABELS:
+            emoji, label = STATUS_LABELS[status]
+            results.append(f"{emoji} Paso {i+1}: {label}\n   Esperado: {expected_lines[i]}{last_input()}")
         else:
-            f.write("## 💡 Recomendaciones\n\n")
-            f.write("1. Revisa las discrepancias reportadas y corrige el código según sea necesario.\n")
-            f.write("2. Asegúrate de que todas las salidas esperadas estén correctamente definidas.\n")
-            f.write("3. Ejecuta las pruebas nuevamente después de realizar los cambios.\n")
+            results.append(f"❌ Paso {i+1}: Falta salida esperada\n   Esperado: {expected_lines[i]}{last_input()}")
+    
+    total = len(expected_lines)
+    success_rate = (passed / total) * 100 if total > 0 else 0
+    return results, passed, total, success_rate, status
+
+async def feed_inputs(stream, inputs):
+    try:
+        for input_step in inputs:
+            stream.write((input_step['input'] + '\n').encode('utf-8'))
+            await stream.drain()
+    except (BrokenPipeError, ConnectionResetError):
+        pass  # El programa terminó antes de leer toda la entrada
+    finally:
+        stream.close()
+
+@medido('programa: ejecución')
+async def run_cpp_program_async(program_path, inputs, limits=None):
+    """
+    Ejecuta el programa con todas las entradas de una vez (asyncio.create_subprocess_exec) y
+    devuelve la tupla (stdout, stderr, estado) que consume compare_output.
+    """
+    limits = DEFAULT_LIMITS if limits is None else limits
+    max_output = limits['salida_kb'] * 1024 if limits.get('salida_kb') else None
+    loop = asyncio.get_running_loop()
+    
+    started = loop.time()
+    process = await asyncio.create_subprocess_exec(
+        *limited_command(program_path, limits),
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    
+    stdout_chunks, stderr_chunks = [], []
+    output_exceeded = []
+    
+    def on_output_exceeded():
+        output_exceeded.append(True)
+        kill_async_process(process)
+    
+    io_tasks = [
+        asyncio.ensure_future(feed_inputs(process.stdin, inputs)),
+        asyncio.ensure_future(drain_stream(process.stdout, stdout_chunks, max_output or float('inf'), on_output_exceeded)),
+        asyncio.ensure_future(drain_stream(process.stderr, stderr_chunks, max_output or float('inf'), on_output_exceeded))
+    ]
+    wait_task = asyncio.ensure_future(process.wait())
+    done, _ = await asyncio.wait([wait_task], timeout=limits.get('tiempo_real'))
+    timed_out = not done
+    if timed_out:
+        kill_async_process(process)
+        await wait_task
+    await asyncio.gather(*io_tasks)
+    contar(bytes=sum(len(chunk) for chunk in stdout_chunks))
     
-    print(f"Reporte generado: {report_file}")
+    stdout = b''.join(stdout_chunks).decode('utf-8', errors='replace').replace('\r\n', '\n')
+    stderr = b''.join(stderr_chunks).decode('utf-8', errors='replace').replace('\r\n', '\n')
+    
+    if output_exceeded:
+        status = 'OLE'
+    elif timed_out:
+        status = 'TLE'
+    else:
+        status = classify_exit(process.returncode, stderr, limits, loop.time() - started)
+    return stdout, stderr, status
+
+def generate_markdown_report(summary):
+    # Se genera a partir del registro de la entrega (el resumen tal como quedó en resultados.jsonl)
+    case_results = summary.get('casos', [])
+    if 'mensaje' in summary:
+        results = [summary['mensaje']]
+    else:
+        results = [result for case in case_results for result in case['resultados']]
+    passed, total, success_rate = summary['pruebas_exitosas'], summary['total_pruebas'], summary['tasa_exito']
+    # Con un solo caso el reporte conserva el formato clásico
+    grouped_by_case = len(case_results) > 1
+    
+    yield "# 📊 Reporte de Pruebas del Programa C++\n\n"
+    yield f"📅 Fecha y hora de ejecución: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n"
+    
+    yield "## 📈 Estadísticas\n\n"
+    if grouped_by_case:
+        yield f"- Casos de prueba: {len(case_results)}\n"
+        yield f"- Casos exitosos: {summary['casos_exitosos']}\n"
+    elif case_results and case_results[0]['estado'] in STATUS_LABELS:
+        yield f"- Estado de ejecución: {' '.join(STATUS_LABELS[case_results[0]['estado']])}\n"
+    yield f"- Total de pruebas: {total}\n"
+    yield f"- Pruebas exitosas: {passed}\n"
+    yield f"- Tasa de éxito: {success_rate:.2f}%\n\n"
+    
+    yield "## 🔍 Resultados Detallados\n\n"
+    if grouped_by_case:
+        for case in case_results:
+            emoji = "✅" if case['tasa_exito'] == 100 else "❌"
+            yield f"### {emoji} Caso {case['nombre']} ({case['pasos_exitosos']}/{case['total_pasos']})\n\n"
+            if case['estado'] in STATUS_LABELS:
+                yield f"Estado de ejecución: {' '.join(STATUS_LABELS[case['estado']])}\n\n"
+            for result in case['resultados']:
+                yield f"{result}\n\n"
+    else:
+        for result in results:
+            yield f"{result}\n\n"
+    
+    if success_rate == 100:
+        yield "## 🎉 ¡Felicidades!\n\n"
+        yield "Todas las pruebas han pasado exitosamente.\n"
+    else:
+        yield "## 💡 Recomendaciones\n\n"
+        yield "1. Revisa las discrepancias reportadas y corrige el código según sea necesario.\n"
+        yield "2. Asegúrate de que todas las salidas esperadas estén correctamente definidas.\n"
+        yield "3. Ejecuta las pruebas nuevamente después de realizar los cambios.\n"
+
+def natural_sort_key(name):
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r'(\d+)', name)]
+
+def find_test_suite(root_dir):
+    """
+    Busca las pruebas de un proyecto. En orden de preferencia:
+    - input/casos/ y expected_output/casos/ con pares numerados (01.json, 02.json, ...)
+    - input/casos.json con una lista 'cases' que incluye entradas y salidas esperadas
+    - el par clásico input/input.json y expected_output/expected_steps.json
+    """
+    input_dir = os.path.join(root_dir, 'input', 'casos')
+    expected_dir = os.path.join(root_dir, 'expected_output', 'casos')
+    if os.path.isdir(input_dir) and os.path.isdir(expected_dir):
+        return input_dir, expected_dir
+    
+    suite_file = os.path.join(root_dir, 'input', 'casos.json')
+    if os.path.isfile(suite_file):
+        return suite_file, None
+    
+    input_file = os.path.join(root_dir, 'input', 'input.json')
+    expected_output_file = os.path.join(root_dir, 'expected_output', 'expected_steps.json')
+    if os.path.isfile(input_file) and os.path.isfile(expected_output_file):
+        return input_file, expected_output_file
+    return None, None
+
+def load_test_cases(input_path, expected_path):
+    if os.path.isdir(input_path):
+        cases = []
+        for name in sorted((n for n in os.listdir(input_path) if n.endswith('.json')), key=natural_sort_key):
+            expected_file = os.path.join(expected_path, name)
+            if not os.path.isfile(expected_file):
+                raise ValueError(f"Falta la salida esperada del caso {name} en {expected_path}")
+            cases.append({
+                'nombre': os.path.splitext(name)[0],
+                'inputs': load_json(os.path.join(input_path, name))['steps'],
+                'expected': load_json(expected_file)['steps']
+            })
+        return cases
+    
+    if expected_path is None:
+        suite = load_json(input_path)
+        return [{
+            'nombre': case.get('name', str(i + 1)),
+            'inputs': case['steps'],
+            'expected': case['expected_steps']
+        } for i, case in enumerate(suite['cases'])]
+    
+    return [{
+        'nombre': 'principal',
+        'inputs': load_json(input_path)['steps'],
+        'expected': load_json(expected_path)['steps']
+    }]
+
+async def run_test_case_async(executable, case, limits, interactive, semaphore):
+    async with semaphore:
+        if interactive:
+            results, passed, total, success_rate, status = await drive_interactive(
+                executable, case['inputs'], case['expected'], DEFAULT_LIMITS if limits is None else limits,
+                INTERACTIVE_IDLE_SECONDS)
+        else:
+            actual_output, error_output, status = await run_cpp_program_async(executable, case['inputs'], limits)
+            results, passed, total, success_rate = compare_output(actual_output, case['expected'], status)
+    return {
+        'nombre': case['nombre'],
+        'estado': status,
+        'resultados': results,
+        'pasos_exitosos': passed,
+        'total_pasos': total,
+        'tasa_exito': success_rate
+    }
+
+async def run_cases_async(jobs, limits=None, interactive=False, max_concurrency=None):
+    # jobs: lista de (ejecutable, caso); todos comparten un mismo bucle de eventos y semáforo
+    semaphore = asyncio.Semaphore(max_concurrency or DEFAULT_MAX_CONCURRENT_RUNS)
+    return await asyncio.gather(*(
+        run_test_case_async(executable, case, limits, interactive, semaphore) for executable, case in jobs
+    ))
+
+def run_test_suite(executable, cases, limits=None, interactive=False, max_concurrency=None):
+    # El binario se compila una sola vez; los casos se ejecutan concurrentemente como subprocesos independientes
+    return asyncio.run(run_cases_async([(executable, case) for case in cases], limits, interactive, max_concurrency))
 
 def find_cpp_files(src_dir):
-    cpp_files = []
-    for ext in ['*.cpp', '*.h', '*.hpp']:
-        cpp_files.extend(glob.glob(os.path.join(src_dir, '**', ext), recursive=True))
-    return cpp_files
+    return listar_archivos(src_dir, EXTENSIONES_CPP)
+
+@lru_cache(maxsize=None)
+def get_compiler_version(compiler):
+    try:
+        result = subprocess.run([compiler, '--version'], capture_output=True, text=True)
+        return (result.stdout or result.stderr).strip()
+    except OSError:
+        return ''
+
+def compute_compile_cache_key(cpp_files, base_dir, compile_command):
+    # La clave depende del contenido de las fuentes (ordenadas), del comando y de la versión del compilador,
+    # pero no de las rutas absolutas: la misma entrega en otra carpeta reutiliza el binario.
+    digest = hashlib.sha256()
+    for path in sorted(cpp_files, key=lambda p: os.path.relpath(p, base_dir)):
+        digest.update(os.path.relpath(path, base_dir).replace(os.sep, '/').encode('utf-8'))
+        digest.update(b'\0')
+        with open(path, 'rb') as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    digest.update(json.dumps(compile_command).encode('utf-8'))
+    digest.update(get_compiler_version(compile_command[0]).encode('utf-8'))
+    return digest.hexdigest()
+
+def evict_compile_cache(cache_dir, max_bytes):
+    # Política LRU: el mtime de cada entrada se actualiza en cada acierto, se borran las más antiguas.
+    # Ejecutables y objetos (subcarpeta objetos/) comparten el mismo presupuesto de espacio.
+    entries = []
+    for directory, _, names in os.walk(cache_dir):
+        for name in names:
+            if name.endswith('.tmp'):
+                continue  # Copia en curso de otro proceso
+            path = os.path.join(directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+    
+    total_size = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total_size <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total_size -= size
+        except FileNotFoundError:
+            continue
+
+def fetch_from_compile_cache(cache_key, executable, cache_dir=COMPILE_CACHE_DIR):
+    cached = os.path.join(cache_dir, cache_key)
+    if not os.path.isfile(cached):
+        return False
+    try:
+        os.utime(cached)
+        shutil.copy2(cached, executable)
+    except OSError:
+        return False
+    return True
+
+def store_in_compile_cache(cache_key, executable, cache_dir=COMPILE_CACHE_DIR):
+    os.makedirs(cache_dir, exist_ok=True)
+    cached = os.path.join(cache_dir, cache_key)
+    temporary = f"{cached}.{os.getpid()}.tmp"
+    try:
+        shutil.copy2(executable, temporary)
+        os.replace(temporary, cached)
+        os.utime(cached)
+        evict_compile_cache(COMPILE_CACHE_DIR, COMPILE_CACHE_MAX_BYTES)
+    except OSError as e:
+        print(f"Advertencia: No se pudo guardar {os.path.basename(executable)} en la caché: {e}")
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+@medido('regex: includes locales')
+def find_included_headers(source_file, project_dir, headers_by_name):
+    # Recorre recursivamente los #include "..." locales para que la clave de un objeto
+    # cambie cuando cambia cualquiera de los encabezados del proyecto que incluye.
+    included = set()
+    pending = [source_file]
+    while pending:
+        current = pending.pop()
+        content = leer_archivo(current)
+        if content is None:
+            continue
+        contar(archivos=1, caracteres=len(content))
+        for name in LOCAL_INCLUDE_PATTERN.findall(content):
+            candidates = [os.path.join(os.path.dirname(current), name), os.path.join(project_dir, name)]
+            candidates += headers_by_name.get(os.path.basename(name), [])
+            for candidate in candidates:
+                candidate = os.path.normpath(candidate)
+                if os.path.isfile(candidate):
+                    if candidate not in included:
+                        included.add(candidate)
+                        pending.append(candidate)
+                    break
+    return sorted(included)
+
+@medido('g++: unidad de traducción')
+def compile_translation_unit(source_file, project_dir, headers_by_name, object_file, flags, use_cache):
+    compile_command = ['g++'] + flags + ['-c', source_file, '-o', object_file]
+    
+    cache_key = None
+    if use_cache:
+        dependencies = [source_file] + find_included_headers(source_file, project_dir, headers_by_name)
+        relative_command = ['g++'] + flags + ['-c', os.path.relpath(source_file, project_dir)]
+        cache_key = compute_compile_cache_key(dependencies, project_dir, relative_command)
+        if fetch_from_compile_cache(cache_key, object_file, OBJECT_CACHE_DIR):
+            contar(aciertos_cache=1)
+            return None
+    
+    compile_result = subprocess.run(compile_command, capture_output=True, text=True)
+    if compile_result.returncode != 0:
+        return compile_result.stderr or f"No se pudo compilar {os.path.basename(source_file)}"
+    
+    if cache_key:
+        store_in_compile_cache(cache_key, object_file, OBJECT_CACHE_DIR)
+    return None
+
+def compile_cpp_program_incremental(project_dir, cpp_files, executable, flags, use_cache, max_workers=None):
+    """
+    Compila cada .cpp a su propio objeto en paralelo (reutilizando los objetos de la caché
+    cuando ni la fuente ni sus encabezados cambiaron) y al final solo enlaza. max_workers
+    limita los g++ simultáneos (por defecto, uno por núcleo).
+    """
+    sources = [f for f in cpp_files if f.endswith('.cpp')]
+    if not sources:
+        return "No se encontraron archivos .cpp para compilar."
+    
+    headers_by_name = {}
+    for path in cpp_files:
+        if not path.endswith('.cpp'):
+            headers_by_name.setdefault(os.path.basename(path), []).append(path)
+    
+    object_dir = os.path.join(os.path.dirname(executable), 'objetos')
+    os.makedirs(object_dir, exist_ok=True)
+    object_files = [os.path.join(object_dir, f"{i}_{os.path.splitext(os.path.basename(source))[0]}.o")
+                    for i, source in enumerate(sources)]
+    
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count() or 1) as executor:
+            futures = [
+                executor.submit(compile_translation_unit, source, project_dir, headers_by_name, object_file, flags, use_cache)
+                for source, object_file in zip(sources, object_files)
+            ]
+            errors = [future.result() for future in futures]
+        errors = [error for error in errors if error]
+        if errors:
+            return "\n".join(errors)
+        
+        link_result = subprocess.run(['g++', '-o', executable] + object_files, capture_output=True, text=True)
+        if link_result.returncode != 0:
+            return link_result.stderr
+        return None
+    finally:
+        shutil.rmtree(object_dir, ignore_errors=True)
 
-def compile_cpp_program(src_dir, output_dir):
-    ruta_carpeta_proyecto = buscar_carpeta_proyecto_visual_studio(src_dir)
+@medido('g++: compilación')
+def compile_cpp_program(src_dir, output_dir, use_cache=True, incremental=False, max_workers=None):
+    ruta_carpeta_proyecto = buscar_carpeta_proyecto(src_dir)
     
     cpp_files = find_cpp_files(ruta_carpeta_proyecto)
     if not cpp_files:
         return None, "No se encontraron archivos C++ en el directorio src."
+    contar(archivos=len(cpp_files), bytes=sum(os.path.getsize(path) for path in cpp_files))
     
     executable = os.path.join(output_dir, 'program.exe' if sys.platform == "win32" else 'program')
+    # La compilación por unidad de traducción solo está disponible con g++
+    incremental = incremental and sys.platform != "win32"
     
     if sys.platform == "win32":  # Windows
         compile_command = ['cl', '/EHsc', '/Fe:', executable] + cpp_files
+    elif incremental:
+        compile_command = ['g++', '-std=c++11', '-c', '<incremental>', '-o', executable] + cpp_files
     else:  # Unix-like
         compile_command = ['g++', '-std=c++11', '-o', executable] + cpp_files
     
-    compile_result = subprocess.run(compile_command, capture_output=True, text=True)
-    if compile_result.returncode != 0:
-        return None, f"La compilación falló:\n{compile_result.stderr}"
+    cache_key = None
+    if use_cache:
+        relative_command = [compile_command[0]] + [
+            '<ejecutable>' if arg == executable else os.path.relpath(arg, ruta_carpeta_proyecto) if arg in cpp_files else arg
+            for arg in compile_command[1:]
+        ]
+        cache_key = compute_compile_cache_key(cpp_files, ruta_carpeta_proyecto, relative_command)
+        if fetch_from_compile_cache(cache_key, executable):
+            contar(aciertos_cache=1)
+            return executable, None
+    
+    if incremental:
+        compile_error = compile_cpp_program_incremental(ruta_carpeta_proyecto, cpp_files, executable, ['-std=c++11'],
+                                                        use_cache, max_workers)
+        if compile_error is not None:
+            return None, f"La compilación falló:\n{compile_error}"
+    else:
+        compile_result = subprocess.run(compile_command, capture_output=True, text=True)
+        if compile_result.returncode != 0:
+            return None, f"La compilación falló:\n{compile_result.stderr}"
+    
+    if cache_key:
+        store_in_compile_cache(cache_key, executable)
     
     return executable, None
 
-def main():
-    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    src_dir = os.path.join(project_root, 'src')
-    input_file = os.path.join(project_root, 'input', 'input.json')
-    expected_output_file = os.path.join(project_root, 'expected_output', 'expected_steps.json')
-    output_dir = os.path.join(project_root, 'output')
+def new_summary(name):
+    return {
+        'entrega': name,
+        'estado': 'ok',
+        'pruebas_exitosas': 0,
+        'total_pruebas': 0,
+        'tasa_exito': 0,
+        'casos_exitosos': 0,
+        'total_casos': 0,
+        'reporte': None
+    }
+
+def summarize_error(summary, state, message):
+    summary['estado'] = state
+    summary['total_pruebas'] = 1
+    summary['mensaje'] = message
+    return summary
+
+def summarize_case_results(summary, case_results):
+    passed = sum(case['pasos_exitosos'] for case in case_results)
+    total = sum(case['total_pasos'] for case in case_results)
     
+    summary['pruebas_exitosas'] = passed
+    summary['total_pruebas'] = total
+    summary['tasa_exito'] = (passed / total) * 100 if total > 0 else 0
+    summary['casos_exitosos'] = sum(1 for case in case_results if case['tasa_exito'] == 100)
+    summary['total_casos'] = len(case_results)
+    summary['estados_ejecucion'] = {status: sum(1 for case in case_results if case['estado'] == status)
+                                    for status in sorted({case['estado'] for case in case_results})}
+    # Resultado de cada paso (True si pasó) para poder agregar por paso sin releer los mensajes
+    summary['casos'] = [{
+        'nombre': case['nombre'],
+        'estado': case['estado'],
+        'pasos_exitosos': case['pasos_exitosos'],
+        'total_pasos': case['total_pasos'],
+        'tasa_exito': case['tasa_exito'],
+        'pasos': [result.startswith('✅') for result in case['resultados']],
+        'resultados': case['resultados']
+    } for case in case_results]
+    return summary
+
+def record_submission(summary, output_dir):
+    """Escribe el registro de la entrega y genera su reporte Markdown a partir de lo registrado."""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    summary['reporte'] = os.path.join(output_dir, f"reporte_pruebas_{timestamp}.md")
+    record = escribir_registro(output_dir, 'pruebas', summary['entrega'], summary)
+    escribir_markdown(record['reporte'], generate_markdown_report(record))
+    print(f"Reporte generado: {record['reporte']}")
+    return record
+
+def compile_submission(submission_root, output_dir, use_cache=True, incremental=False, max_workers=None):
     os.makedirs(output_dir, exist_ok=True)
+    return compile_cpp_program(os.path.join(submission_root, 'src'), output_dir, use_cache, incremental, max_workers)
+
+def grade_submission(submission_root, input_path, expected_path, output_dir, use_cache=True, incremental=False,
+                     limits=None, interactive=False, max_concurrency=None):
+    """
+    Compila, ejecuta y genera el reporte de una entrega (una carpeta con 'src/').
+    Devuelve un resumen serializable para poder agregarlo en el modo por lotes.
+    """
+    summary = new_summary(os.path.basename(os.path.normpath(submission_root)))
     
-    executable, compile_error = compile_cpp_program(src_dir, output_dir)
+    executable, compile_error = compile_submission(submission_root, output_dir, use_cache, incremental)
     if compile_error:
-        generate_markdown_report([f"❌ Error de compilación: {compile_error}"], 0, 1, 0, output_dir)
-        return
+        summarize_error(summary, 'error_compilacion', f"❌ Error de compilación: {compile_error}")
+        return record_submission(summary, output_dir)
     
     try:
-        input_data = load_json(input_file)
-        expected_output_data = load_json(expected_output_file)
-        
-        actual_output, error_output = run_cpp_program(executable, input_data['steps'])
-        
-        results, passed, total, success_rate = compare_output(actual_output, expected_output_data['steps'])
-        
-        generate_markdown_report(results, passed, total, success_rate, output_dir)
+        if input_path is None:
+            raise ValueError("No se encontraron casos de prueba (input/ y expected_output/).")
+        cases = load_test_cases(input_path, expected_path)
+        # Etapa externa: su tiempo de subprocesos es el total de todos los casos
+        with etapa('casos de prueba', casos=len(cases)):
+            case_results = run_test_suite(executable, cases, limits, interactive, max_concurrency)
+        summarize_case_results(summary, case_results)
         
     except Exception as e:
-        generate_markdown_report([f"❌ Error inesperado: {str(e)}"], 0, 1, 0, output_dir)
+        summarize_error(summary, 'error_inesperado', f"❌ Error inesperado: {str(e)}")
     
     finally:
         if executable and os.path.exists(executable):
             os.remove(executable)
+    
+    return record_submission(summary, output_dir)
+
+def find_submissions(batch_dir):
+    submissions = []
+    for entry in sorted(os.listdir(batch_dir)):
+        submission_root = os.path.join(batch_dir, entry)
+        if os.path.isdir(os.path.join(submission_root, 'src')):
+            submissions.append(submission_root)
+    return submissions
+
+def grade_batch(batch_dir, input_path, expected_path, output_dir, workers=None, use_cache=True, incremental=False,
+                limits=None, interactive=False, max_concurrency=None):
+    """
+    Califica todas las entregas de batch_dir. La compilación (limitada por CPU) se reparte en un
+    pool de procesos; la ejecución de todos los casos de todas las entregas (limitada por E/S)
+    ocurre en un único bucle de eventos con un semáforo de concurrencia.
+    """
+    submissions = find_submissions(batch_dir)
+    if not submissions:
+        print(f"No se encontraron entregas con carpeta 'src' en {batch_dir}")
+        return None
+    
+    workers = min(workers or os.cpu_count() or 1, len(submissions))
+    # Cada proceso del pool compila con menos hilos (--incremental) para no sobresuscribir los núcleos
+    compile_threads = max(1, (os.cpu_count() or 1) // workers)
+    batch_output_dir = os.path.join(output_dir, f"lote_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+    os.makedirs(batch_output_dir, exist_ok=True)
+    
+    print(f"Compilando {len(submissions)} entregas con {workers} procesos...")
+    names = {root: os.path.basename(os.path.normpath(root)) for root in submissions}
+    summaries = {root: new_summary(names[root]) for root in submissions}
+    executables = {}
+    # Las etapas de cada compilación quedan en los procesos del pool; aquí se mide el total
+    with etapa('g++: compilación del lote', entregas=len(submissions)):
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(compile_submission, root, os.path.join(batch_output_dir, names[root]), use_cache,
+                                incremental, compile_threads): root
+                for root in submissions
+            }
+            for future in as_completed(futures):
+                root = futures[future]
+                try:
+                    executable, compile_error = future.result()
+                except Exception as e:
+                    executable, compile_error = None, str(e)
+                if compile_error:
+                    summarize_error(summaries[root], 'error_compilacion', f"❌ Error de compilación: {compile_error}")
+                else:
+                    executables[root] = executable
+    
+    jobs = []
+    owners = []
+    for root, executable in executables.items():
+        # Una entrega puede traer sus propios casos de prueba
+        submission_input, submission_expected = find_test_suite(root)
+        if submission_input is None:
+            submission_input, submission_expected = input_path, expected_path
+        try:
+            if submission_input is None:
+                raise ValueError("No se encontraron casos de prueba (input/ y expected_output/).")
+            for case in load_test_cases(submission_input, submission_expected):
+                jobs.append((executable, case))
+                owners.append(root)
+        except Exception as e:
+            summarize_error(summaries[root], 'error_inesperado', f"❌ Error inesperado: {str(e)}")
+    
+    print(f"Ejecutando {len(jobs)} casos de prueba...")
+    try:
+        with etapa('casos de prueba', casos=len(jobs)):
+            case_results = asyncio.run(run_cases_async(jobs, limits, interactive, max_concurrency))
+        results_by_submission = {}
+        for root, case_result in zip(owners, case_results):
+            results_by_submission.setdefault(root, []).append(case_result)
+        for root, submission_results in results_by_submission.items():
+            summarize_case_results(summaries[root], submission_results)
+    finally:
+        for executable in executables.values():
+            if os.path.exists(executable):
+                os.remove(executable)
+    
+    # Un registro por entrega en el resultados.jsonl del lote, listo para agregar por cohorte;
+    # el reporte de cada entrega se genera a partir de su registro
+    summaries = [record_submission(summaries[root], os.path.join(batch_output_dir, names[root]))
+                 for root in sorted(submissions, key=lambda root: names[root])]
+    aggregated_file = os.path.join(batch_output_dir, 'resultados_lote.json')
+    with open(aggregated_file, 'w', encoding='utf-8') as f:
+        json.dump({
+            'fecha': datetime.now().isoformat(),
+            'total_entregas': len(summaries),
+            'entregas_aprobadas': sum(1 for summary in summaries if summary['tasa_exito'] == 100),
+            'resultados': summaries
+        }, f, indent=2, ensure_ascii=False)
+    
+    print(f"Resultados del lote guardados en: {aggregated_file}")
+    return aggregated_file
+
+def ejecutar_analisis(ruta_proyecto, ruta_salida):
+    input_path, expected_path = find_test_suite(ruta_proyecto)
+    return grade_submission(ruta_proyecto, input_path, expected_path, ruta_salida)['reporte']
+
+def main():
+    project_root = PROJECT_ROOT
+    input_path, expected_path = find_test_suite(project_root)
+    output_dir = os.path.join(project_root, 'output')
+    
+    parser = argparse.ArgumentParser(description="Compila y prueba programas C++ contra las salidas esperadas.")
+    parser.add_argument('--lote', metavar='DIRECTORIO',
+                        help="Directorio con una carpeta por entrega (cada una con su 'src/') para calificar en paralelo.")
+    parser.add_argument('--procesos', type=int, default=None,
+                        help="Número máximo de procesos en modo por lotes (por defecto, número de núcleos).")
+    parser.add_argument('--sin-cache', action='store_true',
+                        help="Compila siempre, sin consultar ni actualizar la caché de ejecutables.")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Compila cada .cpp a un objeto en paralelo, reutiliza los objetos sin cambios y solo enlaza.")
+    parser.add_argument('--tiempo-limite', type=float, default=DEFAULT_LIMITS['tiempo_real'],
+                        help="Segundos de reloj permitidos por ejecución (0 desactiva el límite).")
+    parser.add_argument('--tiempo-cpu', type=int, default=DEFAULT_LIMITS['tiempo_cpu'],
+                        help="Segundos de CPU permitidos por ejecución (0 desactiva el límite).")
+    parser.add_argument('--memoria-mb', type=int, default=DEFAULT_LIMITS['memoria_mb'],
+                        help="Espacio de direcciones máximo en MB (0 desactiva el límite).")
+    parser.add_argument('--salida-kb', type=int, default=DEFAULT_LIMITS['salida_kb'],
+                        help="Tamaño máximo de la salida estándar y de la de errores en KB (0 desactiva el límite).")
+    parser.add_argument('--concurrencia', type=int, default=DEFAULT_MAX_CONCURRENT_RUNS,
+                        help="Programas en ejecución simultánea (por defecto, 4 por núcleo).")
+    parser.add_argument('--interactivo', action='store_true',
+                        help="Envía cada entrada al ver el prompt esperado y se detiene en la primera discrepancia.")
+    parser.add_argument('--traza', metavar='RUTA', default=None,
+                        help="Escribe en RUTA una traza JSON Lines con el tiempo, la CPU y la memoria de cada "
+                             "compilación y ejecución (equivale a ANALISIS_TRAZA=RUTA).")
+    args = parser.parse_args()
+    if args.traza:
+        activar_traza(os.path.abspath(args.traza))
+    
+    limits = {
+        'tiempo_real': args.tiempo_limite or None,
+        'tiempo_cpu': args.tiempo_cpu or None,
+        'memoria_mb': args.memoria_mb or None,
+        'salida_kb': args.salida_kb or None
+    }
+    os.makedirs(output_dir, exist_ok=True)
+    
+    if args.lote:
+        grade_batch(args.lote, input_path, expected_path, output_dir, args.procesos,
+                    not args.sin_cache, args.incremental, limits, args.interactivo, args.concurrencia)
+    else:
+        grade_submission(project_root, input_path, expected_path, output_dir,
+                         not args.sin_cache, args.incremental, limits, args.interactivo, args.concurrencia)
 
 if __name__ == "__main__":
     main()
@@ -1,148 +1,226 @@
 import os
-import re
+import hashlib
 import subprocess
+import xml.etree.ElementTree as ET
 from datetime import datetime
-from collections import defaultdict
+from collections import Counter, defaultdict
+
+from cargador_fuentes import buscar_carpeta_proyecto, leer_lineas, listar_archivos
+import hechos_cpp
+import complejidad_cpp
+from complejidad_cpp import complejidad_de_archivo
+from almacen_resultados import resultados_por_archivo, version_de_codigo
+from detector_clones import cargar_archivos, detectar_clones, formatear_ubicacion
+from registros import escribir_markdown, escribir_registro, nombre_entrega
+from instrumentacion import contar, medido
 
 # Cambiamos las rutas para que sean relativas al directorio del script
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 SRC_DIR = os.path.join(os.path.dirname(SCRIPT_DIR), "src")
 OUTPUT_DIR = os.path.join(os.path.dirname(SCRIPT_DIR), "output")
-
-def leer_archivo(ruta_archivo):
-    encodings = ['utf-8', 'latin-1', 'ISO-8859-1']
-    for encoding in encodings:
-        try:
-            with open(ruta_archivo, 'r', encoding=encoding) as file:
-                return file.read()
-        except UnicodeDecodeError:
-            continue
-    print(f"Error: No se pudo leer el archivo {ruta_archivo} con ninguna codificación conocida.")
-    return None
-
-def buscar_carpeta_proyecto_visual_studio(ruta_src):
-    if not os.path.exists(ruta_src):
-        print(f"Advertencia: El directorio {ruta_src} no existe.")
-        return ruta_src
-    for carpeta in os.listdir(ruta_src):
-        ruta_carpeta = os.path.join(ruta_src, carpeta)
-        if os.path.isdir(ruta_carpeta):
-            for archivo in os.listdir(ruta_carpeta):
-                if archivo.endswith(('.cpp', '.h')):
-                    return ruta_carpeta
-    return ruta_src
-
-def count_lines_of_code():
+# Funciones listadas en la tabla de complejidad del reporte
+MAX_FUNCIONES_REPORTE = 10
+CPPCHECK_BUILD_DIR = os.environ.get('CPPCHECK_BUILD_DIR',
+                                    os.path.join(os.path.dirname(SCRIPT_DIR), ".cache", "cppcheck"))
+CPPCHECK_HILOS = int(os.environ.get('CPPCHECK_HILOS', os.cpu_count() or 1))
+VERSION_ANALISIS = version_de_codigo(__file__, hechos_cpp.__file__, complejidad_cpp.__file__)
+
+def measure_file(ruta):
+    # Métricas de un solo archivo: líneas por tipo y complejidad de cada función
+    lines = leer_lineas(ruta)
+    if lines is None:
+        return None
+    loc = {'total': len(lines), 'blank': 0, 'comment': 0, 'code': 0}
+    for line in lines:
+        stripped = line.strip()
+        if not stripped:
+            loc['blank'] += 1
+        elif stripped.startswith('//'):
+            loc['comment'] += 1
+        else:
+            loc['code'] += 1
+    return {'loc': loc, 'functions': complejidad_de_archivo(ruta) or []}
+
+@medido('métricas por archivo')
+def measure_files(rutas):
+    contar(archivos=len(rutas))
+    return {ruta: measure_file(ruta) for ruta in rutas}
+
+def file_metrics(src_dir=SRC_DIR):
+    """Métricas por archivo ({ruta relativa: métricas}); solo se recalculan los archivos que cambiaron."""
+    ruta_carpeta_proyecto = buscar_carpeta_proyecto(src_dir)
+    rutas = listar_archivos(ruta_carpeta_proyecto, ('.cpp', '.h'))
+    metrics = resultados_por_archivo('metricas', VERSION_ANALISIS, rutas, measure_files)
+    return {os.path.relpath(ruta, ruta_carpeta_proyecto): metrics[ruta] for ruta in rutas if metrics[ruta] is not None}
+
+def count_lines_of_code(src_dir=SRC_DIR, metrics=None):
     loc = defaultdict(int)
-    ruta_carpeta_proyecto = buscar_carpeta_proyecto_visual_studio(SRC_DIR)
-    for root, _, files in os.walk(ruta_carpeta_proyecto):
-        for file in files:
-            if file.endswith(('.cpp', '.h')):
-                content = leer_archivo(os.path.join(root, file))
-                if content is not None:
-                    loc['total'] += len(content.splitlines())
-                    loc['code'] += sum(1 for line in content.splitlines() if line.strip() and not line.strip().startswith('//'))
-                    loc['comment'] += sum(1 for line in content.splitlines() if line.strip().startswith('//'))
-                    loc['blank'] += sum(1 for line in content.splitlines() if not line.strip())
+    for file_data in (metrics if metrics is not None else file_metrics(src_dir)).values():
+        for kind, count in file_data['loc'].items():
+            loc[kind] += count
     return loc
 
-def analyze_complexity():
-    complexity = defaultdict(int)
-    ruta_carpeta_proyecto = buscar_carpeta_proyecto_visual_studio(SRC_DIR)
-    for root, _, files in os.walk(ruta_carpeta_proyecto):
-        for file in files:
-            if file.endswith('.cpp'):
-                content = leer_archivo(os.path.join(root, file))
-                if content is not None:
-                    complexity['cyclomatic'] += content.count('if') + content.count('for') + content.count('while') + content.count('case')
-                    complexity['cognitive'] += content.count('if') + content.count('for') + content.count('while') + content.count('switch')
+def analyze_complexity(src_dir=SRC_DIR, metrics=None):
+    # Complejidad por función (ver complejidad_cpp); los totales son la suma sobre todas las funciones
+    complexity = {'cyclomatic': 0, 'cognitive': 0, 'max_nesting': 0, 'functions': []}
+    for archivo, file_data in (metrics if metrics is not None else file_metrics(src_dir)).items():
+        for funcion in file_data['functions']:
+            funcion = dict(funcion, archivo=archivo)
+            complexity['cyclomatic'] += funcion['ciclomatica']
+            complexity['cognitive'] += funcion['cognitiva']
+            complexity['max_nesting'] = max(complexity['max_nesting'], funcion['anidamiento'])
+            complexity['functions'].append(funcion)
+    complexity['functions'].sort(key=lambda f: (-f['cognitiva'], -f['ciclomatica'], f['archivo'], f['linea_inicio']))
     return complexity
 
-def count_functions():
-    function_count = 0
-    ruta_carpeta_proyecto = buscar_carpeta_proyecto_visual_studio(SRC_DIR)
-    for root, _, files in os.walk(ruta_carpeta_proyecto):
-        for file in files:
-            if file.endswith(('.cpp', '.h')):
-                content = leer_archivo(os.path.join(root, file))
-                if content is not None:
-                    function_count += len(re.findall(r'\b\w+\s+\w+\s*\([^)]*\)\s*{', content))
-    return function_count
-
-def analyze_duplications():
-    duplications = 0
-    all_code_blocks = []
-    ruta_carpeta_proyecto = buscar_carpeta_proyecto_visual_studio(SRC_DIR)
-    
-    for root, _, files in os.walk(ruta_carpeta_proyecto):
-        for file in files:
-            if file.endswith(('.cpp', '.h')):
-                content = leer_archivo(os.path.join(root, file))
-                if content is not None:
-                    code_blocks = re.findall(r'\{[^{}]*\}', content)
-                    all_code_blocks.extend(code_blocks)
-    
-    for i, block in enumerate(all_code_blocks):
-        for j in range(i + 1, len(all_code_blocks)):
-            if len(block) > 50 and block == all_code_blocks[j]:
-                duplications += 1
-    
-    return duplications
-
-def run_cppcheck():
+def count_functions(src_dir=SRC_DIR, metrics=None):
+    return sum(len(file_data['functions']) for file_data in (metrics if metrics is not None else file_metrics(src_dir)).values())
+
+@medido('detección de clones')
+def analyze_duplications(src_dir=SRC_DIR):
+    # Clones de tokens normalizados entre todos los archivos del proyecto (ver detector_clones)
+    ruta_carpeta_proyecto = buscar_carpeta_proyecto(src_dir)
+    return detectar_clones(cargar_archivos(ruta_carpeta_proyecto, ('.cpp', '.h')))
+
+def directorio_build_cppcheck(src_dir):
+    # Un directorio por proyecto: cppcheck guarda ahí el análisis de cada archivo y en la
+    # siguiente ejecución solo vuelve a analizar los que cambiaron
+    clave = hashlib.sha1(os.path.abspath(src_dir).encode()).hexdigest()[:16]
+    ruta = os.path.join(CPPCHECK_BUILD_DIR, clave)
+    os.makedirs(ruta, exist_ok=True)
+    return ruta
+
+def leer_hallazgos_xml(flujo):
+    """Recorre el XML de cppcheck a medida que llega y devuelve un hallazgo por cada <error>."""
+    hallazgos = []
+    for _, elemento in ET.iterparse(flujo, events=('end',)):
+        if elemento.tag != 'error':
+            continue
+        ubicacion = elemento.find('location')
+        hallazgos.append({
+            'archivo': ubicacion.get('file') if ubicacion is not None else None,
+            'linea': int(ubicacion.get('line', 0)) if ubicacion is not None else None,
+            'id': elemento.get('id'),
+            'severidad': elemento.get('severity'),
+            'mensaje': elemento.get('msg')
+        })
+        elemento.clear()
+    return hallazgos
+
+@medido('cppcheck')
+def run_cppcheck(src_dir=SRC_DIR, hilos=CPPCHECK_HILOS):
+    comando = ['cppcheck', '--enable=all', '--inconclusive', '--xml', '--quiet', f'-j{hilos}',
+               f'--cppcheck-build-dir={directorio_build_cppcheck(src_dir)}', src_dir]
     try:
-        result = subprocess.run(['cppcheck', '--enable=all', '--inconclusive', '--xml', SRC_DIR],
-                                capture_output=True, text=True, check=True)
-        errors = len(re.findall(r'severity="error"', result.stdout))
-        warnings = len(re.findall(r'severity="warning"', result.stdout))
-        return {'errors': errors, 'warnings': warnings}
-    except subprocess.CalledProcessError:
-        return {'errors': "N/A", 'warnings': "N/A"}
+        # cppcheck escribe el XML en stderr; stdout solo trae el progreso
+        proceso = subprocess.Popen(comando, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
     except FileNotFoundError:
         print("Cppcheck no está instalado o no se encuentra en el PATH del sistema.")
-        return {'errors': "N/A", 'warnings': "N/A"}
+        return {'errors': "N/A", 'warnings': "N/A", 'findings': []}
+
+    try:
+        hallazgos = leer_hallazgos_xml(proceso.stderr)
+    except ET.ParseError as e:
+        print(f"❌ No se pudo interpretar la salida XML de cppcheck: {e}")
+        hallazgos = None
+    finally:
+        proceso.stderr.close()
+        proceso.wait()
+    if hallazgos is None:
+        return {'errors': "N/A", 'warnings': "N/A", 'findings': []}
+    contar(archivos=len(listar_archivos(src_dir)), hallazgos=len(hallazgos))
+
+    for hallazgo in hallazgos:
+        if hallazgo['archivo']:
+            hallazgo['archivo'] = os.path.relpath(hallazgo['archivo'], src_dir)
+    hallazgos.sort(key=lambda h: (h['archivo'] or '', h['linea'] or 0, h['id'] or ''))
+    severidades = Counter(hallazgo['severidad'] for hallazgo in hallazgos)
+    return {'errors': severidades['error'], 'warnings': severidades['warning'], 'findings': hallazgos}
 
 def generate_report(loc, complexity, function_count, duplications, cppcheck_results):
-    report = f"# 📊 Reporte de Análisis de Métricas - Proyecto C++\n\n"
-    report += f"📅 Fecha de análisis: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n"
-
-    report += "## 📈 Métricas de Código\n\n"
-    report += "### 📝 Líneas de Código\n\n"
-    report += f"- 📏 Líneas totales: **{loc['total']}**\n"
-    report += f"- 💻 Líneas de código efectivas: **{loc['code']}**\n"
-    report += f"- 💬 Líneas de comentarios: **{loc['comment']}**\n"
-    report += f"- ⚪ Líneas en blanco: **{loc['blank']}**\n"
-    report += f"- 📊 Densidad de comentarios: **{loc['comment'] / loc['code']:.2%}**\n\n"
-
-    report += "### 🧮 Complejidad y Funciones\n\n"
-    report += f"- 🔢 Número de funciones: **{function_count}**\n"
-    report += f"- 🔄 Complejidad ciclomática total: **{complexity['cyclomatic']}**\n"
-    report += f"- 🧠 Complejidad cognitiva total: **{complexity['cognitive']}**\n"
-    report += f"- 📊 Complejidad ciclomática promedio por función: **{complexity['cyclomatic'] / function_count:.2f}**\n"
-    report += f"- 📊 Complejidad cognitiva promedio por función: **{complexity['cognitive'] / function_count:.2f}**\n\n"
-
-    report += f"### 🔄 Duplicaciones\n\n"
-    report += f"- 🔁 Duplicaciones detectadas: **{duplications}**\n\n"
-
-    report += "## 🚨 Problemas de Calidad\n\n"
-    report += f"- ❌ Errores detectados por Cppcheck: **{cppcheck_results['errors']}**\n"
-    report += f"- ⚠️ Advertencias detectadas por Cppcheck: **{cppcheck_results['warnings']}**\n\n"
-
-    report += "## 💡 Recomendaciones\n\n"
-    report += "1. 🔍 Revisar y corregir los errores y advertencias reportados por Cppcheck.\n"
-    report += "2. 🔧 Considerar refactorizar funciones con alta complejidad.\n"
-    report += "3. 🗑️ Revisar y eliminar código duplicado.\n"
-    report += "4. 📝 Aumentar la cobertura de comentarios si es necesario.\n"
-
-    return report
-
-def save_report(content):
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    yield f"# 📊 Reporte de Análisis de Métricas - Proyecto C++\n\n"
+    yield f"📅 Fecha de análisis: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n"
+
+    yield "## 📈 Métricas de Código\n\n"
+    yield "### 📝 Líneas de Código\n\n"
+    yield f"- 📏 Líneas totales: **{loc['total']}**\n"
+    yield f"- 💻 Líneas de código efectivas: **{loc['code']}**\n"
+    yield f"- 💬 Líneas de comentarios: **{loc['comment']}**\n"
+    yield f"- ⚪ Líneas en blanco: **{loc['blank']}**\n"
+    yield f"- 📊 Densidad de comentarios: **{loc['comment'] / loc['code']:.2%}**\n\n"
+
+    yield "### 🧮 Complejidad y Funciones\n\n"
+    yield f"- 🔢 Número de funciones: **{function_count}**\n"
+    yield f"- 🔄 Complejidad ciclomática total: **{complexity['cyclomatic']}**\n"
+    yield f"- 🧠 Complejidad cognitiva total: **{complexity['cognitive']}**\n"
+    yield f"- 📊 Complejidad ciclomática promedio por función: **{complexity['cyclomatic'] / function_count:.2f}**\n"
+    yield f"- 📊 Complejidad cognitiva promedio por función: **{complexity['cognitive'] / function_count:.2f}**\n"
+    yield f"- 🪆 Anidamiento máximo: **{complexity['max_nesting']}**\n\n"
+    if complexity['functions']:
+        yield f"#### 🔝 Funciones más complejas\n\n"
+        yield "| Función | Ubicación | Ciclomática | Cognitiva | Anidamiento |\n"
+        yield "|:--------|:----------|------------:|----------:|------------:|\n"
+        for funcion in complexity['functions'][:MAX_FUNCIONES_REPORTE]:
+            yield (f"| {funcion['nombre_completo']} | {funcion['archivo']}:{funcion['linea_inicio']}-{funcion['linea_fin']} "
+                   f"| {funcion['ciclomatica']} | {funcion['cognitiva']} | {funcion['anidamiento']} |\n")
+        yield "\n"
+
+    yield f"### 🔄 Duplicaciones\n\n"
+    yield f"- 🔁 Duplicaciones detectadas: **{len(duplications)}**\n\n"
+    if duplications:
+        yield "| Original | Copia | Tokens | Líneas |\n"
+        yield "|:---------|:------|-------:|-------:|\n"
+        for clone in duplications:
+            yield (f"| {formatear_ubicacion(clone['original'])} | {formatear_ubicacion(clone['copia'])} "
+                   f"| {clone['tokens']} | {clone['lineas']} |\n")
+        yield "\n"
+
+    yield "## 🚨 Problemas de Calidad\n\n"
+    yield f"- ❌ Errores detectados por Cppcheck: **{cppcheck_results['errors']}**\n"
+    yield f"- ⚠️ Advertencias detectadas por Cppcheck: **{cppcheck_results['warnings']}**\n\n"
+    if cppcheck_results['findings']:
+        por_severidad = Counter(finding['severidad'] for finding in cppcheck_results['findings'])
+        yield "- 🗂️ Hallazgos por severidad: " + ", ".join(f"{severidad} **{total}**" for severidad, total in por_severidad.most_common()) + "\n\n"
+        yield "| Archivo | Línea | Severidad | Id | Mensaje |\n"
+        yield "|:--------|------:|:----------|:---|:--------|\n"
+        for finding in cppcheck_results['findings']:
+            archivo = finding['archivo'] or '-'
+            mensaje = (finding['mensaje'] or '').replace('|', '\\|')
+            yield f"| {archivo} | {finding['linea'] or '-'} | {finding['severidad']} | {finding['id']} | {mensaje} |\n"
+        yield "\n"
+
+    yield "## 💡 Recomendaciones\n\n"
+    yield "1. 🔍 Revisar y corregir los errores y advertencias reportados por Cppcheck.\n"
+    yield "2. 🔧 Considerar refactorizar funciones con alta complejidad.\n"
+    yield "3. 🗑️ Revisar y eliminar código duplicado.\n"
+    yield "4. 📝 Aumentar la cobertura de comentarios si es necesario.\n"
+
+def save_report(content, output_dir=OUTPUT_DIR):
+    # content puede ser el texto completo o los fragmentos que va generando generate_report
     filename = f"REPORTE_ANALISIS_METRICAS_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md"
-    filepath = os.path.join(OUTPUT_DIR, filename)
-    with open(filepath, 'w', encoding='utf-8') as f:
-        f.write(content)
+    filepath = escribir_markdown(os.path.join(output_dir, filename), content)
     print(f"Reporte generado: {filepath}")
+    return filepath
+
+def ejecutar_analisis(ruta_proyecto, ruta_salida):
+    src_dir = os.path.join(ruta_proyecto, "src")
+    metrics = file_metrics(src_dir)
+    loc = count_lines_of_code(src_dir, metrics)
+    complexity = analyze_complexity(src_dir, metrics)
+    function_count = count_functions(src_dir, metrics)
+    duplications = analyze_duplications(src_dir)
+    cppcheck_results = run_cppcheck(src_dir)
+
+    record = escribir_registro(ruta_salida, 'metricas', nombre_entrega(ruta_proyecto), {
+        'loc': loc,
+        'complexity': complexity,
+        'function_count': function_count,
+        'duplications': duplications,
+        'cppcheck': cppcheck_results
+    })
+    report_content = generate_report(record['loc'], record['complexity'], record['function_count'],
+                                     record['duplications'], record['cppcheck'])
+    return save_report(report_content, ruta_salida)
 
 if __name__ == "__main__":
     if not os.path.exists(SRC_DIR):
@@ -151,11 +229,4 @@ if __name__ == "__main__":
         print("Contenido del directorio actual:")
         print(os.listdir('.'))
     else:
-        loc = count_lines_of_code()
-        complexity = analyze_complexity()
-        function_count = count_functions()
-        duplications = analyze_duplications()
-        cppcheck_results = run_cppcheck()
-        
-        report_content = generate_report(loc, complexity, function_count, duplications, cppcheck_results)
-        save_report(report_content)
+        ejecutar_analisis(os.path.dirname(SCRIPT_DIR), OUTPUT_DIR)
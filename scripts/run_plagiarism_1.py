@@ -1,40 +1,129 @@
 import os
 import re
+import json
+import time
+import hashlib
+import argparse
+import threading
 from datetime import datetime
+from collections import OrderedDict
+from functools import lru_cache
+from importlib import metadata
+
+_INICIO_IMPORTACION = time.perf_counter()
+
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-from transformers import AutoTokenizer, AutoModel
-import torch
-import nltk
-from nltk.corpus import wordnet
-import spacy
-
-# Descargar recursos de NLTK necesarios
-nltk.download('averaged_perceptron_tagger', quiet=True)
-nltk.download('wordnet', quiet=True)
-
-# Cargar el modelo de lenguaje en español y CodeBERT
-nlp = spacy.load("es_core_news_sm")
-tokenizer = AutoTokenizer.from_pretrained("microsoft/codebert-base")
-model = AutoModel.from_pretrained("microsoft/codebert-base")
+
+from cargador_fuentes import leer_archivo, listar_archivos
+import hechos_cpp
+from hechos_cpp import extraer_hechos, hechos_de_archivo
+from almacen_resultados import resultados_por_archivo, version_de_codigo
+from registros import escribir_markdown, escribir_registro, nombre_entrega
+from instrumentacion import contar, etapa, medido
+from similitud_embeddings import (pares_mas_similares, cargar_indice, consultar_indice,
+                                  embedding_de_entrega, UMBRAL_SIMILITUD, COHORTE)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+NOMBRE_MODELO = "microsoft/codebert-base"
+REVISION_MODELO = os.environ.get('PLAGIO_REVISION_MODELO', 'main')
+# Embeddings ya calculados, por hash del contenido y revisión del modelo
+CACHE_EMBEDDINGS_DIR = os.environ.get('PLAGIO_CACHE_EMBEDDINGS', os.path.join(PROJECT_ROOT, '.cache', 'embeddings'))
+# Ventanas de tokens por pasada del modelo e hilos de CPU que usa torch
+TAMANO_LOTE = int(os.environ.get('PLAGIO_TAMANO_LOTE', '8'))
+HILOS_TORCH = int(os.environ.get('PLAGIO_HILOS', str(os.cpu_count() or 1)))
+# Los archivos largos se dividen en ventanas de 512 tokens que se solapan en SOLAPAMIENTO tokens
+LONGITUD_VENTANA = 512
+SOLAPAMIENTO = 128
+# Análisis de identificadores memoizado (LRU) y persistido entre ejecuciones
+CACHE_IDENTIFICADORES = os.environ.get('PLAGIO_CACHE_IDENTIFICADORES',
+                                       os.path.join(PROJECT_ROOT, '.cache', 'identificadores.json'))
+MAX_IDENTIFICADORES = int(os.environ.get('PLAGIO_MAX_IDENTIFICADORES', '100000'))
+TAMANO_LOTE_SPACY = 256
+MODELO_SPACY = "es_core_news_sm"
+
+VERSION_ANALISIS = version_de_codigo(__file__, hechos_cpp.__file__)
+
+# Sin red: nunca se descarga nada (modelos de Hugging Face ni datos de NLTK)
+MODO_SIN_RED = os.environ.get('PLAGIO_OFFLINE', '') not in ('', '0')
+
+# spaCy, CodeBERT y WordNet se cargan la primera vez que se usan: una entrega sin archivos
+# .cpp, o cuyos embeddings ya están en la caché (con la revisión del modelo fijada o sin red),
+# no paga su tiempo de carga ni su memoria
+_recursos = {}
+_candado_recursos = threading.Lock()
+# Segundos que tomó cargar cada recurso, para el reporte de tiempos de arranque
+TIEMPOS_CARGA = {}
+
+def activar_modo_sin_red():
+    global MODO_SIN_RED
+    MODO_SIN_RED = True
+    os.environ['HF_HUB_OFFLINE'] = '1'
+    os.environ['TRANSFORMERS_OFFLINE'] = '1'
+
+if MODO_SIN_RED:
+    activar_modo_sin_red()
+
+def cargar_recurso(nombre, cargar):
+    with _candado_recursos:
+        if nombre not in _recursos:
+            inicio = time.perf_counter()
+            with etapa(f"carga: {nombre}"):
+                _recursos[nombre] = cargar()
+            TIEMPOS_CARGA[nombre] = time.perf_counter() - inicio
+        return _recursos[nombre]
+
+def _cargar_spacy():
+    import spacy
+    # Solo se usa la categoría gramatical (pos_): el parser, NER y lematizador sobran
+    return spacy.load(MODELO_SPACY, exclude=["parser", "ner", "lemmatizer"])
+
+def _cargar_codebert():
+    import torch
+    from transformers import AutoTokenizer, AutoModel
+    torch.set_num_threads(HILOS_TORCH)
+    tokenizer = AutoTokenizer.from_pretrained(NOMBRE_MODELO, revision=REVISION_MODELO, local_files_only=MODO_SIN_RED)
+    model = AutoModel.from_pretrained(NOMBRE_MODELO, revision=REVISION_MODELO, local_files_only=MODO_SIN_RED)
+    model.eval()
+    return tokenizer, model
+
+def _cargar_wordnet():
+    import nltk
+    try:
+        nltk.data.find('corpora/wordnet')
+    except LookupError:
+        if MODO_SIN_RED:
+            print("Advertencia: WordNet no está instalado y el modo sin red impide descargarlo; "
+                  "el valor semántico de los nombres será 0.")
+            return None
+        nltk.download('wordnet', quiet=True)
+    from nltk.corpus import wordnet
+    return wordnet
+
+def obtener_nlp():
+    return cargar_recurso('spaCy (es_core_news_sm)', _cargar_spacy)
+
+def obtener_modelo():
+    return cargar_recurso(f'CodeBERT ({NOMBRE_MODELO})', _cargar_codebert)
+
+def obtener_wordnet():
+    return cargar_recurso('WordNet (NLTK)', _cargar_wordnet)
 
 # Función para intentar leer un archivo con varias codificaciones comunes en América Latina
 def leer_archivo_con_codificacion(ruta_archivo):
-    codificaciones = ['utf-8', 'latin-1', 'ISO-8859-1']
-    for codificacion in codificaciones:
-        try:
-            with open(ruta_archivo, 'r', encoding=codificacion) as f:
-                return f.read(), None
-        except (UnicodeDecodeError, FileNotFoundError):
-            continue
-    return None, f"Error: No se pudo leer el archivo {ruta_archivo} con ninguna de las codificaciones conocidas."
+    contenido = leer_archivo(ruta_archivo)
+    if contenido is None:
+        return None, f"Error: No se pudo leer el archivo {ruta_archivo} con ninguna de las codificaciones conocidas."
+    return contenido, None
 
 # Función para extraer características de un archivo de código
-def extraer_caracteristicas(contenido):
-    nombres_var_func = re.findall(r'\b(?:int|float|double|char|bool|void)\s+(\w+)', contenido)
-    nombres_var_func += re.findall(r'\b(\w+)\s*\(', contenido)  # Extraer nombres de funciones
-    comentarios = re.findall(r'//.*?$|/\*.*?\*/', contenido, re.DOTALL | re.MULTILINE)
-    estructuras_control = re.findall(r'\b(if|else|for|while|switch|case)\b', contenido)
+def extraer_caracteristicas(contenido, hechos=None):
+    hechos = hechos if hechos is not None else extraer_hechos(contenido)
+    nombres_var_func = [d['nombre'] for d in hechos['declaraciones']
+                        if d['tipo'] in ('int', 'float', 'double', 'char', 'bool', 'void')]
+    nombres_var_func += hechos['llamadas']  # Nombres de funciones (definidas o llamadas)
+    comentarios = [c['texto'] for c in hechos['comentarios']]
+    estructuras_control = [c['token'] for c in hechos['control']
+                           if c['token'] in ('if', 'else', 'for', 'while', 'switch', 'case')]
     
     return {
         'nombres_var_func': nombres_var_func,
@@ -43,32 +132,247 @@ def extraer_caracteristicas(contenido):
         'contenido_completo': contenido
     }
 
-# Función para detectar código repetido dentro de un archivo
-def detectar_codigo_repetido(contenido):
+# Arreglo de sufijos de una secuencia de enteros por duplicación de prefijos (O(n log² n))
+def construir_arreglo_sufijos(secuencia):
+    n = len(secuencia)
+    rango = list(secuencia)
+    sufijos = list(range(n))
+    k = 1
+    while n > 1:
+        clave = lambda i: (rango[i], rango[i + k] if i + k < n else -1)
+        sufijos.sort(key=clave)
+        nuevo_rango = [0] * n
+        for anterior, actual in zip(sufijos, sufijos[1:]):
+            nuevo_rango[actual] = nuevo_rango[anterior] + (clave(anterior) != clave(actual))
+        rango = nuevo_rango
+        if rango[sufijos[-1]] == n - 1:
+            break
+        k *= 2
+    return sufijos
+
+# Prefijo común más largo entre sufijos consecutivos del arreglo (algoritmo de Kasai, O(n))
+def construir_lcp(secuencia, sufijos):
+    n = len(secuencia)
+    posicion = [0] * n
+    for i, sufijo in enumerate(sufijos):
+        posicion[sufijo] = i
+    lcp = [0] * n
+    h = 0
+    for i in range(n):
+        if posicion[i] > 0:
+            j = sufijos[posicion[i] - 1]
+            while i + h < n and j + h < n and secuencia[i + h] == secuencia[j + h]:
+                h += 1
+            lcp[posicion[i]] = h
+            if h > 0:
+                h -= 1
+        else:
+            h = 0
+    return lcp
+
+# Función para detectar código repetido dentro de un archivo: bloques de líneas consecutivas
+# que aparecen más de una vez, usando un arreglo de sufijos sobre los identificadores de línea
+@medido('código repetido')
+def detectar_codigo_repetido(contenido, maximo=5, longitud_minima=50):
+    contar(caracteres=len(contenido))
     lineas = contenido.split('\n')
-    bloques = []
-    for i in range(len(lineas)):
-        for j in range(i+1, len(lineas)):
-            bloque = '\n'.join(lineas[i:j])
-            if len(bloque) > 50 and contenido.count(bloque) > 1:
-                bloques.append((bloque, contenido.count(bloque)))
-    return sorted(bloques, key=lambda x: len(x[0]) * x[1], reverse=True)[:5]
+    ids_linea = {}
+    secuencia = [ids_linea.setdefault(linea, len(ids_linea)) for linea in lineas]
+    if len(secuencia) < 2:
+        return []
+    sufijos = construir_arreglo_sufijos(secuencia)
+    lcp = construir_lcp(secuencia, sufijos)
+
+    # Caracteres hasta el comienzo de cada línea: el largo de un bloque sin armar su texto
+    acumulado = [0]
+    for linea in lineas:
+        acumulado.append(acumulado[-1] + len(linea) + 1)
+
+    # Cada intervalo LCP (nodo interno del árbol de sufijos) es un bloque repetido máximo a la
+    # derecha: su longitud en líneas y el conjunto de posiciones donde aparece
+    bloques = {}
+    pila = [(0, 0)]
+    for i in range(1, len(sufijos) + 1):
+        actual = lcp[i] if i < len(sufijos) else 0
+        inicio = i - 1
+        while actual < pila[-1][0]:
+            longitud, inicio = pila.pop()
+            agregar_bloque_repetido(bloques, acumulado, secuencia, sufijos, lcp, inicio, i, longitud, longitud_minima)
+        if actual > pila[-1][0]:
+            pila.append((actual, inicio))
+
+    def puntaje(item):
+        (primera, longitud), repeticiones = item
+        return (acumulado[primera + longitud] - acumulado[primera] - 1) * repeticiones
+    mayores = sorted(bloques.items(), key=puntaje, reverse=True)[:maximo]
+    return [('\n'.join(lineas[primera:primera + longitud]), repeticiones)
+            for (primera, longitud), repeticiones in mayores]
+
+def agregar_bloque_repetido(bloques, acumulado, secuencia, sufijos, lcp, desde, hasta, longitud, longitud_minima):
+    # Las apariciones del bloque son los sufijos sufijos[desde:hasta] (un intervalo LCP).
+    # Se descarta si todas van precedidas por la misma línea: entonces el bloque es parte
+    # de otro más largo con las mismas repeticiones (no es máximo a la izquierda)
+    posiciones = sorted(sufijos[desde:hasta])
+    if all(p > 0 for p in posiciones) and len({secuencia[p - 1] for p in posiciones}) == 1:
+        return
+    if contar_sin_solapar(posiciones, longitud) > 1:
+        longitudes = {longitud}
+    else:
+        # Todas las apariciones se solapan (código periódico: A B A B A ...). Como en
+        # detector_clones.extender_clon, el bloque se recorta a la menor distancia entre
+        # apariciones consecutivas, donde ninguna se solapa; también se prueba el bloque
+        # más largo que todavía aparece dos veces sin solaparse (de la primera a la última)
+        longitudes = {min(b - a for a, b in zip(posiciones, posiciones[1:])), posiciones[-1] - posiciones[0]}
+    for recortada in longitudes:
+        # El bloque recortado puede aparecer en más lugares: los sufijos vecinos que comparten
+        # con él al menos esa cantidad de líneas
+        inicio, fin = desde, hasta
+        while inicio > 0 and lcp[inicio] >= recortada:
+            inicio -= 1
+        while fin < len(sufijos) and lcp[fin] >= recortada:
+            fin += 1
+        apariciones = sorted(sufijos[inicio:fin]) if (inicio, fin) != (desde, hasta) else posiciones
+        primera = apariciones[0]
+        if acumulado[primera + recortada] - acumulado[primera] - 1 <= longitud_minima:
+            continue
+        # Un bloque recortado puede coincidir con otro ya encontrado: se queda el de más repeticiones
+        repeticiones = contar_sin_solapar(apariciones, recortada)
+        if repeticiones > bloques.get((primera, recortada), 0):
+            bloques[(primera, recortada)] = repeticiones
+
+def contar_sin_solapar(posiciones, longitud):
+    # Igual que str.count: solo cuentan las apariciones que no se solapan
+    repeticiones = 0
+    fin_anterior = -1
+    for posicion in posiciones:
+        if posicion >= fin_anterior:
+            repeticiones += 1
+            fin_anterior = posicion + longitud
+    return repeticiones
+
+def leer_revision_local():
+    # Hash al que apunta REVISION_MODELO en la caché local de Hugging Face (None si aún no se descargó)
+    try:
+        from huggingface_hub.constants import HF_HUB_CACHE
+        ruta_ref = os.path.join(HF_HUB_CACHE, 'models--' + NOMBRE_MODELO.replace('/', '--'), 'refs', REVISION_MODELO)
+        with open(ruta_ref, 'r', encoding='utf-8') as f:
+            return f.read().strip() or None
+    except (ImportError, OSError):
+        return None
+
+# Revisión exacta del modelo (hash del commit en el hub) para la clave de la caché, resuelta una
+# vez por ejecución. Con una revisión fijada por hash, o sin red (se cargan los pesos a los que
+# apunta la caché local), no hace falta cargar el modelo; si no, es la de los pesos ya cargados.
+@lru_cache(maxsize=None)
+def obtener_revision_modelo():
+    if re.fullmatch(r'[0-9a-f]{40}', REVISION_MODELO):
+        return REVISION_MODELO
+    if MODO_SIN_RED:
+        revision = leer_revision_local()
+        if revision is not None:
+            return revision
+    _, model = obtener_modelo()
+    return getattr(model.config, '_commit_hash', None) or leer_revision_local() or REVISION_MODELO
+
+def clave_embedding(texto):
+    digest = hashlib.sha256()
+    for parte in (NOMBRE_MODELO, obtener_revision_modelo(), str(LONGITUD_VENTANA), str(SOLAPAMIENTO), texto):
+        digest.update(parte.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+def leer_embedding_cache(clave):
+    try:
+        return np.load(os.path.join(CACHE_EMBEDDINGS_DIR, f"{clave}.npy")).astype(float)
+    except (OSError, ValueError):
+        return None
+
+def guardar_embedding_cache(clave, embedding):
+    try:
+        os.makedirs(CACHE_EMBEDDINGS_DIR, exist_ok=True)
+        destino = os.path.join(CACHE_EMBEDDINGS_DIR, f"{clave}.npy")
+        temporal = f"{destino}.{os.getpid()}.tmp.npy"
+        np.save(temporal, embedding.astype(np.float32))
+        os.replace(temporal, destino)
+    except OSError as e:
+        print(f"Advertencia: No se pudo guardar el embedding en la caché: {e}")
+
+# Divide los tokens de un archivo en ventanas solapadas que caben en el modelo (con <s> y </s>)
+def dividir_en_ventanas(ids):
+    tokenizer, _ = obtener_modelo()
+    capacidad = LONGITUD_VENTANA - tokenizer.num_special_tokens_to_add()
+    paso = capacidad - SOLAPAMIENTO
+    return [tokenizer.build_inputs_with_special_tokens(ids[inicio:inicio + capacidad])
+            for inicio in range(0, max(len(ids) - SOLAPAMIENTO, 1), paso)]
+
+# Media de los estados ocultos de cada ventana, procesando TAMANO_LOTE ventanas por pasada
+@medido('CodeBERT: inferencia')
+def calcular_embeddings_ventanas(ventanas):
+    contar(tokens=sum(len(ventana) for ventana in ventanas))
+    import torch
+    tokenizer, model = obtener_modelo()
+    resultado = [None] * len(ventanas)
+    # Ordenar por longitud reduce el relleno dentro de cada lote
+    orden = sorted(range(len(ventanas)), key=lambda i: len(ventanas[i]))
+    for inicio in range(0, len(orden), TAMANO_LOTE):
+        indices = orden[inicio:inicio + TAMANO_LOTE]
+        lote = tokenizer.pad({'input_ids': [ventanas[i] for i in indices]}, return_tensors="pt")
+        with torch.inference_mode():
+            estados = model(**lote).last_hidden_state
+        mascara = lote['attention_mask'].unsqueeze(-1).to(estados.dtype)
+        medias = (estados * mascara).sum(dim=1) / mascara.sum(dim=1)
+        for i, media in zip(indices, medias.numpy()):
+            resultado[i] = media
+    return resultado
+
+# Función para obtener embeddings de CodeBERT de varios textos a la vez. Los textos ya
+# calculados con el mismo modelo se leen de la caché sin ejecutar el modelo.
+@medido('CodeBERT: embeddings')
+def obtener_embeddings_lote(textos):
+    embeddings = [None] * len(textos)
+    claves = [clave_embedding(texto) for texto in textos]
+    pendientes = {}
+    for i, clave in enumerate(claves):
+        embeddings[i] = leer_embedding_cache(clave)
+        if embeddings[i] is None:
+            pendientes.setdefault(clave, []).append(i)
+    contar(textos=len(textos), aciertos_cache=len(textos) - sum(len(indices) for indices in pendientes.values()))
+    if not pendientes:
+        return embeddings
+
+    tokenizer, _ = obtener_modelo()
+    ventanas = []
+    ventanas_por_clave = {}
+    for clave, indices in pendientes.items():
+        ids = tokenizer(textos[indices[0]], add_special_tokens=False, verbose=False)['input_ids']
+        propias = dividir_en_ventanas(ids)
+        ventanas_por_clave[clave] = range(len(ventanas), len(ventanas) + len(propias))
+        ventanas.extend(propias)
+
+    medias = calcular_embeddings_ventanas(ventanas)
+    for clave, indices in pendientes.items():
+        rango = ventanas_por_clave[clave]
+        # Promedio de las ventanas ponderado por su número de tokens
+        embedding = np.average([medias[j] for j in rango], axis=0,
+                               weights=[len(ventanas[j]) for j in rango]).astype(float)
+        guardar_embedding_cache(clave, embedding)
+        for i in indices:
+            embeddings[i] = embedding
+    return embeddings
 
 # Función para obtener embeddings de CodeBERT para un fragmento de texto
 def obtener_embeddings(texto):
-    inputs = tokenizer(texto, return_tensors="pt", truncation=True, padding=True, max_length=512)
-    with torch.no_grad():
-        outputs = model(**inputs)
-    return outputs.last_hidden_state.mean(dim=1).squeeze().numpy().astype(float)  # Convertir a float
+    return obtener_embeddings_lote([texto])[0]
 
 # Función para analizar los nombres de las variables
 def analizar_nombre_variable(nombre):
     palabras = re.findall(r'[A-Z]?[a-z]+|[A-Z]+(?=[A-Z][a-z]|\d|\W|$)|\d+', nombre)
     significativo = len(palabras) > 1 or (len(palabras) == 1 and len(palabras[0]) > 2)
     
+    wordnet = obtener_wordnet()
     valor_semantico = 0
     for palabra in palabras:
-        synsets = wordnet.synsets(palabra.lower())
+        synsets = wordnet.synsets(palabra.lower()) if wordnet is not None else None
         if synsets:
             valor_semantico += len(synsets)
     
@@ -81,7 +385,9 @@ def analizar_nombre_variable(nombre):
 
 # Función para analizar la significatividad de las variables usando SpaCy
 def analizar_significado_variable(nombre):
-    doc = nlp(nombre)
+    return clasificar_significado(obtener_nlp()(nombre))
+
+def clasificar_significado(doc):
     if len(doc) == 0:
         return "No significativo"
     elif len(doc) == 1:
@@ -89,97 +395,253 @@ def analizar_significado_variable(nombre):
     else:
         return "Significativo"
 
+# Caché LRU nombre -> análisis, compartida por todos los archivos de la ejecución y guardada en disco
+_identificadores = OrderedDict()
+_candado_identificadores = threading.Lock()
+_identificadores_cargados = False
+
+def version_recursos_identificadores():
+    # Si cambia el modelo de spaCy o la disponibilidad de WordNet, el análisis guardado deja de valer
+    try:
+        version_spacy = metadata.version(MODELO_SPACY.replace('_', '-'))
+    except metadata.PackageNotFoundError:
+        version_spacy = 'desconocida'
+    return f"{MODELO_SPACY}=={version_spacy}"
+
+def cargar_cache_identificadores():
+    global _identificadores_cargados
+    if _identificadores_cargados:
+        return
+    _identificadores_cargados = True
+    try:
+        with open(CACHE_IDENTIFICADORES, 'r', encoding='utf-8') as f:
+            datos = json.load(f)
+    except (OSError, ValueError):
+        return
+    if datos.get('version') == version_recursos_identificadores():
+        _identificadores.update(datos.get('identificadores', {}))
+
+def guardar_cache_identificadores():
+    try:
+        os.makedirs(os.path.dirname(CACHE_IDENTIFICADORES), exist_ok=True)
+        temporal = f"{CACHE_IDENTIFICADORES}.{os.getpid()}.tmp"
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump({'version': version_recursos_identificadores(), 'identificadores': _identificadores},
+                      f, ensure_ascii=False)
+        os.replace(temporal, CACHE_IDENTIFICADORES)
+    except OSError as e:
+        print(f"Advertencia: No se pudo guardar la caché de identificadores: {e}")
+
+# Analiza cada nombre distinto una sola vez: los que no están en la caché pasan juntos por
+# nlp.pipe en lotes, en lugar de una llamada completa a nlp() por cada aparición
+@medido('spaCy: identificadores')
+def analizar_identificadores(nombres):
+    with _candado_identificadores:
+        cargar_cache_identificadores()
+        pendientes = [nombre for nombre in dict.fromkeys(nombres) if nombre not in _identificadores]
+        contar(textos=len(pendientes), aciertos_cache=len(set(nombres)) - len(pendientes))
+        if pendientes:
+            docs = obtener_nlp().pipe(pendientes, batch_size=TAMANO_LOTE_SPACY)
+            for nombre, doc in zip(pendientes, docs):
+                _identificadores[nombre] = {
+                    'significado': clasificar_significado(doc),
+                    'analisis': analizar_nombre_variable(nombre)
+                }
+        resultado = {}
+        for nombre in nombres:
+            _identificadores.move_to_end(nombre)
+            resultado[nombre] = _identificadores[nombre]
+        while len(_identificadores) > MAX_IDENTIFICADORES:
+            _identificadores.popitem(last=False)
+        # Sin WordNet el valor semántico queda en 0: ese resultado no se guarda para otras ejecuciones
+        if pendientes and obtener_wordnet() is not None:
+            guardar_cache_identificadores()
+        return resultado
+
 # Función para calcular la longitud promedio de las funciones
-def calcular_longitud_promedio_funciones(contenido):
-    funciones = re.findall(r'\b(\w+)\s*\([^)]*\)\s*{[^}]*}', contenido)  # Encuentra funciones
-    lineas = contenido.split('\n')
+def calcular_longitud_promedio_funciones(contenido, hechos=None):
+    hechos = hechos if hechos is not None else extraer_hechos(contenido)
+    funciones = hechos['funciones']
     total_funciones = len(funciones)
-    total_lineas = len(lineas)
+    total_lineas = sum(f['linea_fin'] - f['linea_inicio'] + 1 for f in funciones)
     longitud_promedio = total_lineas / total_funciones if total_funciones > 0 else 0
     return longitud_promedio, total_funciones
 
 # Función para analizar los archivos de un proyecto individual
 def analizar_archivos(ruta_src):
+    rutas = listar_archivos(ruta_src, ('.cpp',))  # Asumiendo que los archivos de código son C++
+    # Solo se analizan los archivos que cambiaron; el resto sale del almacén de resultados
+    version = f"{VERSION_ANALISIS}-{NOMBRE_MODELO}@{obtener_revision_modelo()}-{version_recursos_identificadores()}"
+    if MODO_SIN_RED:
+        version += "-sin-red"  # Sin WordNet el análisis de nombres es distinto
+    por_ruta = resultados_por_archivo('plagio', version, rutas, analizar_rutas)
+
+    resultados = {}
+    for ruta_completa in rutas:
+        if por_ruta[ruta_completa] is not None:
+            resultados[os.path.basename(ruta_completa)] = {'ruta': ruta_completa, **por_ruta[ruta_completa]}
+    return resultados
+
+def analizar_rutas(rutas):
     resultados = {}
+    contenidos = {}
+    nombres_por_archivo = {}
     
-    for raiz, _, ficheros in os.walk(ruta_src):
-        for fichero in ficheros:
-            if fichero.endswith('.cpp'):  # Asumiendo que los archivos de código son C++
-                ruta_completa = os.path.join(raiz, fichero)
-                contenido, error = leer_archivo_con_codificacion(ruta_completa)
-                
-                if error:
-                    print(f"Error al leer el archivo {ruta_completa}: {error}")
-                    continue  # Si hay un error, se omite este archivo
-                
-                # Extraer características del archivo
-                caracteristicas = extraer_caracteristicas(contenido)
-                codigo_repetido = detectar_codigo_repetido(contenido)
-                embedding = obtener_embeddings(contenido)
-                
-                # Analizar las variables y funciones
-                analisis_variables = {var: {
-                    'significado': analizar_significado_variable(var),
-                    'analisis': analizar_nombre_variable(var)
-                } for var in caracteristicas['nombres_var_func']}
-                
-                # Calcular la longitud promedio de las funciones
-                longitud_promedio, total_funciones = calcular_longitud_promedio_funciones(contenido)
-                
-                resultados[fichero] = {
-                    'ruta': ruta_completa,
-                    'caracteristicas': caracteristicas,
-                    'codigo_repetido': codigo_repetido,
-                    'embedding': embedding.tolist(),  # Convertir a lista de floats
-                    'analisis_variables': analisis_variables,
-                    'longitud_promedio_funciones': longitud_promedio,
-                    'total_funciones': total_funciones
-                }
+    for ruta_completa in rutas:
+        contenido, error = leer_archivo_con_codificacion(ruta_completa)
+        
+        if error:
+            print(f"Error al leer el archivo {ruta_completa}: {error}")
+            continue  # Si hay un error, se omite este archivo
+        
+        # Extraer características del archivo
+        hechos = hechos_de_archivo(ruta_completa)
+        caracteristicas = extraer_caracteristicas(contenido, hechos)
+        codigo_repetido = detectar_codigo_repetido(contenido)
+        contenidos[ruta_completa] = contenido
+        
+        # Calcular la longitud promedio de las funciones
+        longitud_promedio, total_funciones = calcular_longitud_promedio_funciones(contenido, hechos)
+        
+        resultados[ruta_completa] = {
+            'caracteristicas': caracteristicas,
+            'codigo_repetido': codigo_repetido,
+            'embedding': None,
+            'analisis_variables': None,
+            'longitud_promedio_funciones': longitud_promedio,
+            'total_funciones': total_funciones
+        }
+        nombres_por_archivo[ruta_completa] = caracteristicas['nombres_var_func']
+    
+    # Analizar las variables y funciones de todos los archivos de una vez, sin repetir nombres
+    analisis = analizar_identificadores([nombre for nombres in nombres_por_archivo.values() for nombre in nombres])
+    for ruta_completa, nombres in nombres_por_archivo.items():
+        resultados[ruta_completa]['analisis_variables'] = {nombre: analisis[nombre] for nombre in nombres}
+    
+    # Los embeddings de todos los archivos se calculan juntos, en lotes y con caché
+    embeddings = obtener_embeddings_lote(list(contenidos.values()))
+    for ruta_completa, embedding in zip(contenidos, embeddings):
+        resultados[ruta_completa]['embedding'] = embedding.tolist()  # Convertir a lista de floats
     
     return resultados
 
 # Generar un reporte detallado sobre el análisis de código
-def generar_reporte(resultados, ruta_salida):
-    with open(ruta_salida, 'w', encoding='utf-8') as f:
-        f.write("# Reporte de Análisis de Código\n\n")
-        for archivo, datos in resultados.items():
-            f.write(f"## Archivo: {archivo}\n\n")
-            f.write(f"Ruta: {datos['ruta']}\n\n")
-            
-            f.write("### Análisis de variables:\n")
-            for var, analisis in datos['analisis_variables'].items():
-                f.write(f"- {var}: {analisis['significado']}\n")
-                f.write(f"  - Significativo: {'Sí' if analisis['analisis']['significativo'] else 'No'}\n")
-                f.write(f"  - Valor semántico: {analisis['analisis']['valor_semantico']}\n")
-            
-            f.write("\n### Estructuras de control:\n")
-            for estructura in datos['caracteristicas']['estructuras_control']:
-                f.write(f"- {estructura}\n")
-            
-            f.write("\n### Código repetido:\n")
-            for bloque, count in datos['codigo_repetido']:
-                f.write(f"- Bloque repetido {count} veces:\n```\n{bloque}\n```\n")
-            
-            f.write("\n### Longitud promedio de funciones:\n")
-            f.write(f"- Longitud promedio de funciones: {datos['longitud_promedio_funciones']:.2f} líneas\n")
-            f.write(f"- Total de funciones: {datos['total_funciones']}\n")
-            
-            f.write("\n---\n\n")
+def generar_reporte(resultados, similitud=None, tiempos=None):
+    yield "# Reporte de Análisis de Código\n\n"
+    if not resultados:
+        yield "No se encontraron archivos .cpp para analizar.\n\n"
+    for archivo, datos in resultados.items():
+        yield f"## Archivo: {archivo}\n\n"
+        yield f"Ruta: {datos['ruta']}\n\n"
+        
+        yield "### Análisis de variables:\n"
+        for var, analisis in datos['analisis_variables'].items():
+            yield f"- {var}: {analisis['significado']}\n"
+            yield f"  - Significativo: {'Sí' if analisis['analisis']['significativo'] else 'No'}\n"
+            yield f"  - Valor semántico: {analisis['analisis']['valor_semantico']}\n"
+        
+        yield "\n### Estructuras de control:\n"
+        for estructura in datos['caracteristicas']['estructuras_control']:
+            yield f"- {estructura}\n"
+        
+        yield "\n### Código repetido:\n"
+        for bloque, count in datos['codigo_repetido']:
+            yield f"- Bloque repetido {count} veces:\n```\n{bloque}\n```\n"
+        
+        yield "\n### Longitud promedio de funciones:\n"
+        yield f"- Longitud promedio de funciones: {datos['longitud_promedio_funciones']:.2f} líneas\n"
+        yield f"- Total de funciones: {datos['total_funciones']}\n"
+        
+        yield "\n---\n\n"
 
-# Función principal para iniciar el análisis de un proyecto
-def main():
-    ruta_proyecto = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if tiempos:
+        yield "## Tiempos de arranque\n\n"
+        for recurso, segundos in tiempos.items():
+            yield f"- {recurso}: {segundos:.2f} s\n"
+        yield "\n"
+
+    if similitud is None:
+        return
+    yield f"## Similitud entre archivos (coseno de embeddings ≥ {UMBRAL_SIMILITUD})\n\n"
+    if not similitud['pares']:
+        yield "- No hay pares de archivos por encima del umbral.\n"
+    for valor, archivo_a, archivo_b in similitud['pares']:
+        yield f"- {archivo_a} ↔ {archivo_b}: {valor:.4f}\n"
+    if similitud['historico'] is not None:
+        yield "\n## Entregas similares en el archivo histórico\n\n"
+        if not similitud['historico']:
+            yield "- Sin coincidencias por encima del umbral.\n"
+        for valor, entrega in similitud['historico']:
+            yield f"- {entrega}: {valor:.4f}\n"
+
+def datos_para_registro(datos):
+    # El embedding y el texto completo del archivo ocupan más que todo lo demás junto y no van al registro
+    caracteristicas = {clave: valor for clave, valor in datos['caracteristicas'].items() if clave != 'contenido_completo'}
+    return {**{clave: valor for clave, valor in datos.items() if clave != 'embedding'}, 'caracteristicas': caracteristicas}
+
+# Compara los archivos de la entrega entre sí y la entrega completa contra el índice histórico
+def comparar_embeddings(resultados, nombre_entrega):
+    if not resultados:
+        return None
+    archivos = list(resultados)
+    embeddings = [resultados[archivo]['embedding'] for archivo in archivos]
+    historico = None
+    indice = cargar_indice()
+    if indice is not None:
+        historico = consultar_indice(indice, embedding_de_entrega(embeddings), umbral=UMBRAL_SIMILITUD,
+                                     excluir=(COHORTE, nombre_entrega))
+    return {'pares': pares_mas_similares(embeddings, archivos), 'historico': historico}
+
+# Analiza el proyecto ubicado en ruta_proyecto y escribe el reporte en ruta_salida
+def ejecutar_analisis(ruta_proyecto, ruta_salida):
     ruta_src = os.path.join(ruta_proyecto, 'src')
-    ruta_salida = os.path.join(ruta_proyecto, 'output')
     os.makedirs(ruta_salida, exist_ok=True)
 
-    resultados = analizar_archivos(ruta_src)
+    # Revisión previa barata: sin archivos .cpp no hay nada que analizar ni modelos que cargar
+    if not listar_archivos(ruta_src, ('.cpp',)):
+        print(f"No se encontraron archivos .cpp en {ruta_src}; no se cargan los modelos.")
+        resultados, similitud = {}, None
+    else:
+        resultados = analizar_archivos(ruta_src)
+        similitud = comparar_embeddings(resultados, nombre_entrega(ruta_proyecto))
     
+    tiempos = {'Importación del módulo': TIEMPO_IMPORTACION, **TIEMPOS_CARGA}
+    imprimir_tiempos_carga(tiempos)
+
+    registro = escribir_registro(ruta_salida, 'plagio', nombre_entrega(ruta_proyecto), {
+        'archivos': {archivo: datos_para_registro(datos) for archivo, datos in resultados.items()},
+        'similitud': similitud,
+        'tiempos': tiempos
+    })
+
     # Generar el reporte de análisis
     ruta_reporte = os.path.join(ruta_salida, f"reporte_analisis_codigo_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md")
-    generar_reporte(resultados, ruta_reporte)
+    escribir_markdown(ruta_reporte, generar_reporte(registro['archivos'], registro['similitud'], registro['tiempos']))
 
     print(f"Análisis completado. Reporte guardado en {ruta_reporte}")
+    return ruta_reporte
+
+def imprimir_tiempos_carga(tiempos):
+    print("⏱️ Tiempos de arranque:")
+    for recurso, segundos in tiempos.items():
+        print(f"   {recurso}: {segundos:.2f} s")
+    if len(tiempos) == 1:
+        print("   (no fue necesario cargar ningún modelo)")
+
+TIEMPO_IMPORTACION = time.perf_counter() - _INICIO_IMPORTACION
+
+# Función principal para iniciar el análisis de un proyecto
+def main():
+    parser = argparse.ArgumentParser(description="Análisis de código y similitud con CodeBERT, spaCy y WordNet.")
+    parser.add_argument('--offline', action='store_true',
+                        help="No intenta descargar modelos ni datos; usa solo lo que ya está instalado "
+                             "(equivale a PLAGIO_OFFLINE=1).")
+    args = parser.parse_args()
+    if args.offline:
+        activar_modo_sin_red()
+
+    ruta_proyecto = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    ejecutar_analisis(ruta_proyecto, os.path.join(ruta_proyecto, 'output'))
 
 if __name__ == "__main__":
     main()
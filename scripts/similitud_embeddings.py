@@ -0,0 +1,227 @@
+import os
+import sys
+import heapq
+import argparse
+from datetime import datetime
+
+import numpy as np
+
+from registros import escribir_markdown, escribir_registro, nombre_entrega
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUTA_INDICE = os.environ.get('PLAGIO_INDICE_EMBEDDINGS',
+                             os.path.join(PROJECT_ROOT, '.cache', 'indice_embeddings.npz'))
+# Cohorte de la entrega analizada por run_plagiarism_1: su propia copia en el índice no cuenta
+COHORTE = os.environ.get('PLAGIO_COHORTE', '')
+
+UMBRAL_SIMILITUD = 0.95
+TOP_K = 20
+# Filas por bloque en el producto de matrices: la memoria es O(TAMANO_BLOQUE²) y no O(n²)
+TAMANO_BLOQUE = 1024
+# Hashing sensible a la localidad con hiperplanos aleatorios: TABLAS_LSH tablas de BITS_LSH bits
+TABLAS_LSH = 8
+BITS_LSH = 16
+SEMILLA_LSH = 20240901
+
+def matriz_normalizada(embeddings):
+    """Apila los embeddings en una matriz float32 con filas de norma 1 (el producto punto es el coseno)."""
+    matriz = np.asarray(embeddings, dtype=np.float32)
+    if matriz.ndim == 1:
+        matriz = matriz.reshape(1, -1)
+    normas = np.linalg.norm(matriz, axis=1, keepdims=True)
+    normas[normas == 0] = 1.0
+    return matriz / normas
+
+def pares_mas_similares(embeddings, etiquetas, umbral=UMBRAL_SIMILITUD, top_k=TOP_K, grupos=None,
+                        tamano_bloque=TAMANO_BLOQUE):
+    """
+    Devuelve los top_k pares (i < j) con similitud coseno >= umbral como
+    [(similitud, etiqueta_i, etiqueta_j)], de mayor a menor. Si se dan grupos (por ejemplo, la
+    entrega de cada archivo), se ignoran los pares del mismo grupo.
+    """
+    matriz = matriz_normalizada(embeddings)
+    n = matriz.shape[0]
+    grupos = np.asarray(grupos) if grupos is not None else None
+    mejores = []  # montículo de mínimos con los top_k pares vistos hasta ahora
+    for inicio_i in range(0, n, tamano_bloque):
+        bloque_i = matriz[inicio_i:inicio_i + tamano_bloque]
+        for inicio_j in range(inicio_i, n, tamano_bloque):
+            similitudes = bloque_i @ matriz[inicio_j:inicio_j + tamano_bloque].T
+            filas = np.arange(inicio_i, inicio_i + similitudes.shape[0])[:, None]
+            columnas = np.arange(inicio_j, inicio_j + similitudes.shape[1])[None, :]
+            validos = (columnas > filas) & (similitudes >= umbral)
+            if grupos is not None:
+                validos &= grupos[filas] != grupos[columnas]
+            # Con el montículo lleno solo interesan los pares que superan al peor de los guardados
+            if len(mejores) == top_k:
+                validos &= similitudes > mejores[0][0]
+            filas_validas, columnas_validas = np.nonzero(validos)
+            valores = similitudes[filas_validas, columnas_validas]
+            if valores.size > top_k:
+                seleccion = np.argpartition(-valores, top_k - 1)[:top_k]
+                filas_validas, columnas_validas, valores = filas_validas[seleccion], columnas_validas[seleccion], valores[seleccion]
+            for a, b, valor in zip(filas_validas, columnas_validas, valores):
+                par = (float(valor), inicio_i + int(a), inicio_j + int(b))
+                if len(mejores) < top_k:
+                    heapq.heappush(mejores, par)
+                elif par[0] > mejores[0][0]:
+                    heapq.heapreplace(mejores, par)
+    return [(similitud, etiquetas[i], etiquetas[j]) for similitud, i, j in sorted(mejores, reverse=True)]
+
+def nuevo_indice(dimension, tablas=TABLAS_LSH, bits=BITS_LSH, semilla=SEMILLA_LSH):
+    generador = np.random.default_rng(semilla)
+    return {
+        'planos': generador.standard_normal((tablas, bits, dimension)).astype(np.float32),
+        'vectores': np.zeros((0, dimension), dtype=np.float32),
+        'firmas': np.zeros((0, tablas), dtype=np.int64),
+        'etiquetas': np.zeros((0,), dtype=str),
+        'cohortes': np.zeros((0,), dtype=str),
+    }
+
+def calcular_firmas(indice, matriz):
+    # Un bit por hiperplano (lado en que cae el vector); los bits de cada tabla forman un entero
+    bits = np.einsum('tbd,nd->ntb', indice['planos'], matriz) > 0
+    pesos = 1 << np.arange(bits.shape[2], dtype=np.int64)
+    return (bits * pesos).sum(axis=2)
+
+def cargar_indice(ruta_indice=RUTA_INDICE):
+    if not os.path.exists(ruta_indice):
+        return None
+    with np.load(ruta_indice, allow_pickle=False) as datos:
+        indice = {clave: datos[clave] for clave in ('planos', 'vectores', 'firmas', 'etiquetas')}
+        # Los índices anteriores no guardaban la cohorte de cada entrega
+        indice['cohortes'] = datos['cohortes'] if 'cohortes' in datos else np.full(len(indice['etiquetas']), '')
+    return indice
+
+def guardar_indice(indice, ruta_indice=RUTA_INDICE):
+    directorio = os.path.dirname(ruta_indice)
+    if directorio:
+        os.makedirs(directorio, exist_ok=True)
+    temporal = f"{ruta_indice}.{os.getpid()}.tmp.npz"
+    np.savez(temporal, **indice)
+    os.replace(temporal, ruta_indice)
+
+def agregar_al_indice(indice, embeddings, etiquetas, cohorte=''):
+    """
+    Agrega los vectores dados como entregas de la cohorte. Una entrega es el par (cohorte,
+    etiqueta): se reemplaza solo si ya estaba en la misma cohorte, no la de otra con el mismo nombre.
+    """
+    matriz = matriz_normalizada(embeddings)
+    etiquetas = np.asarray(etiquetas, dtype=str)
+    conservar = ~(np.isin(indice['etiquetas'], etiquetas) & (indice['cohortes'] == cohorte))
+    indice['vectores'] = np.vstack([indice['vectores'][conservar], matriz])
+    indice['firmas'] = np.vstack([indice['firmas'][conservar], calcular_firmas(indice, matriz)])
+    indice['etiquetas'] = np.concatenate([indice['etiquetas'][conservar], etiquetas])
+    indice['cohortes'] = np.concatenate([indice['cohortes'][conservar], np.full(len(etiquetas), cohorte)])
+    return indice
+
+def nombre_en_indice(cohorte, etiqueta):
+    return f"{cohorte}/{etiqueta}" if cohorte else etiqueta
+
+def consultar_indice(indice, embedding, top_k=10, umbral=0.0, excluir=None):
+    """
+    Vecinos más cercanos aproximados: solo se calcula el coseno exacto con los vectores que
+    comparten la firma en al menos una tabla LSH, no con todo el archivo histórico. 'excluir'
+    es un par (cohorte, etiqueta), y cada vecino se nombra como "cohorte/etiqueta".
+    """
+    consulta = matriz_normalizada(embedding)
+    firma = calcular_firmas(indice, consulta)[0]
+    candidatos = np.nonzero((indice['firmas'] == firma).any(axis=1))[0]
+    if excluir is not None:
+        cohorte, etiqueta = excluir
+        candidatos = candidatos[(indice['cohortes'][candidatos] != cohorte) | (indice['etiquetas'][candidatos] != etiqueta)]
+    if candidatos.size == 0:
+        return []
+    similitudes = indice['vectores'][candidatos] @ consulta[0]
+    orden = np.argsort(-similitudes)[:top_k]
+    return [(float(similitudes[k]), nombre_en_indice(str(indice['cohortes'][candidatos[k]]),
+                                                     str(indice['etiquetas'][candidatos[k]])))
+            for k in orden if similitudes[k] >= umbral]
+
+def embedding_de_entrega(embeddings_archivos):
+    # Una entrega se representa con la media de los embeddings normalizados de sus archivos
+    return matriz_normalizada(embeddings_archivos).mean(axis=0)
+
+def embeddings_de_lote(ruta_lote):
+    # Importación diferida: cargar CodeBERT solo hace falta si hay que calcular embeddings
+    from cargador_fuentes import leer_archivo, listar_archivos
+    from run_plagiarism_1 import obtener_embeddings_lote
+
+    entregas, textos, duenos = [], [], []
+    for nombre in sorted(os.listdir(ruta_lote)):
+        ruta_src = os.path.join(ruta_lote, nombre, 'src')
+        if not os.path.isdir(ruta_src):
+            continue
+        for ruta in listar_archivos(ruta_src, ('.cpp',)):
+            contenido = leer_archivo(ruta)
+            if contenido is not None:
+                textos.append(contenido)
+                duenos.append(nombre)
+        entregas.append(nombre)
+
+    embeddings = obtener_embeddings_lote(textos)
+    por_entrega = {}
+    for nombre, embedding in zip(duenos, embeddings):
+        por_entrega.setdefault(nombre, []).append(embedding)
+    nombres = [nombre for nombre in entregas if nombre in por_entrega]
+    return nombres, [embedding_de_entrega(por_entrega[nombre]) for nombre in nombres]
+
+def generar_reporte(registro):
+    umbral = registro['umbral']
+    yield "# 🧬 Reporte de Similitud de Embeddings entre Entregas\n\n"
+    yield f"📅 Fecha de análisis: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n"
+    yield f"## 👥 Pares más similares del lote (similitud ≥ {umbral:.2f})\n\n"
+    if registro['pares']:
+        yield "| Entrega | Entrega | Similitud |\n"
+        yield "|:--------|:--------|----------:|\n"
+        for similitud, a, b in registro['pares']:
+            yield f"| {a} | {b} | {similitud:.4f} |\n"
+    else:
+        yield "✅ Ningún par supera el umbral.\n"
+    if registro['consultas']:
+        yield "\n## 🗄️ Entregas similares en el archivo histórico\n\n"
+        for nombre, vecinos in registro['consultas'].items():
+            similares = ', '.join(f"{etiqueta} ({similitud:.4f})" for similitud, etiqueta in vecinos)
+            yield f"- **{nombre}**: {similares or 'sin coincidencias'}\n"
+
+def main():
+    parser = argparse.ArgumentParser(description="Similitud de embeddings CodeBERT entre entregas y contra un índice histórico.")
+    parser.add_argument('lote', help="Directorio con una carpeta por entrega (cada una con su 'src/').")
+    parser.add_argument('--umbral', type=float, default=UMBRAL_SIMILITUD)
+    parser.add_argument('--top', type=int, default=TOP_K)
+    parser.add_argument('--indice', default=RUTA_INDICE, help="Archivo .npz del índice de vecinos aproximados.")
+    parser.add_argument('--indexar', action='store_true', help="Agrega las entregas del lote al índice histórico.")
+    parser.add_argument('--cohorte', default='', help="Cohorte del lote (por ejemplo, 2024-2): una entrega del índice "
+                                                      "es el par cohorte/nombre de carpeta.")
+    parser.add_argument('--salida', default=os.path.join(PROJECT_ROOT, 'output'))
+    args = parser.parse_args()
+
+    nombres, embeddings = embeddings_de_lote(args.lote)
+    if not nombres:
+        print(f"No se encontraron entregas con archivos .cpp en {args.lote}")
+        sys.exit(1)
+
+    pares = pares_mas_similares(embeddings, nombres, args.umbral, args.top)
+    consultas = {}
+    indice = cargar_indice(args.indice)
+    if indice is not None:
+        for nombre, embedding in zip(nombres, embeddings):
+            consultas[nombre] = consultar_indice(indice, embedding, args.top, args.umbral, excluir=(args.cohorte, nombre))
+    if args.indexar:
+        indice = indice if indice is not None else nuevo_indice(len(embeddings[0]))
+        guardar_indice(agregar_al_indice(indice, embeddings, nombres, args.cohorte), args.indice)
+        print(f"🗄️ {len(nombres)} entregas agregadas al índice {args.indice}")
+
+    registro = escribir_registro(args.salida, 'embeddings', nombre_entrega(args.lote), {
+        'lote': os.path.abspath(args.lote),
+        'cohorte': args.cohorte,
+        'umbral': args.umbral,
+        'pares': pares,
+        'consultas': consultas
+    })
+    ruta_reporte = os.path.join(args.salida, f"REPORTE_SIMILITUD_EMBEDDINGS_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md")
+    escribir_markdown(ruta_reporte, generar_reporte(registro))
+    print(f"Reporte generado: {ruta_reporte}")
+
+if __name__ == "__main__":
+    main()
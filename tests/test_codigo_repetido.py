@@ -0,0 +1,57 @@
+import os
+import sys
+import random
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts'))
+
+from run_plagiarism_1 import detectar_codigo_repetido, contar_sin_solapar
+
+LONGITUD_MINIMA = 50
+
+def repetidos_fuerza_bruta(lineas):
+    # Todos los bloques de líneas consecutivas de más de LONGITUD_MINIMA caracteres que
+    # aparecen más de una vez sin solaparse, con su cantidad de apariciones
+    repetidos = {}
+    for i in range(len(lineas)):
+        for j in range(i + 1, len(lineas) + 1):
+            bloque = lineas[i:j]
+            texto = '\n'.join(bloque)
+            if len(texto) <= LONGITUD_MINIMA:
+                continue
+            posiciones = [k for k in range(len(lineas) - len(bloque) + 1) if lineas[k:k + len(bloque)] == bloque]
+            repeticiones = contar_sin_solapar(posiciones, len(bloque))
+            if repeticiones > 1:
+                repetidos[texto] = repeticiones
+    return repetidos
+
+def lineas_al_azar(generador):
+    alfabeto = [''.join(generador.choice('abcdef') for _ in range(generador.randint(5, 30)))
+                for _ in range(generador.randint(1, 5))]
+    lineas = [generador.choice(alfabeto) for _ in range(generador.randint(1, 25))]
+    if generador.random() < 0.3:
+        # Código periódico (A B A B A ...): las apariciones del bloque máximo se solapan
+        periodo = lineas[:generador.randint(1, 4)]
+        lineas = (periodo * 25)[:generador.randint(2, 25)]
+    return lineas
+
+class TestCodigoRepetido(unittest.TestCase):
+    def test_periodico(self):
+        # A B A B ... A: las apariciones del bloque repetido más largo se solapan, y solo los
+        # bloques de 6 líneas o más superan los 50 caracteres
+        lineas = ['  i++', '  total += i'] * 6 + ['  i++']
+        bloques = detectar_codigo_repetido('\n'.join(lineas))
+        self.assertIn(('\n'.join(lineas[:6]), 2), bloques)
+
+    def test_contra_fuerza_bruta(self):
+        generador = random.Random(12)
+        for _ in range(500):
+            lineas = lineas_al_azar(generador)
+            esperados = repetidos_fuerza_bruta(lineas)
+            bloques = detectar_codigo_repetido('\n'.join(lineas), longitud_minima=LONGITUD_MINIMA)
+            self.assertEqual(bool(bloques), bool(esperados), lineas)
+            for bloque, repeticiones in bloques:
+                self.assertEqual(repeticiones, esperados.get(bloque), lineas)
+
+if __name__ == '__main__':
+    unittest.main()
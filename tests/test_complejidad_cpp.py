@@ -0,0 +1,119 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts'))
+
+from hechos_cpp import extraer_hechos
+from complejidad_cpp import complejidad_de_hechos
+
+# (descripción, código, {función: (ciclomática, cognitiva, anidamiento)})
+CASOS = [
+    ("estructuras anidadas", """int f(int x) {
+    if (x > 0) {
+        for (int i = 0; i < x; i++) {
+            while (x) { x--; }
+        }
+    }
+    { int y = 0; }
+    return x;
+}
+int g() { return 1; }
+""", {'f': (4, 6, 3), 'g': (1, 0, 0)}),
+
+    # El if de un "else if" no suma anidamiento ni se cuenta dos veces
+    ("else if", """int signo(int x) {
+    if (x > 0) {
+        return 1;
+    } else if (x < 0) {
+        return -1;
+    } else {
+        return 0;
+    }
+}
+""", {'signo': (3, 3, 1)}),
+
+    # El while de un do-while no es otro ciclo
+    ("do-while", """int leer() {
+    int n = 0;
+    do {
+        n++;
+    } while (n < 10 && n != 5);
+    return n;
+}
+""", {'leer': (3, 2, 1)}),
+
+    # La lambda no es una función aparte y anida lo que contiene
+    ("lambda", """int contar(vector<int>& v) {
+    return count_if(v.begin(), v.end(), [](int x) {
+        if (x > 0) { return true; }
+        return false;
+    });
+}
+""", {'contar': (2, 2, 2)}),
+
+    # El ternario de la lista de inicialización queda fuera del cuerpo
+    ("constructor con lista de inicialización", """class A {
+    int a, b;
+public:
+    A(int x) : a(x > 0 ? x : 0), b{2} {
+        if (a) { b = 1; }
+    }
+    int get() const { return a; }
+};
+""", {'A': (2, 1, 1), 'get': (1, 0, 0)}),
+
+    ("método de plantilla fuera de la clase", """template <typename T>
+T Pila<T>::pop() {
+    if (tam == 0) { throw runtime_error("vacía"); }
+    return datos[--tam];
+}
+""", {'Pila::pop': (2, 1, 1)}),
+
+    ("#endif e identificadores parecidos a palabras clave", """#ifdef DEBUG
+#define LOG 1
+#endif
+int iffy(int do_it, int for_each) { return do_it || for_each; }
+""", {'iffy': (2, 1, 0)}),
+
+    ("switch", """int nombre(int x) {
+    switch (x) {
+        case 1: return 10;
+        case 2: return 20;
+        default: return 0;
+    }
+}
+""", {'nombre': (3, 1, 1)}),
+
+    ("recursión y ternario", "int fact(int n) { return n <= 1 ? 1 : n * fact(n - 1); }\n", {'fact': (2, 2, 0)}),
+
+    # Cada secuencia de un mismo operador lógico suma 1 a la cognitiva
+    ("secuencias de && y ||", """bool ok(bool a, bool b, bool c, bool d) {
+    if (a && b && c || d) { return true; }
+    return false;
+}
+""", {'ok': (5, 3, 1)}),
+
+    ("llaves dentro de comentarios, cadenas y caracteres", """/* Comentario
+   de varias líneas { */
+const char* plantilla = R"({ "a": [1, 2] )";
+char llave = '{';
+int f(int x) {
+    return x > 0 ? 1 : 0;
+}
+""", {'f': (2, 1, 0)}),
+]
+
+class TestComplejidadCpp(unittest.TestCase):
+    def test_complejidad_por_funcion(self):
+        for descripcion, codigo, esperadas in CASOS:
+            with self.subTest(descripcion):
+                resultados = complejidad_de_hechos(extraer_hechos(codigo))
+                self.assertEqual({r['nombre_completo']: (r['ciclomatica'], r['cognitiva'], r['anidamiento'])
+                                  for r in resultados}, esperadas)
+
+    def test_sin_funciones(self):
+        self.assertEqual(complejidad_de_hechos(extraer_hechos("#include <iostream>\nint x = 0;\n")), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts'))
+
+from hechos_cpp import extraer_hechos, tokenizar
+
+# (descripción, código, funciones esperadas como (nombre_completo, clase, línea de inicio, línea de fin))
+CASOS_FUNCIONES = [
+    ("llaves anidadas y bloques sueltos", """int f(int x) {
+    if (x > 0) {
+        for (int i = 0; i < x; i++) {
+            while (x) { x--; }
+        }
+    }
+    { int y = 0; }
+    return x;
+}
+int g() { return 1; }
+""", [('f', None, 1, 9), ('g', None, 10, 10)]),
+
+    ("constructor con lista de inicialización", """class A {
+    int a, b;
+public:
+    A(int x) : a(x > 0 ? x : 0), b{2} {
+        if (a) { b = 1; }
+    }
+    int get() const { return a; }
+};
+""", [('A', 'A', 4, 6), ('get', 'A', 7, 7)]),
+
+    ("método de plantilla fuera de la clase", """template <typename T>
+T Pila<T>::pop() {
+    if (tam == 0) { throw runtime_error("vacía"); }
+    return datos[--tam];
+}
+""", [('Pila::pop', 'Pila', 2, 5)]),
+
+    ("lambda dentro de una función", """int contar(vector<int>& v) {
+    return count_if(v.begin(), v.end(), [](int x) {
+        if (x > 0) { return true; }
+        return false;
+    });
+}
+""", [('contar', None, 1, 6)]),
+
+    ("#endif e identificadores parecidos a palabras clave", """#ifdef DEBUG
+#define LOG 1
+#endif
+int iffy(int do_it, int for_each) { return do_it || for_each; }
+""", [('iffy', None, 4, 4)]),
+
+    ("llaves dentro de comentarios, cadenas y caracteres", """/* Comentario
+   de varias líneas { */
+const char* plantilla = R"({ "a": [1, 2] )";
+char llave = '{';
+int f(int x) {
+    return x > 0 ? 1 : 0;
+}
+""", [('f', None, 5, 7)]),
+]
+
+# (descripción, código, tokens de control esperados)
+CASOS_CONTROL = [
+    ("else if", "void f(int x) { if (x) {} else if (x > 1) {} else {} }", ['if', 'else', 'if', 'else']),
+    ("do-while y operadores lógicos", "void f(int n) { do { n++; } while (n < 10 && n != 5); }", ['do', 'while', '&&']),
+    ("identificadores que empiezan como palabras clave", "int iffy(int do_it, int for_each) { return do_it; }", []),
+    ("ternario", "int f(int n) { return n ? 1 : 0; }", ['?']),
+]
+
+# (descripción, código, includes esperados como (nombre, sistema, línea))
+CASOS_INCLUDES = [
+    ("includes reales", "#include <iostream>\n#include \"pila.h\"\n  #  include <vector>\n",
+     [('iostream', True, 1), ('pila.h', False, 2), ('vector', True, 3)]),
+    ("includes dentro de comentarios y cadenas", """// #include <vector>
+/* #include "a.h" */
+#include <iostream>
+const char* s = "#include <map>";
+""", [('iostream', True, 3)]),
+    ("guardas de inclusión sin includes", "#ifndef PILA_H\n#define PILA_H\n#endif\n", []),
+]
+
+class TestHechosCpp(unittest.TestCase):
+    def test_funciones(self):
+        for descripcion, codigo, esperadas in CASOS_FUNCIONES:
+            with self.subTest(descripcion):
+                funciones = extraer_hechos(codigo)['funciones']
+                self.assertEqual([(f['nombre_completo'], f['clase'], f['linea_inicio'], f['linea_fin'])
+                                  for f in funciones], esperadas)
+
+    def test_control(self):
+        for descripcion, codigo, esperados in CASOS_CONTROL:
+            with self.subTest(descripcion):
+                control = extraer_hechos(codigo)['control']
+                self.assertEqual([token['token'] for token in control], esperados)
+                self.assertTrue(all(token['funcion'] == 0 for token in control))
+
+    def test_includes(self):
+        for descripcion, codigo, esperados in CASOS_INCLUDES:
+            with self.subTest(descripcion):
+                includes = extraer_hechos(codigo)['includes']
+                self.assertEqual([(i['nombre'], i['sistema'], i['linea']) for i in includes], esperados)
+
+    def test_clases(self):
+        hechos = extraer_hechos("struct Nodo { int v; };\nclass Lista final : public Base {\n};\nenum class Color { R };\n")
+        self.assertEqual([(c['nombre'], c['tipo'], c['linea_inicio'], c['linea_fin']) for c in hechos['clases']],
+                         [('Nodo', 'struct', 1, 1), ('Lista', 'class', 2, 3)])
+
+    def test_tokens_con_lineas(self):
+        tokens = tokenizar('#endif\nint x = 0; // fin\nauto s = "a\\"b";\n')
+        self.assertEqual(tokens, [
+            ('preprocesador', '#endif', 1),
+            ('identificador', 'int', 2), ('identificador', 'x', 2), ('operador', '=', 2), ('numero', '0', 2),
+            ('operador', ';', 2), ('comentario', '// fin', 2),
+            ('identificador', 'auto', 3), ('identificador', 's', 3), ('operador', '=', 3),
+            ('cadena', '"a\\"b"', 3), ('operador', ';', 3)
+        ])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,183 @@
+import os
+import sys
+import random
+import sqlite3
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts'))
+
+import indice_plagio
+from indice_plagio import (abrir_indice, agregar_entrega, consultar, huellas_de_contenido, huellas_de_entrega,
+                           winnowing, VENTANA)
+
+PROGRAMA = """
+#include <iostream>
+using namespace std;
+
+int sumar(int valores[], int cantidad) {
+    int total = 0;
+    for (int i = 0; i < cantidad; i++) {
+        if (valores[i] > 0) {
+            total += valores[i];
+        }
+    }
+    return total;
+}
+
+int main() {
+    int numeros[5] = {1, -2, 3, 4, -5};
+    cout << "Suma: " << sumar(numeros, 5) << endl;
+    return 0;
+}
+"""
+
+# El mismo programa con otros nombres, literales y comentarios: la normalización lo deja igual
+PROGRAMA_RENOMBRADO = """
+#include <iostream>
+using namespace std;
+
+// Suma los positivos
+int acumular(int datos[], int n) {
+    int suma = 0;
+    for (int k = 0; k < n; k++) {
+        if (datos[k] > 0) {
+            suma += datos[k];
+        }
+    }
+    return suma;
+}
+
+int main() {
+    int lista[5] = {7, -8, 9, 10, -11};
+    cout << "Total: " << acumular(lista, 5) << endl;
+    return 0;
+}
+"""
+
+OTRO_PROGRAMA = """
+#include <string>
+struct Nodo { std::string clave; Nodo* siguiente; };
+
+void invertir(Nodo*& cabeza) {
+    Nodo* previo = nullptr;
+    while (cabeza != nullptr) {
+        Nodo* resto = cabeza->siguiente;
+        cabeza->siguiente = previo;
+        previo = cabeza;
+        cabeza = resto;
+    }
+    cabeza = previo;
+}
+"""
+
+class TestWinnowing(unittest.TestCase):
+    def test_cada_ventana_tiene_una_huella(self):
+        generador = random.Random(5)
+        for _ in range(200):
+            hashes = [generador.randrange(20) for _ in range(generador.randint(0, 60))]
+            seleccion = winnowing(hashes, VENTANA)
+            posiciones = [posicion for _, posicion in seleccion]
+            self.assertEqual(posiciones, sorted(set(posiciones)))
+            for huella, posicion in seleccion:
+                self.assertEqual(huella, hashes[posicion])
+            for inicio in range(len(hashes) - VENTANA + 1):
+                ventana = range(inicio, inicio + VENTANA)
+                minimo = min(hashes[i] for i in ventana)
+                self.assertTrue(any(p in ventana and hashes[p] == minimo for p in posiciones), hashes)
+
+    def test_secuencia_mas_corta_que_la_ventana(self):
+        self.assertEqual(winnowing([], VENTANA), [])
+        self.assertEqual(winnowing([5, 2, 7], VENTANA), [(2, 1)])
+
+    def test_huellas_invariantes_al_renombrar(self):
+        huellas = huellas_de_contenido(PROGRAMA)
+        self.assertTrue(huellas)
+        self.assertEqual([h for h, _ in huellas], [h for h, _ in huellas_de_contenido(PROGRAMA_RENOMBRADO)])
+        self.assertFalse({h for h, _ in huellas} & {h for h, _ in huellas_de_contenido(OTRO_PROGRAMA)})
+
+    def test_codigo_mas_corto_que_un_k_grama(self):
+        # 9 tokens: menos que un k-grama
+        self.assertEqual(huellas_de_contenido("int main() { return 0; }"), [])
+
+class TestIndicePlagio(unittest.TestCase):
+    def setUp(self):
+        self.directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directorio.cleanup)
+        self.ruta_indice = os.path.join(self.directorio.name, 'indice.sqlite3')
+        self.conexion = abrir_indice(self.ruta_indice)
+        self.addCleanup(self.conexion.close)
+
+    def crear_entrega(self, nombre, contenido):
+        ruta_src = os.path.join(self.directorio.name, nombre, 'src')
+        os.makedirs(ruta_src, exist_ok=True)
+        with open(os.path.join(ruta_src, 'main.cpp'), 'w', encoding='utf-8') as f:
+            f.write(contenido)
+        return ruta_src
+
+    def entregas(self):
+        return sorted(self.conexion.execute("SELECT cohorte, nombre FROM entregas"))
+
+    def test_consulta_sin_excluir(self):
+        agregar_entrega(self.conexion, 'alumno1', self.crear_entrega('a', PROGRAMA), '2024-1')
+        agregar_entrega(self.conexion, 'alumno2', self.crear_entrega('b', OTRO_PROGRAMA), '2024-1')
+        resultados = consultar(self.conexion, huellas_de_entrega(self.crear_entrega('c', PROGRAMA_RENOMBRADO)))
+        self.assertEqual([(r['entrega'], r['cohorte']) for r in resultados], [('alumno1', '2024-1')])
+        self.assertEqual(resultados[0]['similitud'], 1.0)
+        self.assertEqual(resultados[0]['similitud_inversa'], 1.0)
+
+    def test_excluir_solo_la_misma_cohorte(self):
+        ruta_src = self.crear_entrega('a', PROGRAMA)
+        agregar_entrega(self.conexion, 'alumno1', ruta_src, '2024-1')
+        agregar_entrega(self.conexion, 'alumno1', ruta_src, '2025-1')
+        huellas = huellas_de_entrega(ruta_src)
+        resultados = consultar(self.conexion, huellas, excluir=('2025-1', 'alumno1'))
+        self.assertEqual([(r['entrega'], r['cohorte']) for r in resultados], [('alumno1', '2024-1')])
+        self.assertEqual(len(consultar(self.conexion, huellas)), 2)
+
+    def test_reindexar_reemplaza_solo_la_misma_entrega(self):
+        agregar_entrega(self.conexion, 'alumno1', self.crear_entrega('a', PROGRAMA), '2024-1')
+        agregar_entrega(self.conexion, 'alumno1', self.crear_entrega('b', PROGRAMA), '2025-1')
+        agregar_entrega(self.conexion, 'alumno1', self.crear_entrega('c', OTRO_PROGRAMA), '2025-1')
+        self.assertEqual(self.entregas(), [('2024-1', 'alumno1'), ('2025-1', 'alumno1')])
+
+        # Las huellas del programa reemplazado ya no cuentan para la cohorte 2025-1
+        huellas = huellas_de_entrega(self.crear_entrega('d', PROGRAMA))
+        self.assertEqual([r['cohorte'] for r in consultar(self.conexion, huellas)], ['2024-1'])
+        frecuencias = dict(self.conexion.execute("SELECT huella, entregas FROM frecuencias"))
+        self.assertEqual({frecuencias[h] for h in huellas}, {1})
+        for huella in huellas_de_entrega(self.crear_entrega('e', OTRO_PROGRAMA)):
+            self.assertEqual(frecuencias[huella], 1)
+
+    def test_huellas_comunes_no_cuentan(self):
+        for i in range(3):
+            agregar_entrega(self.conexion, f'alumno{i}', self.crear_entrega(f'a{i}', PROGRAMA), '2024-1')
+        huellas = huellas_de_entrega(self.crear_entrega('b', PROGRAMA))
+        self.assertEqual(len(consultar(self.conexion, huellas)), 3)
+        self.assertEqual(consultar(self.conexion, huellas, frecuencia_maxima=2), [])
+
+    def test_parametros_distintos_se_rechazan(self):
+        agregar_entrega(self.conexion, 'alumno1', self.crear_entrega('a', PROGRAMA), '2024-1')
+        self.conexion.close()
+        abrir_indice(self.ruta_indice).close()  # Mismos parámetros: se abre sin problemas
+
+        conexion = sqlite3.connect(self.ruta_indice)
+        with conexion:
+            conexion.execute("UPDATE parametros SET valor = valor + 1 WHERE clave = 'ventana'")
+        conexion.close()
+        with self.assertRaises(ValueError):
+            abrir_indice(self.ruta_indice)
+
+    def test_indice_sin_parametros_se_rechaza(self):
+        agregar_entrega(self.conexion, 'alumno1', self.crear_entrega('a', PROGRAMA), '2024-1')
+        with self.conexion:
+            self.conexion.execute("DELETE FROM parametros")
+        with self.assertRaises(ValueError):
+            abrir_indice(self.ruta_indice)
+
+    def test_indice_vacio_registra_los_parametros(self):
+        guardados = dict(self.conexion.execute("SELECT clave, valor FROM parametros"))
+        self.assertEqual(guardados, indice_plagio.PARAMETROS)
+
+if __name__ == '__main__':
+    unittest.main()